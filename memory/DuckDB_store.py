@@ -1,11 +1,13 @@
 import duckdb
-import json
-from pathlib import Path
+import shutil
+from partitioning import PARTITION_ROOT, PROJECT_KEY_SQL
+from log_store import ensure_log_store, open_log_table
+from cache_warmer import bump_data_version
 
 # Input and Output Paths
 #INPUT_FILE = "../data/filtered_memory_logs.jsonl"
 INPUT_FILE = "../data/memory_logs_with_historic_impact.jsonl"
-DUCKDB_PATH = "timeline_logs.duckdb"
+DUCKDB_PATH = "../data/timeline_logs.duckdb"   # the database retrieval.py queries
 
 # Create database and table if not exist
 def init_duckdb():
@@ -23,26 +25,55 @@ def init_duckdb():
     """)
     conn.close()
 
-# Load logs from JSONL and insert into DuckDB
+# Load logs from the columnar log store and bulk insert into DuckDB
 def load_logs_to_duckdb():
     conn = duckdb.connect(DUCKDB_PATH)
 
-    with open(INPUT_FILE, "r") as f:
-        for line in f:
-            log = json.loads(line)
-            conn.execute("""
-                INSERT INTO timeline_logs VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                log["log_id"],
-                log["timestamp"],
-                log["user"],
-                log["project"],
-                log["type"],
-                log["content"],
-                log["session_id"]
-            ))
+    # Arrow table is registered zero-copy and inserted in one set-based statement.
+    # Rows are clustered by project so per-project filters skip whole row groups.
+    logs = open_log_table(ensure_log_store(INPUT_FILE))
+    conn.register("incoming_logs", logs)
+    conn.execute("""
+        INSERT INTO timeline_logs
+        SELECT log_id, timestamp, user, project, type, content, session_id
+        FROM incoming_logs
+        ORDER BY project, timestamp
+    """)
+    conn.unregister("incoming_logs")
+    conn.close()
+    print(f"Inserted {logs.num_rows} logs into DuckDB at: {DUCKDB_PATH}")
+
+# Build the BM25 full-text index used by retrieval.get_lexical_logs.
+# DuckDB FTS indexes are not updated on insert, so rebuild after every load.
+def build_fts_index(path=DUCKDB_PATH):
+    conn = duckdb.connect(path)
+    conn.execute("INSTALL fts")
+    conn.execute("LOAD fts")
+    conn.execute("""
+        PRAGMA create_fts_index(
+            'timeline_logs', 'log_id', 'content',
+            stemmer = 'porter', stopwords = 'english', overwrite = 1
+        )
+    """)
+    conn.close()
+    print("Built FTS index on timeline_logs.content")
+
+# Write a Hive-partitioned Parquet copy (project_key=/month=) that
+# retrieval.get_timeline_logs prunes by the projects a query is routed to.
+def export_partitioned_timeline(path=DUCKDB_PATH):
+    conn = duckdb.connect(path)
+    shutil.rmtree(PARTITION_ROOT, ignore_errors=True)
+    conn.execute(f"""
+        COPY (
+            SELECT *,
+                   {PROJECT_KEY_SQL} AS project_key,
+                   strftime(timestamp, '%Y-%m') AS month
+            FROM timeline_logs
+            ORDER BY timestamp
+        ) TO '{PARTITION_ROOT}' (FORMAT PARQUET, PARTITION_BY (project_key, month))
+    """)
     conn.close()
-    print(f"Inserted logs into DuckDB at: {DUCKDB_PATH}")
+    print(f"Exported partitioned timeline to: {PARTITION_ROOT}")
 
 # Run
 if __name__ == "__main__":
@@ -57,4 +88,7 @@ def preview_duckdb_logs(n=5):
 if __name__ == "__main__":
     init_duckdb()
     load_logs_to_duckdb()
-    preview_duckdb_logs() 
+    build_fts_index()
+    export_partitioned_timeline()
+    bump_data_version()
+    preview_duckdb_logs()
@@ -1,7 +1,8 @@
 import os
-import json
 from neo4j import GraphDatabase, basic_auth
 from dotenv import load_dotenv
+from log_store import ensure_log_store, iter_records
+from cache_warmer import bump_data_version
 
 
 # Load environment variables from .env file
@@ -24,8 +25,7 @@ auth=basic_auth(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
 )
 
 def load_logs(path):
-    with open(path, "r") as f:
-        return [json.loads(line) for line in f]
+    return iter_records(ensure_log_store(path))
 
 
 def insert_log(tx, log):
@@ -37,7 +37,8 @@ def insert_log(tx, log):
         CREATE (l:Log {
             id: $log_id,
             timestamp: datetime($timestamp),
-            content: $content
+            content: $content,
+            project: $project
         })
         MERGE (u)-[:CREATED]->(l)
         MERGE (l)-[:BELONGS_TO]->(p)
@@ -46,12 +47,22 @@ def insert_log(tx, log):
     """, log)
 
 
+# Index that lets per-project queries start from their own subgraph. Queries
+# anchor on Project nodes, never on Log.project, so an older log_project index is dropped.
+def create_partition_indexes(session):
+    session.run("CREATE INDEX project_name IF NOT EXISTS FOR (p:Project) ON (p.name)")
+    session.run("DROP INDEX log_project IF EXISTS")
+
+
 def init_neo4j():
-    logs = load_logs(LOG_FILE)
+    inserted = 0
     with driver.session() as session:
-        for log in logs:
+        create_partition_indexes(session)
+        for log in load_logs(LOG_FILE):
             session.write_transaction(insert_log, log)
-    print(f"Inserted {len(logs)} logs into Neo4j.")
+            inserted += 1
+    print(f"Inserted {inserted} logs into Neo4j.")
+    bump_data_version()
 
 
 if __name__ == "__main__":
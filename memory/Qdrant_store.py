@@ -1,8 +1,9 @@
 import os
-import json
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, VectorParams, Distance
+from qdrant_client.http.models import PointStruct, VectorParams, Distance, KeywordIndexParams, KeywordIndexType
 from sentence_transformers import SentenceTransformer
+from log_store import ensure_log_store, iter_records
+from cache_warmer import bump_data_version
 
 # Load env vars
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
@@ -19,19 +20,23 @@ def init_qdrant():
             collection_name=COLLECTION_NAME,
             vectors_config=VectorParams(size=384, distance=Distance.COSINE),
         )
+    # Per-project tenant index used by shard-routed search in retrieval.py
+    client.create_payload_index(
+        collection_name=COLLECTION_NAME,
+        field_name="project",
+        field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+    )
 
 # Upload filtered logs
 def upload_to_qdrant(path):
-    with open(path, "r") as f:
-        logs = [json.loads(line) for line in f]
-
     points = []
-    for log in logs:
+    for log in iter_records(ensure_log_store(path)):
         embedding = model.encode(log["content"]).tolist()
         points.append(PointStruct(id=log["log_id"], vector=embedding, payload=log))
 
     client.upsert(collection_name=COLLECTION_NAME, points=points)
     print(f"Uploaded {len(points)} logs to Qdrant collection: {COLLECTION_NAME}")
+    bump_data_version()
 
 if __name__ == "__main__":
     init_qdrant()
@@ -1,28 +1,57 @@
 import streamlit as st
-from retrieval import get_combined_logs
-from generate_response import generate_response
+from service_client import MemoryServiceClient, MemoryServiceError, MemoryServiceUnavailable
+from query_planner import extract_keywords
 from datetime import datetime
 import re
-import string
+from functools import lru_cache
 import plotly.graph_objects as go
 
-# ------------------------- Stopwords + Keyword Tools -------------------------
+# ------------------------- Keyword Highlighting -------------------------
 
-STOPWORDS = {
-    "the", "was", "in", "of", "and", "to", "for", "on", "at", "a", "an", "is", "are", "it", "as", "by",
-    "that", "with", "be", "or", "from", "this", "which", "can", "but", "not", "if", "then", "do", "so",
-    "about", "into", "we", "our", "their", "your"
-}
-
-def extract_keywords(query):
-    query = query.translate(str.maketrans('', '', string.punctuation))  # remove punctuation
-    return [kw for kw in query.lower().split() if kw not in STOPWORDS and len(kw) > 2]
+@lru_cache(maxsize=128)
+def compile_highlighter(keywords):
+    # One alternation pattern for all keywords; longest first so overlaps prefer the longer match
+    alternation = "|".join(re.escape(kw) for kw in sorted(set(keywords), key=len, reverse=True))
+    return re.compile(rf"\b\w*(?:{alternation})\w*\b", re.IGNORECASE)
 
 def highlight_keywords(text, keywords):
-    for kw in keywords:
-        pattern = re.compile(rf"\b\w*{re.escape(kw)}\w*\b", re.IGNORECASE)
-        text = pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
-    return text
+    if not keywords:
+        return text
+    pattern = compile_highlighter(tuple(keywords))
+    return pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
+
+@st.cache_resource
+def get_service_client():
+    return MemoryServiceClient()
+
+@st.cache_data(max_entries=32)
+def build_score_chart(labels, scores, hovertexts):
+    # Single vectorized trace instead of one go.Bar per log
+    fig = go.Figure(go.Bar(
+        x=list(labels),
+        y=list(scores),
+        hovertext=list(hovertexts),
+        marker=dict(color="skyblue")
+    ))
+    fig.update_layout(
+        height=400,
+        margin=dict(l=30, r=30, t=30, b=30),
+        xaxis_title="Logs",
+        yaxis_title="Relevance Score",
+        showlegend=False
+    )
+    return fig
+
+LOGS_PER_PAGE = 10
+DISCARDED_PER_PAGE = 20
+
+def paginate(items, per_page, key):
+    pages = max(1, -(-len(items) // per_page))
+    if pages == 1:
+        return items
+    page = st.number_input(f"Page (1-{pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    start = (page - 1) * per_page
+    return items[start:start + per_page]
 
 # ------------------------- Streamlit UI -------------------------
 
@@ -93,7 +122,15 @@ if submit and query:
     st.markdown(f"**Extracted Keywords:** {keywords}")
 
     with st.spinner("Fetching memory and generating answer..."):
-        retained_logs, discarded_logs = get_combined_logs(query, return_discarded=True)
+        try:
+            result = get_service_client().respond(query)
+        except MemoryServiceUnavailable:
+            st.error("Memory service unavailable. Start it with `python core/service.py` and try again.")
+            st.stop()
+        except MemoryServiceError as e:
+            st.error(f"Memory service error: {e}")
+            st.stop()
+        retained_logs, discarded_logs = result["retained"], result["discarded"]
 
         # Add parsed time
         for log in retained_logs:
@@ -103,82 +140,79 @@ if submit and query:
                 log["parsed_time"] = datetime.min
         retained_logs.sort(key=lambda x: x["parsed_time"], reverse=True)
 
-        raw_response, memory_response = generate_response(query)
+        # Highlight once per query, not on every rerun
+        for log in retained_logs:
+            log["highlighted"] = highlight_keywords(log.get("content", "No content available."), keywords)
+
+        raw_response, memory_response = result["raw"], result["memory"]
 
         st.session_state["raw"] = raw_response
         st.session_state["memory"] = memory_response
         st.session_state["logs"] = retained_logs
         st.session_state["discarded"] = discarded_logs
         st.session_state["keywords"] = keywords
+        st.session_state["context_tokens"] = result.get("context_tokens")
 
 # ------------------------- Log Display + LLM Result -------------------------
 
 if "logs" in st.session_state:
     logs = st.session_state["logs"]
     discarded_logs = st.session_state.get("discarded", [])
-    keywords = st.session_state.get("keywords", [])
 
     st.markdown("### 📚 Retrieved Memory Logs")
+    tokens = st.session_state.get("context_tokens")
+    if tokens:
+        st.caption(
+            f"Prompt context: {tokens['tokens_after']}/{tokens['budget']} tokens "
+            f"(saved {tokens['tokens_saved']} by merging {tokens['merged']}, "
+            f"truncating {tokens['truncated']} and dropping {tokens['dropped']} logs)"
+        )
     if not logs:
         st.info("No memory found for this query.")
     else:
-        for log in logs:
+        for log in paginate(logs, LOGS_PER_PAGE, key="log_page"):
             timestamp = log.get("timestamp", "Unknown time")
             speaker = log.get("user", "Unknown")
-            raw_content = log.get("content", "No content available.")
             project = log.get("project", "Unknown")
             memory_type = log.get("type", "general")
             memory_source = log.get("source", "unknown")
-
-            content = highlight_keywords(raw_content, keywords) if keywords else raw_content
+            content = log.get("highlighted") or log.get("content", "No content available.")
 
             header = f"{timestamp} | {speaker} | Project: {project}"
             default_expanded = False if log.get("type") == "summary" else True
             with st.expander(header, expanded=default_expanded):
-    
                 st.markdown(
                     f"<span class='tag {memory_type}'>{memory_type.capitalize()}</span> "
-                    f"<span class='source-tag'>{memory_source}</span>",
+                    f"<span class='source-tag'>{memory_source}</span><br>"
+                    f"<b>Speaker:</b> {speaker}<br>"
+                    f"<b>Timestamp:</b> {timestamp}<br>"
+                    f"<b>Content:</b> {content}<br>"
+                    f"<b>Project:</b> {project}",
                     unsafe_allow_html=True
                 )
-                st.markdown(f"**Speaker:** {speaker}")
-                st.markdown(f"**Timestamp:** {timestamp}")
-                st.markdown(f"**Content:** {content}", unsafe_allow_html=True)
-                st.markdown(f"**Project:** {project}")
 
         # ------------------------- Plotly Score Chart -------------------------
 
         st.markdown("### 📈 Log Relevance Scores")
-        fig = go.Figure()
-        for log in logs:
-            score = log.get("score", 0)
-            label = f"{log.get('source', 'Log')} | {log.get('user', '')[:6]} | {log.get('timestamp', '')[:10]}"
-            fig.add_trace(go.Bar(
-                x=[label],
-                y=[score],
-                name=label,
-                hovertext=log.get("content", "")[:120] + "...",
-                marker=dict(color="skyblue")
-            ))
-        fig.update_layout(
-            height=400,
-            margin=dict(l=30, r=30, t=30, b=30),
-            xaxis_title="Logs",
-            yaxis_title="Relevance Score",
-            showlegend=False
+        labels = tuple(
+            f"{i}. {log.get('source', 'Log')} | {log.get('user', '')[:6]} | {str(log.get('timestamp', ''))[:10]}"
+            for i, log in enumerate(logs, 1)
         )
-        st.plotly_chart(fig, use_container_width=True)
+        scores = tuple(log.get("score", 0) for log in logs)
+        hovertexts = tuple(log.get("content", "")[:120] + "..." for log in logs)
+        st.plotly_chart(build_score_chart(labels, scores, hovertexts), use_container_width=True)
 
         # ------------------------- Discarded Logs Section -------------------------
 
         if discarded_logs:
-            with st.expander("🗑️ Discarded Logs (Below Relevance Threshold)", expanded=False):
-                for log in discarded_logs:
-                    score = round(log.get("score", 0), 4)
-                    st.markdown(f"**{log.get('timestamp', '')} | {log.get('user', 'Unknown')}**")
-                    st.markdown(f"*Score:* {score}")
-                    st.markdown(f"> {log.get('content', '')}")
-                    st.markdown("---")
+            with st.expander(f"🗑️ Discarded Logs (Below Relevance Threshold): {len(discarded_logs)}", expanded=False):
+                page = paginate(discarded_logs, DISCARDED_PER_PAGE, key="discarded_page")
+                st.markdown("\n\n---\n\n".join(
+                    f"**{log.get('timestamp', '')} | {log.get('user', 'Unknown')}**  \n"
+                    f"*Score:* {round(log.get('score', 0), 4)}\n\n"
+                    f"> {log.get('content', '')}"
+                    for log in page
+                ))
 
     # ------------------------- Final LLM Answer -------------------------
 
@@ -0,0 +1,366 @@
+# core/append_log.py
+
+import os
+import json
+import uuid
+import time
+import threading
+from datetime import datetime
+from qdrant_client.http.models import PointStruct
+from dotenv import load_dotenv
+
+from cache_warmer import bump_data_version
+from partitioning import PARTITION_ROOT, PROJECT_KEY_SQL, month_key, partition_dir, compact_partition
+from summary_tree import point_id
+from log_record import parse_timestamp
+from tail_index import tail_index
+from near_dup_index import get_near_dup_index
+
+load_dotenv()
+
+# ---- Config ----
+WAL_PATH = os.getenv("APPEND_WAL_PATH", "../data/wal/append.wal")
+FLUSH_BATCH_SIZE = int(os.getenv("APPEND_FLUSH_BATCH_SIZE", 256))
+FLUSH_INTERVAL_MS = int(os.getenv("APPEND_FLUSH_INTERVAL_MS", 500))
+# fsync on every append; otherwise the WAL is fsynced once per flush tick (group commit)
+FSYNC_EVERY_APPEND = os.getenv("APPEND_WAL_FSYNC_EVERY_APPEND", "0") == "1"
+# Events that fail on their own while the rest of their batch succeeds end up here
+DEAD_LETTER_PATH = os.getenv("APPEND_DEAD_LETTER_PATH", "../data/wal/dead_letter.jsonl")
+# Flushed rows are not in the BM25 index until it is rebuilt; 0 disables the rebuild
+FTS_REBUILD_INTERVAL_SECONDS = float(os.getenv("APPEND_FTS_REBUILD_INTERVAL_SECONDS", 300))
+
+REQUIRED_FIELDS = ("user", "project", "content")
+OPTIONAL_FIELDS = {"log_id": None, "timestamp": None, "type": "general", "session_id": "sess_live"}
+
+NEO4J_UPSERT = """
+    UNWIND $logs AS log
+    MERGE (u:User {name: log.user})
+    MERGE (p:Project {name: log.project})
+    MERGE (s:Session {id: log.session_id})
+    MERGE (t:Type {name: log.type})
+    MERGE (l:Log {id: log.log_id})
+    SET l.log_id = log.log_id,
+        l.timestamp = datetime(log.timestamp),
+        l.content = log.content,
+        l.project = log.project,
+        l.session_id = log.session_id
+    MERGE (u)-[:CREATED]->(l)
+    MERGE (l)-[:BELONGS_TO]->(p)
+    MERGE (l)-[:IN_SESSION]->(s)
+    MERGE (l)-[:IS_TYPE]->(t)
+    MERGE (l)-[:RELATED_TO]->(p)
+"""
+
+def normalize_log(log):
+    if not isinstance(log, dict):
+        raise ValueError("Log must be a JSON object")
+    missing = [f for f in REQUIRED_FIELDS if not log.get(f)]
+    if missing:
+        raise ValueError(f"Log is missing required fields: {', '.join(missing)}")
+    log = dict(log)
+    # Explicit nulls fall back to the defaults; the Neo4j MERGE cannot match on null
+    for field, default in OPTIONAL_FIELDS.items():
+        if log.get(field) is None:
+            log.pop(field, None)
+            if default is not None:
+                log[field] = default
+    bad = [f for f in (*REQUIRED_FIELDS, *OPTIONAL_FIELDS) if f in log and not isinstance(log[f], str)]
+    if bad:
+        raise ValueError(f"Log fields must be strings: {', '.join(bad)}")
+    log.setdefault("log_id", str(uuid.uuid4()))
+    log.setdefault("timestamp", datetime.now().isoformat())
+    if parse_timestamp(log["timestamp"]) is None:
+        raise ValueError(f"Log timestamp is not ISO 8601: {log['timestamp']!r}")
+    log["archived"] = False
+    log["month"] = month_key(log["timestamp"])
+    return log
+
+class AppendBuffer:
+    """
+    Durable append path for single log events.
+
+    append() writes the event to a local write-ahead log and the in-memory
+    tail index, so it is searchable immediately. A background thread flushes
+    pending events to Qdrant, DuckDB and Neo4j in micro-batches, triggered by
+    FLUSH_BATCH_SIZE or FLUSH_INTERVAL_MS, then checkpoints the WAL.
+
+    encoder (encode/encode_many), stores (a StoreWriter) and near_dups default
+    to the service's model and clients; tests pass fakes.
+    """
+
+    def __init__(self, wal_path=WAL_PATH, flush_batch_size=FLUSH_BATCH_SIZE, flush_interval_ms=FLUSH_INTERVAL_MS,
+                 encoder=None, stores=None, near_dups=None):
+        if encoder is None or stores is None:
+            import retrieval  # store clients and the embedding model
+            encoder = retrieval.embedding_batcher if encoder is None else encoder
+            stores = StoreWriter(retrieval) if stores is None else stores
+        self._encoder = encoder
+        self._stores = stores
+        # Embedding confirmation rejects LSH candidates that only share wording
+        self._near_dups = get_near_dup_index(embed_fn=encoder.encode) if near_dups is None else near_dups
+        self.wal_path = wal_path
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._lock = threading.Lock()        # guards _pending and the WAL handle
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._flush_event = threading.Event()
+        self._stopped = threading.Event()
+        self._pending = []
+        self._stats = {"appended": 0, "flushed": 0, "flushes": 0, "flush_errors": 0,
+                       "dead_lettered": 0, "duplicates": 0, "fts_rebuilds": 0, "last_flush_ms": 0.0}
+        self._fts_dirty = False
+        self._fts_built_at = time.time()
+
+        os.makedirs(os.path.dirname(wal_path), exist_ok=True)
+        self._replay()
+        self._wal = open(wal_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="append-flusher", daemon=True)
+        self._thread.start()
+
+    # ---- WAL ----
+    def _replay(self):
+        if not os.path.exists(self.wal_path):
+            return
+        logs = []
+        with open(self.wal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    logs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # torn write at the tail of the WAL
+        if not logs:
+            return
+        vectors = self._encoder.encode_many([log["content"] for log in logs])
+        for log, vector in zip(logs, vectors):
+            tail_index.add(log, vector)
+        self._pending = logs
+        print(f"Replayed {len(logs)} unflushed logs from {self.wal_path}")
+
+    def _checkpoint(self, remaining):
+        # Rewrite the WAL with only the still-pending events; called with _lock held
+        tmp_path = self.wal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for log in remaining:
+                f.write(json.dumps(log) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._wal.close()
+        os.replace(tmp_path, self.wal_path)
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+
+    # ---- Public API ----
+    def append(self, log):
+        log = normalize_log(log)
+        vector = self._encoder.encode(log["content"])
+        near_dups = self._near_dups
+        # Check, WAL write and registration happen under one lock so two
+        # concurrent near-duplicates cannot both become canonical
+        with self._lock:
+            if near_dups.check(log, vector) is not None:
+                # Stored only as an alias of the canonical log
+                canonical_id, _ = near_dups.add(log, vector)
+                self._stats["duplicates"] += 1
+                return {**log, "duplicate_of": canonical_id}
+
+            # Indexed before it becomes pending so a concurrent flush always finds its vector
+            tail_index.add(log, vector)
+            try:
+                self._wal.write(json.dumps(log) + "\n")
+                self._wal.flush()
+                if FSYNC_EVERY_APPEND:
+                    os.fsync(self._wal.fileno())
+            except Exception:
+                tail_index.remove([log["log_id"]])
+                raise
+            self._pending.append(log)
+            pending = len(self._pending)
+            self._stats["appended"] += 1
+            # Registered as canonical only once the event is durable in the WAL
+            near_dups.add(log, vector)
+
+        if pending >= self.flush_batch_size:
+            self._flush_event.set()
+        return log
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            try:
+                self._write(batch)
+                flushed, dead = batch, []
+            except Exception as e:
+                self._stats["flush_errors"] += 1
+                flushed, dead = self._isolate_failures(batch, e)
+                if not flushed and not dead:
+                    print(f"Append flush failed, will retry: {e}")
+                    return 0
+
+            done = {log["log_id"] for log in flushed + dead}
+            if dead:
+                self._dead_letter(dead)
+            with self._lock:
+                self._pending = [log for log in self._pending if log["log_id"] not in done]
+                self._checkpoint(self._pending)
+            tail_index.remove(list(done))
+            if flushed:
+                self._fts_dirty = True
+                self._stores.flushed()
+
+            self._stats["flushes"] += 1
+            self._stats["flushed"] += len(flushed)
+            self._stats["last_flush_ms"] = round(1000 * (time.perf_counter() - start), 2)
+            return len(flushed)
+
+    def _isolate_failures(self, batch, error):
+        """
+        Retry a failed batch one event at a time. Returns (flushed, dead):
+        if every event fails on its own the store is down, so nothing is
+        dead-lettered and the whole batch stays pending.
+        """
+        if len(batch) == 1:
+            return [], []
+        flushed, failed = [], []
+        for log in batch:
+            try:
+                self._write([log])
+                flushed.append(log)
+            except Exception as e:
+                failed.append({**log, "flush_error": str(e)})
+        if not flushed:
+            return [], []
+        return flushed, failed
+
+    def _dead_letter(self, logs):
+        with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            for log in logs:
+                f.write(json.dumps(log) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._stats["dead_lettered"] += len(logs)
+        print(f"Moved {len(logs)} unflushable logs to {DEAD_LETTER_PATH}")
+
+    def _maybe_rebuild_fts(self):
+        # A full rebuild, so it runs on an interval instead of per flush
+        if not FTS_REBUILD_INTERVAL_SECONDS or not self._fts_dirty:
+            return
+        if time.time() - self._fts_built_at < FTS_REBUILD_INTERVAL_SECONDS:
+            return
+        try:
+            self._stores.rebuild_fts()
+            self._stats["fts_rebuilds"] += 1
+        except Exception as e:
+            print(f"FTS index rebuild failed: {e}")
+        self._fts_dirty = False
+        self._fts_built_at = time.time()
+
+    def stats(self):
+        return {**self._stats, "pending": len(self._pending), "tail_size": len(tail_index)}
+
+    def close(self):
+        self._stopped.set()
+        self._flush_event.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._lock:
+            self._wal.close()
+
+    # ---- Background flusher ----
+    def _run(self):
+        while not self._stopped.is_set():
+            self._flush_event.wait(timeout=self.flush_interval)
+            self._flush_event.clear()
+            if not FSYNC_EVERY_APPEND:
+                with self._lock:
+                    os.fsync(self._wal.fileno())
+            self.flush()
+            self._maybe_rebuild_fts()
+
+    def _write(self, batch):
+        # Vectors come from the tail index, where append() put them
+        self._stores.write(batch, [tail_index.vector(log["log_id"]) for log in batch])
+
+class StoreWriter:
+    """
+    Writes flushed append batches to Qdrant, DuckDB and Neo4j through the
+    clients retrieval.py already holds.
+    """
+
+    def __init__(self, retrieval):
+        self._retrieval = retrieval
+
+    def write(self, batch, vectors):
+        # Qdrant upsert, DuckDB delete+insert and Neo4j MERGE are idempotent, so a
+        # crash before the WAL checkpoint just replays the batch. A replayed
+        # partition export can repeat rows until the partition is compacted;
+        # get_combined_logs dedupes by log_id.
+        self._retrieval.qdrant.upsert(
+            collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
+            points=[
+                PointStruct(id=point_id(log["log_id"]), vector=vector.tolist(), payload=log)
+                for log, vector in zip(batch, vectors)
+            ]
+        )
+
+        cursor = self._retrieval.get_duckdb_cursor()
+        rows = [
+            (log["log_id"], log["timestamp"], log["user"], log["project"],
+             log["type"], log["content"], log["session_id"])
+            for log in batch
+        ]
+        ids = [r[0] for r in rows]
+        cursor.execute(
+            f"DELETE FROM timeline_logs WHERE log_id IN ({', '.join('?' for _ in ids)})", ids
+        )
+        cursor.executemany("INSERT INTO timeline_logs VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        if os.path.isdir(PARTITION_ROOT):
+            # New files next to the existing partitions; nothing is rewritten
+            cursor.execute("CREATE OR REPLACE TEMP TABLE append_batch (log_id TEXT)")
+            cursor.executemany("INSERT INTO append_batch VALUES (?)", [(i,) for i in ids])
+            cursor.execute(f"""
+                COPY (
+                    SELECT *,
+                           {PROJECT_KEY_SQL} AS project_key,
+                           strftime(timestamp, '%Y-%m') AS month
+                    FROM timeline_logs
+                    WHERE log_id IN (SELECT log_id FROM append_batch)
+                ) TO '{PARTITION_ROOT}' (
+                    FORMAT PARQUET, PARTITION_BY (project_key, month),
+                    OVERWRITE_OR_IGNORE 1, FILENAME_PATTERN 'append_{{uuid}}'
+                )
+            """)
+            for directory in {partition_dir(log["project"], log["timestamp"]) for log in batch}:
+                compact_partition(cursor, directory)
+
+        with self._retrieval.neo4j_driver.session() as session:
+            session.run(NEO4J_UPSERT, logs=batch).consume()
+
+    def rebuild_fts(self):
+        self._retrieval.get_duckdb_cursor().execute("""
+            PRAGMA create_fts_index(
+                'timeline_logs', 'log_id', 'content',
+                stemmer = 'porter', stopwords = 'english', overwrite = 1
+            )
+        """)
+
+    def flushed(self):
+        bump_data_version()
+        self._retrieval.cache_warmer.request_refresh()
+
+_append_buffer = None
+_append_buffer_lock = threading.Lock()
+
+def get_append_buffer():
+    global _append_buffer
+    if _append_buffer is None:
+        with _append_buffer_lock:
+            if _append_buffer is None:
+                _append_buffer = AppendBuffer()
+    return _append_buffer
+
+def append_log(log):
+    return get_append_buffer().append(log)
@@ -0,0 +1,210 @@
+# core/cache_warmer.py
+
+import os
+import time
+import threading
+from collections import defaultdict
+import numpy as np
+from log_record import parse_timestamp
+
+# ---- Config ----
+WARM_TOP_PROJECTS = int(os.getenv("WARM_TOP_PROJECTS", 3))
+WARM_INTERVAL_SECONDS = float(os.getenv("WARM_INTERVAL_SECONDS", 60))
+WARM_POLL_SECONDS = float(os.getenv("WARM_POLL_SECONDS", 5))        # data version checks in between
+WARM_TIMELINE_WINDOW = int(os.getenv("WARM_TIMELINE_WINDOW", 200))   # most recent logs kept per project
+WARM_RELATIONAL_LIMIT = int(os.getenv("WARM_RELATIONAL_LIMIT", 50))
+FREQUENCY_HALF_LIFE_SECONDS = float(os.getenv("WARM_FREQUENCY_HALF_LIFE_SECONDS", 3600))
+
+# Touched by every writer (ingest scripts, summarizer, append flush); warmers in
+# any process compare its mtime to know their snapshot is stale.
+DATA_VERSION_PATH = "../data/.memory_version"
+
+def bump_data_version():
+    os.makedirs(os.path.dirname(DATA_VERSION_PATH), exist_ok=True)
+    with open(DATA_VERSION_PATH, "w") as f:
+        f.write(str(time.time()))
+
+def read_data_version():
+    try:
+        return os.path.getmtime(DATA_VERSION_PATH)
+    except OSError:
+        return 0.0
+
+class CacheWarmer:
+    """
+    Keeps the hottest projects' recent timeline window, relational
+    neighbourhood, candidate embeddings and retention boosts in memory.
+    Hotness is an exponentially decayed count of the projects queries are
+    routed to. A background thread refreshes the snapshot every
+    WARM_INTERVAL_SECONDS, when the hot set changes, or when the data
+    version moves.
+    """
+
+    def __init__(self, fetch_timeline, fetch_relational, fetch_boosts, encode):
+        self._fetch_timeline = fetch_timeline
+        self._fetch_relational = fetch_relational
+        self._fetch_boosts = fetch_boosts
+        self._encode = encode
+        self._lock = threading.Lock()
+        self._refresh_event = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self._frequency = defaultdict(float)
+        self._frequency_at = time.time()
+        # Snapshot, swapped atomically on refresh
+        self._timeline = {}
+        self._relational = {}
+        self._vectors = {}
+        self._boosts = {}
+        self._version = None
+        self._warm_projects = ()
+        self._stats = {"timeline_hits": 0, "relational_hits": 0, "vector_hits": 0, "misses": 0, "stale": 0, "refreshes": 0}
+
+    # ---- Query frequency ----
+    def record_query(self, projects):
+        now = time.time()
+        with self._lock:
+            decay = 0.5 ** ((now - self._frequency_at) / FREQUENCY_HALF_LIFE_SECONDS)
+            if decay < 1.0:
+                for p in self._frequency:
+                    self._frequency[p] *= decay
+            self._frequency_at = now
+            for p in projects:
+                self._frequency[p] += 1.0
+        if self._stopped:
+            return
+        self._ensure_started()
+        if set(self.hot_projects()) - set(self._warm_projects):
+            self._refresh_event.set()
+
+    def hot_projects(self, n=WARM_TOP_PROJECTS):
+        with self._lock:
+            ranked = sorted(self._frequency.items(), key=lambda x: x[1], reverse=True)
+        return [p for p, score in ranked[:n] if score > 0]
+
+    # ---- Lookups (None = not warm, caller goes to the store) ----
+    def _stale(self):
+        # A writer bumped the data version after this snapshot was taken; serve
+        # from the stores until the background refresh catches up
+        if self._version is not None and read_data_version() > self._version:
+            self._stats["stale"] += 1
+            self._refresh_event.set()
+            return True
+        return False
+
+    def get_timeline(self, projects, since, limit, users=None):
+        if not projects or any(p not in self._timeline for p in projects) or self._stale():
+            self._stats["misses"] += 1
+            return None
+        since_ts = parse_timestamp(since).timestamp()
+        users = {u.lower() for u in users} if users else None
+        rows = []
+        covered = True
+        for p in projects:
+            window = self._timeline[p]
+            # A full window that ends after `since` may have dropped older matches
+            if len(window) >= WARM_TIMELINE_WINDOW and window[-1].parsed_time and window[-1].parsed_time.timestamp() > since_ts:
+                covered = False
+            rows += [
+                r for r in window
+                if r.parsed_time and r.parsed_time.timestamp() > since_ts
+                and (users is None or (r.user or "").lower() in users)
+            ]
+        if not covered and len(rows) < limit:
+            self._stats["misses"] += 1
+            return None
+        rows.sort(key=lambda r: r.parsed_time, reverse=True)
+        self._stats["timeline_hits"] += 1
+        return [_copy(r) for r in rows[:limit]]
+
+    def get_relational(self, projects, limit):
+        if not projects or any(p not in self._relational for p in projects) or self._stale():
+            self._stats["misses"] += 1
+            return None
+        self._stats["relational_hits"] += 1
+        rows = [r for p in projects for r in self._relational[p]]
+        return [_copy(r) for r in rows[:limit]]
+
+    def vector(self, log_id):
+        vector = self._vectors.get(log_id)
+        if vector is not None:
+            self._stats["vector_hits"] += 1
+        return vector
+
+    def boost(self, log_id):
+        return self._boosts.get(log_id)
+
+    def stats(self):
+        return {**self._stats, "warm_projects": list(self._warm_projects), "hot_projects": self.hot_projects()}
+
+    # ---- Refresh ----
+    def request_refresh(self):
+        self._refresh_event.set()
+
+    def refresh(self):
+        projects = tuple(self.hot_projects())
+        version = read_data_version()
+        timeline, relational = {}, {}
+        for p in projects:
+            timeline[p] = self._fetch_timeline("1970-01-01", projects=[p], limit=WARM_TIMELINE_WINDOW)
+            relational[p] = self._fetch_relational(projects=[p], limit=WARM_RELATIONAL_LIMIT)
+
+        records = {r.log_id: r for rows in list(timeline.values()) + list(relational.values()) for r in rows if r.log_id}
+        ids = list(records)
+        # Log content never changes under a log_id, so only records new to the snapshot are encoded
+        previous = self._vectors
+        vectors = {i: previous[i] for i in ids if i in previous}
+        new_ids = [i for i in ids if i not in vectors]
+        if new_ids:
+            encoded = self._encode([records[i].content for i in new_ids])
+            vectors.update(zip(new_ids, np.asarray(encoded)))
+        boosts = self._fetch_boosts(ids)
+
+        with self._lock:
+            if self._stopped:
+                return
+            self._timeline, self._relational = timeline, relational
+            self._vectors, self._boosts = vectors, {i: boosts.get(i, 0.0) for i in ids}
+            self._warm_projects, self._version = projects, version
+        self._stats["refreshes"] += 1
+
+    def stop(self):
+        """Stop refreshing and drop the snapshot; every lookup misses from then on."""
+        with self._lock:
+            self._stopped = True
+            self._timeline, self._relational, self._vectors, self._boosts = {}, {}, {}, {}
+            self._warm_projects, self._version = (), None
+        self._refresh_event.set()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        refreshed_at = 0.0
+        while not self._stopped:
+            # Re-check the data version more often than the full interval
+            requested = self._refresh_event.wait(timeout=min(WARM_POLL_SECONDS, WARM_INTERVAL_SECONDS))
+            if not (requested or read_data_version() != self._version
+                    or time.time() - refreshed_at >= WARM_INTERVAL_SECONDS):
+                continue
+            self._refresh_event.clear()
+            if self._stopped:
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Cache warmer refresh failed: {e}")
+            refreshed_at = time.time()
+
+def _copy(record):
+    # Callers mutate score/rrf_score; keep the snapshot untouched
+    clone = type(record).__new__(type(record))
+    for slot in type(record).__slots__:
+        setattr(clone, slot, getattr(record, slot))
+    if clone.extra:
+        clone.extra = dict(clone.extra)
+    return clone
@@ -1,8 +1,11 @@
 # check_speakers.py
 
-import json
+from log_store import ensure_log_store, open_log_table
 
-with open("../data/filtered_memory_logs.jsonl") as f:
-    for i, line in enumerate(f, 1):
-        log = json.loads(line)
-        print(f"{i:03d}: {log.get('speaker', 'Missing')}")
+table = open_log_table(ensure_log_store("../data/filtered_memory_logs.jsonl"))
+if "speaker" in table.column_names:
+    speakers = table.column("speaker").fill_null("Missing").to_pylist()
+else:
+    speakers = ["Missing"] * table.num_rows
+
+print("\n".join(f"{i:03d}: {speaker}" for i, speaker in enumerate(speakers, 1)))
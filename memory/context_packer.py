@@ -0,0 +1,124 @@
+# core/context_packer.py
+
+import os
+import re
+
+try:
+    import tiktoken
+    _encoding = tiktoken.encoding_for_model("gpt-4")
+except Exception:
+    _encoding = None  # fall back to a character-based estimate
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1200))
+NEAR_DUPLICATE_THRESHOLD = 0.8   # Jaccard similarity over word shingles
+MIN_TRUNCATED_TOKENS = 24        # below this, drop an entry instead of truncating
+
+_WORD_RE = re.compile(r"\w+")
+
+def count_tokens(text):
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+def truncate_to_tokens(text, max_tokens):
+    if _encoding is not None:
+        tokens = _encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return _encoding.decode(tokens[:max_tokens]).rstrip() + " ..."
+    if len(text) <= max_tokens * 4:
+        return text
+    return text[:max_tokens * 4].rstrip() + " ..."
+
+def render_log_entry(log):
+    """Text of a single log as it appears in the prompt (used for token counting)."""
+    return f"({log.get('timestamp', 'Unknown time')}) | Speaker: {log.get('user', 'Unknown')}\n{log.get('content', '')}"
+
+def _shingles(text, n=2):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < n:
+        return set(words)
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def collapse_near_duplicates(logs, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Merge logs whose content is near-identical into the highest-scoring one.
+    Merged logs are kept as citations under log["duplicates"].
+    """
+    kept = []
+    kept_shingles = []
+    merged = 0
+    for log in sorted(logs, key=lambda x: x.get("score", 0), reverse=True):
+        shingles = _shingles(str(log.get("content", "")))
+        for canonical, canonical_shingles in zip(kept, kept_shingles):
+            if _jaccard(shingles, canonical_shingles) >= threshold:
+                canonical.setdefault("duplicates", []).append({
+                    "log_id": log.get("log_id"),
+                    "timestamp": log.get("timestamp"),
+                    "user": log.get("user"),
+                })
+                merged += 1
+                break
+        else:
+            kept.append(dict(log))
+            kept_shingles.append(shingles)
+    return kept, merged
+
+def pack_context(logs, token_budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Fill a token budget with the highest-scoring logs.
+
+    Near-duplicates are collapsed first; entries that no longer fit are
+    truncated if enough budget remains, otherwise dropped.
+    Returns (packed_logs, stats).
+    """
+    tokens_before = sum(count_tokens(render_log_entry(log)) for log in logs)
+    candidates, merged = collapse_near_duplicates(logs)
+
+    packed = []
+    used = 0
+    truncated = 0
+    dropped = 0
+    for log in candidates:
+        cost = count_tokens(render_log_entry(log))
+        remaining = token_budget - used
+        if cost <= remaining:
+            packed.append(log)
+            used += cost
+            continue
+
+        overhead = cost - count_tokens(str(log.get("content", "")))
+        content_room = remaining - overhead
+        if content_room >= MIN_TRUNCATED_TOKENS:
+            # leave room for the " ..." marker
+            log["content"] = truncate_to_tokens(str(log.get("content", "")), content_room - 2)
+            log["truncated"] = True
+            packed.append(log)
+            used += count_tokens(render_log_entry(log))
+            truncated += 1
+        else:
+            dropped += 1
+
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": used,
+        "tokens_saved": tokens_before - used,
+        "merged": merged,
+        "truncated": truncated,
+        "dropped": dropped,
+        "budget": token_budget,
+    }
+    return packed, stats
+
+def format_citation(log):
+    """Timestamps of the log plus any near-duplicates folded into it."""
+    stamps = [str(log.get("timestamp", "Unknown time"))]
+    stamps += [str(dup.get("timestamp")) for dup in log.get("duplicates", [])]
+    return "; ".join(stamps)
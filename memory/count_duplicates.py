@@ -1,25 +1,35 @@
-from collections import Counter
-import json
+import duckdb
+from log_store import ensure_log_store, iter_records
+from near_dup_index import NearDuplicateIndex
 
 # Update this path to your actual file location
 input_path = "../data/memory_logs_with_historic_impact.jsonl"
 
-# Load logs
-with open(input_path, "r") as f:
-    logs = [json.loads(line) for line in f]
+# Query the columnar log store directly instead of loading every log
+store = ensure_log_store(input_path)
+conn = duckdb.connect()
+conn.execute(f"CREATE VIEW logs AS SELECT * FROM read_parquet('{store}')")
 
-# Count duplicate content
-content_counts = Counter(log["content"] for log in logs)
+total, unique = conn.execute("SELECT COUNT(*), COUNT(DISTINCT content) FROM logs").fetchone()
 
-# Find duplicates
-duplicates = {text: count for text, count in content_counts.items() if count > 1}
+# Find duplicates (by content)
+duplicates = conn.execute("""
+    SELECT content, COUNT(*) AS n
+    FROM logs
+    GROUP BY content
+    HAVING COUNT(*) > 1
+    ORDER BY n DESC, content
+""").fetchall()
 
 # Summary
-print(f"Total logs: {len(logs)}")
-print(f"Unique content entries: {len(content_counts)}")
+print(f"Total logs: {total}")
+print(f"Unique content entries: {unique}")
 print(f"Duplicate entries (by content): {len(duplicates)}")
 print("\nSample duplicate contents and their counts:")
-for i, (text, count) in enumerate(duplicates.items()):
+for i, (text, count) in enumerate(duplicates[:5]):
     print(f"{i+1}. {count}x - {text}")
-    if i == 4:  # Show only first 5
-        break
+
+# Near duplicates (e.g. same content, shifted timestamp or small edits) via a throwaway LSH index
+index = NearDuplicateIndex(path=None)
+near_duplicates = sum(index.add(log)[1] for log in iter_records(store))
+print(f"\nNear-duplicate logs (MinHash LSH): {near_duplicates}")
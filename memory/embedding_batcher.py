@@ -0,0 +1,134 @@
+# core/embedding_batcher.py
+
+import os
+import time
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+MAX_BATCH_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", 32))
+MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", 3))
+
+class LazyModel:
+    """
+    SentenceTransformer that loads on first encode, so importing a module
+    that holds one (tests, CLI tools) does not load weights.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.name)
+        return self._model
+
+    def encode(self, *args, **kwargs):
+        return self.load().encode(*args, **kwargs)
+
+class EmbeddingBatcher:
+    """
+    Gathers concurrent encode requests into batches of up to max_batch_size,
+    waiting at most max_wait_ms after the first request, and runs each batch
+    as a single model.encode() call on a dispatcher thread.
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._encode_seconds = 0.0
+        self._max_queue_depth = 0
+        self._batch_sizes = Counter()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, text):
+        """Queue one text; returns a Future resolving to its embedding (numpy array)."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def encode(self, text, timeout=None):
+        """Blocking drop-in for model.encode(text) on a single string."""
+        return self.submit(text).result(timeout=timeout)
+
+    def encode_many(self, texts, timeout=None):
+        futures = [self.submit(t) for t in texts]
+        return [f.result(timeout=timeout) for f in futures]
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            batch = [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [t for t, _ in batch]
+            start = time.perf_counter()
+            try:
+                vectors = self.model.encode(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, f in batch:
+                    f.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            for (_, f), vector in zip(batch, vectors):
+                f.set_result(vector)
+
+            with self._metrics_lock:
+                self._batches += 1
+                self._encode_seconds += elapsed
+                self._batch_sizes[len(batch)] += 1
+
+    def metrics(self):
+        with self._metrics_lock:
+            batches = self._batches
+            return {
+                "requests": self._requests,
+                "batches": batches,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "avg_batch_size": round(sum(k * v for k, v in self._batch_sizes.items()) / batches, 2) if batches else 0.0,
+                "max_batch_size": max(self._batch_sizes) if self._batch_sizes else 0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_encode_ms": round(1000 * self._encode_seconds / batches, 2) if batches else 0.0,
+            }
@@ -0,0 +1,208 @@
+# core/eval_sweep.py
+
+import os
+import re
+import time
+import random
+import itertools
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from synthetic_logs import templates, projects, users
+from context_packer import count_tokens
+from prompt_builder import build_prompt
+from query_planner import SOURCES
+from retrieval import get_combined_logs, get_duckdb_cursor, cache_warmer, CRAG_WEIGHTS, SPEAKER_WEIGHTS
+
+load_dotenv()
+
+# ---- Config ----
+EVAL_OUTPUT = "../data/eval_sweep.csv"
+EVAL_QUERIES_PER_KIND = int(os.getenv("EVAL_QUERIES_PER_KIND", 10))
+EVAL_MAX_CONFIGS = int(os.getenv("EVAL_MAX_CONFIGS", 0))      # 0 = full grid
+EVAL_RECALL_BAR = float(os.getenv("EVAL_RECALL_BAR", 0.5))
+EVAL_SEED = 7
+
+SWEEP_GRID = {
+    "top_k": [6, 12],
+    "source_limit": [3, 5, 8],
+    "threshold": [0.3, 0.4, 0.5],
+    "weights": {
+        "default": CRAG_WEIGHTS,
+        "semantic": {"semantic": 0.5, "recency": 0.15, "project": 0.15, "speaker": 0.05, "fusion": 0.15},
+        "recency": {"semantic": 0.25, "recency": 0.4, "project": 0.15, "speaker": 0.05, "fusion": 0.15},
+    },
+    "speakers": {
+        "default": SPEAKER_WEIGHTS,
+        "flat": {u: 0.5 for u in users},
+    },
+}
+
+# ---------------------- Labelled Queries ----------------------
+
+def load_ingested_logs():
+    # Labels must use the log_ids retrieval can return, so read what was ingested
+    # (timeline_logs holds the same records as Qdrant and Neo4j, appends included)
+    rows = get_duckdb_cursor().execute(
+        "SELECT log_id, user, project, type, content FROM timeline_logs"
+    ).fetchall()
+    return [dict(zip(("log_id", "user", "project", "type", "content"), row)) for row in rows]
+
+def _template_patterns():
+    # "{}" placeholders become capture groups so a generated log yields the phrases it was built from
+    patterns = []
+    for memory_type, items in templates.items():
+        for template in items:
+            regex = "^" + re.escape(template).replace(r"\{\}", "(.+?)") + "$"
+            patterns.append((memory_type, re.compile(regex)))
+    return patterns
+
+_IMPACT_RE = re.compile(r"^March revenue exceeded \$\d+K; (.+) milestone reached in sprint \d+\.$")
+
+def build_labelled_queries(logs, per_kind=EVAL_QUERIES_PER_KIND, seed=EVAL_SEED):
+    """
+    (kind, query, relevant_log_ids) built from the synthetic generator's
+    users, projects and content templates, so relevance is known exactly.
+    """
+    rng = random.Random(seed)
+    patterns = _template_patterns()
+    queries = []
+
+    # Who said what on which project (the test_retrieval.py query shape)
+    pairs = [(u, p) for u in users for p in projects]
+    for user, project in rng.sample(pairs, min(per_kind, len(pairs))):
+        relevant = {l["log_id"] for l in logs if l["user"] == user and l["project"] == project}
+        if relevant:
+            queries.append(("speaker_project", f"What did {user.capitalize()} say about {project}?", relevant))
+
+    # Decisions per project
+    for project in projects[:per_kind]:
+        relevant = {l["log_id"] for l in logs if l["type"] == "decision" and l["project"] == project}
+        if relevant:
+            queries.append(("decision", f"What decisions were made on {project}?", relevant))
+
+    # Topic lookups: recover a placeholder phrase and ask about it
+    topics = {}
+    for log in logs:
+        for _, pattern in patterns:
+            match = pattern.match(log["content"])
+            if match:
+                topics.setdefault(max(match.groups(), key=len), set()).add(log["log_id"])
+                break
+    for phrase in rng.sample(sorted(topics), min(per_kind, len(topics))):
+        relevant = {l["log_id"] for l in logs if phrase.lower() in l["content"].lower()}
+        queries.append(("topic", f"What happened with {phrase}?", relevant))
+
+    # Old high-impact milestones
+    impact = {}
+    for log in logs:
+        match = _IMPACT_RE.match(log["content"])
+        if match:
+            impact.setdefault(match.group(1), set()).add(log["log_id"])
+    for project in sorted(impact)[:per_kind]:
+        queries.append(("impact", f"When did {project} reach its milestone and what was March revenue?", impact[project]))
+
+    return queries
+
+# ---------------------- Metrics ----------------------
+
+def recall_at_k(retrieved_ids, relevant, k):
+    # Normalized by what fits in k, so broad queries are not capped below 1.0
+    hits = len(set(retrieved_ids[:k]) & relevant)
+    return hits / min(len(relevant), k)
+
+def reciprocal_rank(retrieved_ids, relevant):
+    for rank, log_id in enumerate(retrieved_ids, 1):
+        if log_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+def sweep_configs(grid=SWEEP_GRID, max_configs=EVAL_MAX_CONFIGS, seed=EVAL_SEED):
+    configs = [
+        {"top_k": top_k, "source_limit": limit, "threshold": threshold, "weights": w, "speakers": s}
+        for top_k, limit, threshold, w, s in itertools.product(
+            grid["top_k"], grid["source_limit"], grid["threshold"], grid["weights"], grid["speakers"]
+        )
+    ]
+    if max_configs and len(configs) > max_configs:
+        configs = random.Random(seed).sample(configs, max_configs)
+    return configs
+
+def evaluate_config(config, queries, grid=SWEEP_GRID):
+    limit = config["source_limit"]
+    recalls, rrs, latencies, tokens = [], [], [], []
+    for _, query, relevant in queries:
+        start = time.perf_counter()
+        retained = get_combined_logs(
+            query,
+            top_k=config["top_k"],
+            threshold=config["threshold"],
+            weights=grid["weights"][config["weights"]],
+            speaker_weights=grid["speakers"][config["speakers"]],
+            source_limits=dict.fromkeys(SOURCES, limit),
+        )
+        latencies.append(1000 * (time.perf_counter() - start))
+        retrieved_ids = [log["log_id"] for log in retained]
+        recalls.append(recall_at_k(retrieved_ids, relevant, config["top_k"]))
+        rrs.append(reciprocal_rank(retrieved_ids, relevant))
+        tokens.append(count_tokens(build_prompt(query, retained)))
+
+    return {
+        **config,
+        "recall@k": round(float(np.mean(recalls)), 4),
+        "mrr": round(float(np.mean(rrs)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+        "prompt_tokens": round(float(np.mean(tokens)), 1),
+    }
+
+def pareto_front(df):
+    """True for rows no other row beats on every axis (higher recall/MRR, lower latency/tokens)."""
+    better = df[["recall@k", "mrr"]].to_numpy()
+    cheaper = df[["p95_ms", "prompt_tokens"]].to_numpy()
+    front = []
+    for i in range(len(df)):
+        ge = (better >= better[i]).all(axis=1) & (cheaper <= cheaper[i]).all(axis=1)
+        gt = (better > better[i]).any(axis=1) | (cheaper < cheaper[i]).any(axis=1)
+        front.append(not (ge & gt).any())
+    return front
+
+def run_sweep():
+    logs = load_ingested_logs()
+    queries = build_labelled_queries(logs)
+    print(f"Built {len(queries)} labelled queries from {len(logs)} logs")
+
+    # A warmer filling up mid-sweep would make latency depend on config order;
+    # run every configuration against the stores
+    cache_warmer.stop()
+
+    # First call loads models and opens store connections; keep it out of the timings
+    get_combined_logs(queries[0][1])
+
+    configs = sweep_configs()
+    rows = []
+    for i, config in enumerate(configs, 1):
+        rows.append(evaluate_config(config, queries))
+        print(f"[{i}/{len(configs)}] {config} -> recall@k={rows[-1]['recall@k']} p95={rows[-1]['p95_ms']}ms")
+
+    df = pd.DataFrame(rows)
+    df["pareto"] = pareto_front(df)
+    df = df.sort_values(["pareto", "prompt_tokens", "p95_ms"], ascending=[False, True, True])
+    df.to_csv(EVAL_OUTPUT, index=False)
+
+    print("\nPareto-optimal configurations:")
+    print(df[df["pareto"]].drop(columns="pareto").to_string(index=False))
+
+    meets_bar = df[df["recall@k"] >= EVAL_RECALL_BAR]
+    if meets_bar.empty:
+        print(f"\nNo configuration reaches recall@k >= {EVAL_RECALL_BAR}")
+    else:
+        cheapest = meets_bar.sort_values(["prompt_tokens", "p95_ms"]).iloc[0]
+        print(f"\nCheapest configuration with recall@k >= {EVAL_RECALL_BAR}:")
+        print(cheapest.drop(labels="pareto").to_string())
+    print(f"\nFull results written to: {EVAL_OUTPUT}")
+    return df
+
+if __name__ == "__main__":
+    run_sweep()
@@ -2,12 +2,16 @@
 
 import os
 import ast
+import logging
 from openai import OpenAI
 from retrieval import get_combined_logs
+from context_packer import pack_context, format_citation, CONTEXT_TOKEN_BUDGET
+from llm_cache import cached_chat_completion
 from dotenv import load_dotenv
 
 load_dotenv()
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+logger = logging.getLogger("generate_response")
 
 def clean_response(text):
     text = text.strip()
@@ -25,7 +29,7 @@ def build_structured_prompt(query, logs):
     for i, log in enumerate(logs, 1):
         speaker = log.get("user", "Unknown")
         content = log.get("content", "No content.")
-        timestamp = log.get("timestamp", "Unknown time")
+        timestamp = format_citation(log)
         lines.append(f"Log {i} ({timestamp}) | Speaker: {speaker}\n{content}\n")
 
     lines.append(
@@ -35,8 +39,15 @@ def build_structured_prompt(query, logs):
     )
     return "\n".join(lines)
 
-def generate_response(query, debug=False):
-    logs = get_combined_logs(query)  # scored logs
+def generate_response(query, debug=False, token_budget=CONTEXT_TOKEN_BUDGET, bypass_cache=False, logs=None):
+    """Returns (raw_answer, memory_answer, pack_stats); pack_stats is the context_packer token report."""
+    if logs is None:
+        logs = get_combined_logs(query)  # scored logs
+    logs, pack_stats = pack_context(logs, token_budget=token_budget)
+    logger.info(
+        "Context packed: %d -> %d tokens (saved %d) for %r",
+        pack_stats["tokens_before"], pack_stats["tokens_after"], pack_stats["tokens_saved"], query
+    )
 
     if debug:
         print("Top Relevant Logs:")
@@ -44,12 +55,19 @@ def generate_response(query, debug=False):
             score = round(log.get("score", 0), 4)
             content = log.get("content", "")[:120].strip().replace("\n", " ")
             print(f"Log {i+1} | Score: {score} | {content}...")
+        print(
+            f"Context tokens: {pack_stats['tokens_after']}/{pack_stats['budget']} "
+            f"(saved {pack_stats['tokens_saved']}, merged {pack_stats['merged']}, "
+            f"truncated {pack_stats['truncated']}, dropped {pack_stats['dropped']})"
+        )
 
     memory_prompt = build_structured_prompt(query, logs)
 
     # Memory-grounded response
-    memory_response_raw = client.chat.completions.create(
+    memory_response_raw = cached_chat_completion(
+        client,
         model="gpt-4",
+        bypass=bypass_cache,
         messages=[
             {
                 "role": "system",
@@ -61,22 +79,24 @@ def generate_response(query, debug=False):
             },
             {"role": "user", "content": memory_prompt},
         ]
-    ).choices[0].message.content
+    )
 
     # Raw response without memory
-    raw_response_raw = client.chat.completions.create(
+    raw_response_raw = cached_chat_completion(
+        client,
         model="gpt-4",
+        bypass=bypass_cache,
         messages=[
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": query},
         ]
-    ).choices[0].message.content
+    )
 
-    return clean_response(raw_response_raw), clean_response(memory_response_raw)
+    return clean_response(raw_response_raw), clean_response(memory_response_raw), pack_stats
 
 if __name__ == "__main__":
     user_query = input("Ask a question: ")
-    raw, grounded = generate_response(user_query, debug=True)
+    raw, grounded, _ = generate_response(user_query, debug=True)
 
     print("\nLLM Only:\n", raw)
     print("\nLLM + Memory:\n", grounded)
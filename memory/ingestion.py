@@ -2,8 +2,10 @@
 
 import json
 import os
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
+from log_store import ensure_log_store, iter_records, count_logs
+from near_dup_index import get_near_dup_index
 
 # File paths
 INPUT_FILE = "../data/memory_logs_with_duplicates.jsonl"
@@ -13,38 +15,37 @@ OUTPUT_FILE = "data/filtered_memory_logs.jsonl"
 model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def load_logs(path):
-    with open(path, "r") as f:
-        return [json.loads(line) for line in f]
+    # Streams records from the columnar log store
+    return iter_records(ensure_log_store(path))
 
 def save_logs(path, logs):
     with open(path, "w") as f:
         for log in logs:
             f.write(json.dumps(log) + "\n")
 
-def deduplicate_logs(logs, similarity_threshold=0.9):
-    unique_logs = []
-    seen_embeddings = []
+def deduplicate_logs(logs, similarity_threshold=0.9, index=None):
+    """
+    Near-duplicate filter backed by the persistent MinHash-LSH index: each log
+    is checked against LSH candidates only, and the embedding is computed just
+    to confirm a candidate. Duplicates are recorded as aliases of the canonical log_id.
+    """
+    if index is None:
+        index = get_near_dup_index(
+            embed_fn=lambda text: model.encode(text),
+            embedding_threshold=similarity_threshold
+        )
 
+    unique_logs = []
     for log in tqdm(logs, desc="Filtering logs"):
-        content = log["content"]
-        embedding = model.encode(content, convert_to_tensor=True)
-
-        is_duplicate = False
-        for existing in seen_embeddings:
-            sim_score = util.pytorch_cos_sim(embedding, existing).item()
-            if sim_score > similarity_threshold:
-                is_duplicate = True
-                break
-
+        _, is_duplicate = index.add(log)
         if not is_duplicate:
-            seen_embeddings.append(embedding)
             unique_logs.append(log)
 
     return unique_logs
 
 if __name__ == "__main__":
     logs = load_logs(INPUT_FILE)
-    print(f"🔍 Loaded {len(logs)} logs with possible duplicates.")
+    print(f"🔍 Loaded {count_logs(ensure_log_store(INPUT_FILE))} logs with possible duplicates.")
 
     filtered = deduplicate_logs(logs)
     print(f"Deduplicated logs: {len(filtered)} remaining.")
@@ -0,0 +1,159 @@
+# core/llm_cache.py
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# === Config ===
+# SQLite in WAL mode: the service and the summarizer share the cache from separate processes
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "../data/llm_cache.sqlite")
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "0") == "1"
+CACHE_BUSY_TIMEOUT_SECONDS = 5   # wait for another process's write before going uncached
+
+_conn = None
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "bypassed": 0, "unavailable": 0}
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        # Autocommit; readers never block the writer and other processes' writes wait up to the busy timeout
+        _conn = sqlite3.connect(CACHE_PATH, timeout=CACHE_BUSY_TIMEOUT_SECONDS,
+                                isolation_level=None, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_completions (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                created_at DOUBLE,
+                last_access DOUBLE,
+                hits INTEGER
+            )
+        """)
+    return _conn
+
+# === Prompt fingerprint ===
+def fingerprint(model, messages, params=None):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params or {}},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key, ttl=CACHE_TTL_SECONDS):
+    now = time.time()
+    with _lock:
+        try:
+            conn = _get_conn()
+            row = conn.execute(
+                "SELECT response, created_at FROM llm_completions WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            print(f"LLM cache unavailable, calling the model uncached: {e}")
+            _stats["unavailable"] += 1
+            return None
+        if row is None:
+            _stats["misses"] += 1
+            return None
+        response, created_at = row
+        expired = now - created_at > ttl
+        try:
+            if expired:
+                conn.execute("DELETE FROM llm_completions WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "UPDATE llm_completions SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                    (now, key)
+                )
+        except sqlite3.OperationalError:
+            pass  # bookkeeping only; another process held the write lock past the busy timeout
+        if expired:
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+        return response
+
+def put(key, model, response):
+    now = time.time()
+    with _lock:
+        try:
+            conn = _get_conn()
+            conn.execute("""
+                INSERT INTO llm_completions (key, model, response, created_at, last_access, hits)
+                VALUES (?, ?, ?, ?, ?, 0)
+                ON CONFLICT (key) DO UPDATE SET
+                    response = excluded.response,
+                    created_at = excluded.created_at,
+                    last_access = excluded.last_access
+            """, (key, model, response, now, now))
+            _evict(conn)
+        except sqlite3.OperationalError as e:
+            print(f"LLM cache unavailable, completion not stored: {e}")
+            _stats["unavailable"] += 1
+
+def _evict(conn):
+    # Size-based eviction: drop least recently used entries above the cap
+    count = conn.execute("SELECT COUNT(*) FROM llm_completions").fetchone()[0]
+    overflow = count - CACHE_MAX_ENTRIES
+    if overflow > 0:
+        conn.execute("""
+            DELETE FROM llm_completions WHERE key IN (
+                SELECT key FROM llm_completions ORDER BY last_access ASC LIMIT ?
+            )
+        """, (int(overflow),))
+        _stats["evicted"] += overflow
+
+def purge_expired(ttl=CACHE_TTL_SECONDS):
+    with _lock:
+        cutoff = time.time() - ttl
+        removed = _get_conn().execute("DELETE FROM llm_completions WHERE created_at < ?", (cutoff,)).rowcount
+        _stats["expired"] += removed
+        return removed
+
+def cache_stats():
+    stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    with _lock:
+        stats["entries"] = _get_conn().execute("SELECT COUNT(*) FROM llm_completions").fetchone()[0]
+    return stats
+
+# === Cached chat completion ===
+def cached_chat_completion(client, model, messages, bypass=False, **params):
+    """
+    Return the message content of a chat completion, served from the
+    persistent cache when the same (model, messages, params) was seen before.
+    """
+    if bypass or CACHE_BYPASS:
+        with _lock:
+            _stats["bypassed"] += 1
+        return client.chat.completions.create(
+            model=model, messages=messages, **params
+        ).choices[0].message.content
+
+    key = fingerprint(model, messages, params)
+    cached = get(key)
+    if cached is not None:
+        return cached
+
+    content = client.chat.completions.create(
+        model=model, messages=messages, **params
+    ).choices[0].message.content
+    put(key, model, content)
+    return content
+
+if __name__ == "__main__":
+    removed = purge_expired()
+    print(f"Purged {removed} expired completions.")
+    print(cache_stats())
@@ -0,0 +1,150 @@
+# core/log_record.py
+
+import sys
+from datetime import datetime
+import numpy as np
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+def parse_timestamp(value):
+    """
+    Naive datetime from ISO strings, pandas Timestamps or neo4j DateTimes;
+    None if missing or unparseable. UTC offsets are dropped (wall time kept)
+    so parsed values always compare with each other.
+    """
+    if value is None:
+        return None
+    if hasattr(value, "to_native"):        # neo4j.time.DateTime
+        value = value.to_native()
+    if hasattr(value, "to_pydatetime"):    # pandas.Timestamp
+        if value != value:                 # pandas.NaT
+            return None
+        value = value.to_pydatetime()
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    return value.replace(tzinfo=None)
+
+class LogRecord:
+    """
+    Compact log representation used from retrieval through scoring and prompt
+    building. Repeated strings (user, project, type, source, session) are
+    interned and the timestamp is parsed once. Supports the dict-style access
+    (get / [] / keys) the rest of the pipeline already uses; unknown keys land
+    in `extra`.
+    """
+
+    __slots__ = (
+        "log_id", "timestamp", "parsed_time", "user", "project", "type",
+        "content", "session_id", "source", "score", "rrf_score", "extra",
+    )
+
+    FIELDS = ("log_id", "timestamp", "user", "project", "type", "content", "session_id")
+
+    def __init__(self, log_id, timestamp=None, user=None, project=None, type=None,
+                 content="", session_id=None, source=None, score=None, extra=None):
+        self.log_id = log_id
+        self.parsed_time = parse_timestamp(timestamp)
+        self.timestamp = self.parsed_time.isoformat() if self.parsed_time else timestamp
+        self.user = _intern(user)
+        self.project = _intern(project)
+        self.type = _intern(type)
+        self.content = content or ""
+        self.session_id = _intern(session_id)
+        self.source = _intern(source)
+        self.score = score
+        self.rrf_score = None
+        self.extra = extra
+
+    # ---- dict compatibility ----
+    def get(self, key, default=None):
+        if key in self.__slots__ and key != "extra":
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        if key in self.__slots__ and key != "extra":
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.__slots__ and key not in ("extra", "parsed_time"):
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        keys = [k for k in self.FIELDS + ("source", "score", "rrf_score") if getattr(self, k) is not None]
+        return keys + list(self.extra or ())
+
+    def to_dict(self):
+        return {k: self[k] for k in self.keys()}
+
+    def __repr__(self):
+        return f"LogRecord({self.log_id!r}, {self.timestamp!r}, {self.user!r}, {self.project!r})"
+
+    # ---- converters ----
+    @classmethod
+    def from_dict(cls, data, source=None):
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS and k not in ("source", "score")}
+        return cls(
+            data.get("log_id"), data.get("timestamp"), data.get("user"), data.get("project"),
+            data.get("type"), data.get("content"), data.get("session_id"),
+            source=source or data.get("source"), score=data.get("score"), extra=extra or None
+        )
+
+    @classmethod
+    def from_qdrant(cls, point, source="Qdrant"):
+        record = cls.from_dict(point.payload, source=source)
+        record.score = point.score
+        return record
+
+    @classmethod
+    def from_neo4j(cls, node, source="Neo4j"):
+        props = dict(node)
+        # Neo4j_store writes the id as "id"; appended logs also set "log_id"
+        props.setdefault("log_id", props.pop("id", None))
+        return cls.from_dict(props, source=source)
+
+    @classmethod
+    def from_dataframe(cls, df, source="DuckDB"):
+        """One LogRecord per row, reading columns directly instead of via to_dict("records")."""
+        columns = list(df.columns)
+        extra_cols = [c for c in columns if c not in cls.FIELDS]
+        values = [df[c].tolist() if c in columns else [None] * len(df) for c in cls.FIELDS]
+        extras = [df[c].tolist() for c in extra_cols]
+        records = []
+        for i, row in enumerate(zip(*values)):
+            extra = {c: col[i] for c, col in zip(extra_cols, extras)} or None
+            records.append(cls(*row, source=source, extra=extra))
+        return records
+
+# ---- columnar view for batch scoring ----
+def to_columns(records):
+    """
+    Column arrays over a candidate list so scoring heads run as NumPy
+    vector ops instead of per-record Python.
+    """
+    epoch = np.array(
+        [r.parsed_time.timestamp() if r.parsed_time else np.nan for r in records], dtype=np.float64
+    )
+    return {
+        "log_id": [r.log_id for r in records],
+        "content": [r.content for r in records],
+        "user": np.array([(r.user or "").lower() for r in records], dtype=object),
+        "project": np.array([r.project for r in records], dtype=object),
+        "epoch": epoch,
+    }
@@ -0,0 +1,111 @@
+# core/log_store.py
+
+import os
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+
+# Canonical columnar copy of the raw JSONL logs. Parquet on disk, read through
+# memory-mapped Arrow so scripts share pages with the OS cache instead of
+# holding a list of dicts per process.
+SOURCE_JSONL = "../data/memory_logs_with_historic_impact.jsonl"
+# Bumped when the on-disk layout changes so ensure_log_store rebuilds older stores
+STORE_FORMAT = b"2"
+
+LOG_SCHEMA = pa.schema([
+    ("log_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("user", pa.string()),
+    ("project", pa.string()),
+    ("type", pa.string()),
+    ("content", pa.string()),
+    ("session_id", pa.string()),
+])
+
+def store_path(jsonl_path=SOURCE_JSONL):
+    return os.path.splitext(jsonl_path)[0] + ".parquet"
+
+def build_log_store(jsonl_path=SOURCE_JSONL, parquet_path=None):
+    parquet_path = parquet_path or store_path(jsonl_path)
+    table = pa_json.read_json(
+        jsonl_path,
+        parse_options=pa_json.ParseOptions(
+            explicit_schema=LOG_SCHEMA,
+            unexpected_field_behavior="infer"
+        )
+    )
+    # Rows keep file order: ingestion keeps the first of each duplicate and
+    # check_speakers numbers logs as they appear, so the store must not reorder
+    table = table.replace_schema_metadata({b"log_store_format": STORE_FORMAT})
+    pq.write_table(
+        table, parquet_path,
+        row_group_size=8192,
+        use_dictionary=["user", "project", "type", "session_id"],
+        compression="zstd"
+    )
+    print(f"Wrote {table.num_rows} logs to {parquet_path}")
+    return parquet_path
+
+def ensure_log_store(jsonl_path=SOURCE_JSONL):
+    """Parquet path for a JSONL file, (re)building it when missing or stale."""
+    parquet_path = store_path(jsonl_path)
+    if (not os.path.exists(parquet_path)
+            or os.path.getmtime(parquet_path) < os.path.getmtime(jsonl_path)
+            or _store_format(parquet_path) != STORE_FORMAT):
+        build_log_store(jsonl_path, parquet_path)
+    return parquet_path
+
+def _store_format(parquet_path):
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    return metadata.get(b"log_store_format")
+
+def _to_timestamp(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return pa.scalar(value, type=pa.timestamp("us"))
+
+def build_filter(projects=None, since=None, until=None):
+    expr = None
+    if projects:
+        expr = pc.field("project").isin(list(projects))
+    if since is not None:
+        cond = pc.field("timestamp") >= _to_timestamp(since)
+        expr = cond if expr is None else expr & cond
+    if until is not None:
+        cond = pc.field("timestamp") < _to_timestamp(until)
+        expr = cond if expr is None else expr & cond
+    return expr
+
+def open_log_table(path=None, projects=None, since=None, until=None, columns=None):
+    """Memory-mapped Arrow table with project/time predicates pushed down to row groups."""
+    path = path or ensure_log_store()
+    return pq.read_table(
+        path,
+        columns=columns,
+        filters=build_filter(projects, since, until),
+        memory_map=True
+    )
+
+def count_logs(path=None):
+    path = path or ensure_log_store()
+    return pq.ParquetFile(path, memory_map=True).metadata.num_rows
+
+def iter_records(path=None, projects=None, since=None, until=None, batch_size=1024):
+    """
+    Stream logs as dicts (timestamps as ISO strings, like the JSONL) for
+    code that still works record by record.
+    """
+    path = path or ensure_log_store()
+    dataset = ds.dataset(path, format="parquet")
+    for batch in dataset.to_batches(filter=build_filter(projects, since, until), batch_size=batch_size):
+        for record in batch.to_pylist():
+            ts = record.get("timestamp")
+            if isinstance(ts, datetime):
+                record["timestamp"] = ts.isoformat()
+            yield record
+
+if __name__ == "__main__":
+    build_log_store()
@@ -0,0 +1,206 @@
+# core/near_dup_index.py
+
+import os
+import re
+import zlib
+import shutil
+import hashlib
+import threading
+import numpy as np
+import duckdb
+
+# ---- Config ----
+INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", "../data/near_dup_index.duckdb")
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5            # character shingles, robust for short log lines
+JACCARD_THRESHOLD = 0.8     # estimated from MinHash agreement
+EMBEDDING_THRESHOLD = 0.9   # optional confirmation on LSH candidates
+# Character shingles barely move when only a figure changes ("$58K" vs "$95K",
+# "sprint 9" vs "sprint 6"), so numbers must match exactly on top of the estimate.
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240401)  # fixed: signatures are persisted
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.int64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.int64)
+_WS_RE = re.compile(r"\s+")
+
+def _normalize(text):
+    return _WS_RE.sub(" ", str(text).lower()).strip()
+
+def number_tokens(text):
+    return sorted(_NUMBER_RE.findall(str(text)))
+
+def minhash_signature(text):
+    text = _normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        grams = {text}
+    else:
+        grams = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) % _PRIME for g in grams), dtype=np.int64, count=len(grams)
+    )
+    # (a*x + b) mod p stays below 2^63 because a, x < 2^31
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+def band_hashes(signature):
+    out = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        out.append((band, int.from_bytes(digest, "little", signed=True)))
+    return out
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash-LSH index over log content. check() looks up a log in
+    O(BANDS) bucket probes; add() either registers the log as canonical or
+    records it as an alias of the canonical log_id it duplicates.
+    Pass path=None for a throwaway in-memory index.
+    """
+
+    def __init__(self, path=INDEX_PATH, jaccard_threshold=JACCARD_THRESHOLD,
+                 embed_fn=None, embedding_threshold=EMBEDDING_THRESHOLD):
+        self.jaccard_threshold = jaccard_threshold
+        self.embed_fn = embed_fn
+        self.embedding_threshold = embedding_threshold
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._signatures = {}
+        self._contents = {}
+        self._aliases = {}
+        self._vectors = {}
+        self._path = path
+        self._conn = duckdb.connect(path or ":memory:")
+        self._init_tables()
+        self._load()
+
+    def _init_tables(self):
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lsh_signatures (
+                log_id TEXT PRIMARY KEY,
+                signature BLOB,
+                content TEXT
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS lsh_buckets (band INTEGER, bucket BIGINT, log_id TEXT)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS log_aliases (
+                alias_id TEXT PRIMARY KEY,
+                canonical_id TEXT,
+                timestamp TEXT
+            )
+        """)
+
+    def _load(self):
+        for log_id, blob, content in self._conn.execute("SELECT * FROM lsh_signatures").fetchall():
+            self._signatures[log_id] = np.frombuffer(blob, dtype=np.int64)
+            self._contents[log_id] = content
+        for band, bucket, log_id in self._conn.execute("SELECT * FROM lsh_buckets").fetchall():
+            self._buckets.setdefault((band, bucket), []).append(log_id)
+        for alias_id, canonical_id, _ in self._conn.execute("SELECT * FROM log_aliases").fetchall():
+            self._aliases[alias_id] = canonical_id
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _confirmed(self, content, candidate_id, vector=None):
+        if number_tokens(content) != number_tokens(self._contents[candidate_id]):
+            return False
+        if self.embed_fn is None:
+            return True
+        if candidate_id not in self._vectors:
+            self._vectors[candidate_id] = np.asarray(self.embed_fn(self._contents[candidate_id]))
+        a = np.asarray(self.embed_fn(content) if vector is None else vector)
+        b = self._vectors[candidate_id]
+        sim = float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) or 1.0))
+        return sim >= self.embedding_threshold
+
+    def _find(self, content, signature, bands, vector=None):
+        candidates = set()
+        for key in bands:
+            candidates.update(self._buckets.get(key, ()))
+        best_id, best_sim = None, 0.0
+        for candidate_id in candidates:
+            sim = float(np.mean(self._signatures[candidate_id] == signature))
+            if sim > best_sim:
+                best_id, best_sim = candidate_id, sim
+        if best_id and best_sim >= self.jaccard_threshold and self._confirmed(content, best_id, vector):
+            return best_id
+        return None
+
+    def check(self, log, vector=None):
+        """
+        canonical log_id that `log` near-duplicates, or None. `vector` is the
+        log's embedding, if the caller already has it, for the confirmation step.
+        """
+        signature = minhash_signature(log["content"])
+        with self._lock:
+            return self._find(log["content"], signature, band_hashes(signature), vector)
+
+    def add(self, log, vector=None):
+        """
+        Returns (canonical_id, is_duplicate). Duplicates are recorded as
+        aliases and not indexed themselves.
+        """
+        log_id = log["log_id"]
+        signature = minhash_signature(log["content"])
+        bands = band_hashes(signature)
+        with self._lock:
+            if log_id in self._aliases:
+                return self._aliases[log_id], True
+            if log_id in self._signatures:
+                return log_id, False
+
+            canonical = self._find(log["content"], signature, bands, vector)
+            if canonical is not None:
+                self._aliases[log_id] = canonical
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO log_aliases VALUES (?, ?, ?)",
+                    (log_id, canonical, str(log.get("timestamp", "")))
+                )
+                return canonical, True
+
+            self._signatures[log_id] = signature
+            self._contents[log_id] = log["content"]
+            if vector is not None:
+                self._vectors[log_id] = np.asarray(vector)
+            for key in bands:
+                self._buckets.setdefault(key, []).append(log_id)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lsh_signatures VALUES (?, ?, ?)",
+                (log_id, signature.tobytes(), log["content"])
+            )
+            self._conn.executemany(
+                "INSERT INTO lsh_buckets VALUES (?, ?, ?)",
+                [(band, bucket, log_id) for band, bucket in bands]
+            )
+            return log_id, False
+
+    def backup(self, dst):
+        """Checkpoint and copy the index file; add() is blocked meanwhile so the copy is consistent."""
+        with self._lock:
+            self._conn.execute("CHECKPOINT")
+            shutil.copy2(self._path, dst)
+
+_index = None
+_index_kwargs = None
+_index_lock = threading.Lock()
+
+def get_near_dup_index(**kwargs):
+    """
+    Process-wide index. The first call's kwargs configure it; later calls
+    may omit kwargs but must not pass different ones.
+    """
+    global _index, _index_kwargs
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex(**kwargs)
+            _index_kwargs = kwargs
+        elif kwargs and kwargs != _index_kwargs:
+            raise ValueError(
+                f"near-dup index already configured with {_index_kwargs}, got {kwargs}"
+            )
+    return _index
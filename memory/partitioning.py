@@ -0,0 +1,63 @@
+# core/partitioning.py
+
+import os
+import re
+import glob
+import uuid
+from datetime import datetime
+
+# Hive-partitioned Parquet copy of timeline_logs: project_key=<slug>/month=<YYYY-MM>/
+PARTITION_ROOT = "../data/timeline_partitions"
+# Append flushes add one small file per touched partition; past this many the partition is rewritten
+PARTITION_COMPACT_FILES = int(os.getenv("PARTITION_COMPACT_FILES", 16))
+
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+# SQL twin of project_key(), used when writing the partitions from DuckDB
+PROJECT_KEY_SQL = "trim(regexp_replace(lower(project), '[^a-z0-9]+', '_', 'g'), '_')"
+
+def project_key(project):
+    return _SLUG_RE.sub("_", str(project).lower()).strip("_")
+
+def month_key(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return f"{timestamp.year}-{timestamp.month:02}"
+
+def partition_dir(project, timestamp, root=PARTITION_ROOT):
+    return os.path.join(root, f"project_key={project_key(project)}", f"month={month_key(timestamp)}")
+
+def compact_partition(cursor, directory, max_files=PARTITION_COMPACT_FILES):
+    """
+    Rewrite a partition directory holding more than `max_files` Parquet files
+    as one file, dropping rows a replayed append wrote twice. The new file
+    appears under its final name before the old ones are removed, so a
+    concurrent reader sees rows twice rather than not at all (a read that
+    hits a removed file falls back to timeline_logs). Returns True if it compacted.
+    """
+    files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+    if len(files) <= max_files:
+        return False
+    file_list = ", ".join(f"'{f}'" for f in files)
+    tmp_path = os.path.join(directory, f"compact_{uuid.uuid4().hex}.tmp")
+    cursor.execute(f"""
+        COPY (
+            SELECT * FROM read_parquet([{file_list}])
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY log_id ORDER BY timestamp) = 1
+            ORDER BY timestamp
+        ) TO '{tmp_path}' (FORMAT PARQUET)
+    """)
+    os.replace(tmp_path, tmp_path[:-len(".tmp")] + ".parquet")
+    for f in files:
+        os.remove(f)
+    return True
+
+def detect_projects(query, known_projects):
+    """Known project names mentioned in the query (case-insensitive)."""
+    text = f" {_SLUG_RE.sub(' ', query.lower())} "
+    found = []
+    for project in known_projects:
+        name = f" {_SLUG_RE.sub(' ', project.lower()).strip()} "
+        if name.strip() and name in text:
+            found.append(project)
+    return found
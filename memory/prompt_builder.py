@@ -1,12 +1,17 @@
 # core/prompt_builder.py
 
-def build_prompt(query, logs):
+from context_packer import pack_context, format_citation, CONTEXT_TOKEN_BUDGET
+
+def build_prompt(query, logs, token_budget=CONTEXT_TOKEN_BUDGET, return_stats=False):
     """
     Build a prompt to guide the LLM in answering the user's query using context from memory logs.
+    Logs are packed into token_budget first (near-duplicates collapsed, low scorers truncated/dropped).
+    With return_stats=True, returns (prompt, pack_stats) so callers can report tokens saved.
     """
+    logs, pack_stats = pack_context(logs, token_budget=token_budget)
     context_blocks = []
     for i, log in enumerate(logs, 1):
-        timestamp = log.get("timestamp", "Unknown")
+        timestamp = format_citation(log)
         speaker = log.get("user", "Unknown")
         content = log.get("content", "").strip()
         project = log.get("project", "Unknown")
@@ -40,4 +45,6 @@ Based on this, provide a clear and informative answer.
 If no answer is possible, say so honestly.
 """
 
+    if return_stats:
+        return prompt.strip(), pack_stats
     return prompt.strip()
@@ -1,10 +1,12 @@
-import json
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct
+from qdrant_client.http.models import PointStruct, KeywordIndexParams, KeywordIndexType
 from sentence_transformers import SentenceTransformer
 import uuid
 import os
 from dotenv import load_dotenv
+from partitioning import month_key
+from log_store import ensure_log_store, iter_records
+from cache_warmer import bump_data_version
 
 load_dotenv()
 
@@ -19,13 +21,12 @@ model = SentenceTransformer(EMBED_MODEL)
 
 # ---- Load logs ----
 logs = []
-with open(DATA_FILE, "r") as f:
-    for line in f:
-        log = json.loads(line)
-        if "log_id" not in log:
-            log["log_id"] = str(uuid.uuid4())
-        log["archived"] = False  # for adaptive forgetting
-        logs.append(log)
+for log in iter_records(ensure_log_store(DATA_FILE)):
+    if not log.get("log_id"):
+        log["log_id"] = str(uuid.uuid4())
+    log["archived"] = False  # for adaptive forgetting
+    log["month"] = month_key(log["timestamp"])
+    logs.append(log)
 
 # ---- Embed and write to Qdrant ----
 points = []
@@ -38,9 +39,23 @@ for log in logs:
     )
     points.append(point)
 
+# Project is the tenant key: Qdrant co-locates each project's points and
+# builds per-project HNSW links, so project-filtered searches stay small
+qdrant.create_payload_index(
+    collection_name=QDRANT_COLLECTION,
+    field_name="project",
+    field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True)
+)
+qdrant.create_payload_index(
+    collection_name=QDRANT_COLLECTION,
+    field_name="month",
+    field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD)
+)
+
 print(f"Ingesting {len(points)} logs into Qdrant collection: {QDRANT_COLLECTION}")
 qdrant.upsert(
     collection_name=QDRANT_COLLECTION,
     points=points
 )
+bump_data_version()
 print("Ingestion complete.")
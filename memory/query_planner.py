@@ -0,0 +1,224 @@
+# core/query_planner.py
+
+import re
+import string
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from partitioning import detect_projects
+from log_record import parse_timestamp
+
+logger = logging.getLogger("query_planner")
+
+# ------------------------- Stopwords + Keyword Tools -------------------------
+
+STOPWORDS = {
+    "the", "was", "in", "of", "and", "to", "for", "on", "at", "a", "an", "is", "are", "it", "as", "by",
+    "that", "with", "be", "or", "from", "this", "which", "can", "but", "not", "if", "then", "do", "so",
+    "about", "into", "we", "our", "their", "your"
+}
+
+def extract_keywords(query):
+    query = query.translate(str.maketrans('', '', string.punctuation))  # remove punctuation
+    return [kw for kw in query.lower().split() if kw not in STOPWORDS and len(kw) > 2]
+
+# ------------------------- Query Features -------------------------
+
+SOURCES = ("semantic", "lexical", "timeline", "relational", "tail")
+DEFAULT_LIMITS = {"semantic": 5, "lexical": 5, "timeline": 5, "relational": 5, "tail": 5}
+
+MONTHS = {m.lower(): i for i, m in enumerate(
+    ["January", "February", "March", "April", "May", "June", "July",
+     "August", "September", "October", "November", "December"], 1)}
+_MONTH_NAMES = "|".join(MONTHS)
+# A bare month name is ambiguous ("may" is also a verb): require a date
+# preposition before it or a day/year after it
+_MONTH_RE = re.compile(
+    rf"\b(?:in|since|during|from|after|before|until|by|of)\s+(?P<pre>{_MONTH_NAMES})\b"
+    rf"|\b(?P<post>{_MONTH_NAMES})\s+(?:(?P<year>\d{{4}})|\d{{1,2}}(?:st|nd|rd|th)?)\b",
+    re.IGNORECASE
+)
+_ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+_PAST_N_RE = re.compile(r"\b(?:past|last)\s+(\d+)\s+(day|week|month)s?\b", re.IGNORECASE)
+_RELATIVE = {
+    "today": timedelta(days=1),
+    "yesterday": timedelta(days=2),
+    "this week": timedelta(days=7),
+    "last week": timedelta(days=14),
+    "this month": timedelta(days=31),
+    "last month": timedelta(days=62),
+    "last quarter": timedelta(days=184),
+    "recent": timedelta(days=14),
+    "recently": timedelta(days=14),
+    "latest": timedelta(days=14),
+}
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 31}
+# Questions about reasons and decisions need meaning, not just word overlap
+_SEMANTIC_INTENT_RE = re.compile(r"\b(why|how|decid\w*|reason\w*|explain|impact|caused?)\b", re.IGNORECASE)
+_QUOTED_RE = re.compile(r"\"([^\"]+)\"")
+# Words that carry no topic of their own when measuring keyword density
+_FILLER = {
+    "what", "when", "who", "whom", "where", "did", "does", "has", "have", "had", "say", "said",
+    "happened", "happen", "last", "past", "this", "week", "weeks", "month", "months", "day", "days",
+    "today", "yesterday", "quarter", "recent", "recently", "latest", "any", "there", "were", "all",
+} | set(MONTHS)
+
+def detect_since(query, now=None):
+    """Earliest timestamp implied by a time expression in the query, or None."""
+    now = now or datetime.now()
+    text = query.lower()
+
+    match = _PAST_N_RE.search(text)
+    if match:
+        return now - timedelta(days=int(match.group(1)) * _UNIT_DAYS[match.group(2).lower()])
+    for phrase, delta in _RELATIVE.items():
+        if re.search(rf"\b{phrase}\b", text):
+            return now - delta
+    match = _ISO_DATE_RE.search(text)
+    if match:
+        return datetime.fromisoformat(match.group(1))
+    match = _MONTH_RE.search(text)
+    if match:
+        month = MONTHS[(match.group("pre") or match.group("post")).lower()]
+        if match.group("year"):
+            year = int(match.group("year"))
+        else:
+            year = now.year if month <= now.month else now.year - 1
+        return datetime(year, month, 1)
+    return None
+
+def detect_users(query, known_users):
+    words = set(re.findall(r"\w+", query.lower()))
+    return [u for u in known_users if u and u.lower() in words]
+
+@dataclass
+class QueryPlan:
+    sources: dict
+    since: datetime = None
+    projects: list = field(default_factory=list)
+    users: list = field(default_factory=list)
+    keywords: list = field(default_factory=list)
+    reasons: list = field(default_factory=list)
+    # Sources run only when lexical/timeline come back short of their limits
+    fallback: list = field(default_factory=list)
+
+    def uses(self, source):
+        return self.sources.get(source, 0) > 0
+
+    def limit(self, source):
+        return self.sources.get(source, 0)
+
+    def skipped(self):
+        return [s for s in SOURCES if not self.uses(s)]
+
+def plan_query(query, known_projects=(), known_users=(), now=None, since=None):
+    """
+    Pick memory sources and per-source limits from cheap query features:
+    time expressions, known project/user names and keyword density.
+    An explicit `since` from the caller overrides any time expression in
+    the query and always turns the timeline head on.
+    """
+    keywords = extract_keywords(query)
+    words = re.findall(r"\w+", query)
+    explicit_since = since is not None
+    since = parse_timestamp(since) if explicit_since else detect_since(query, now)
+    projects = detect_projects(query, known_projects)
+    users = detect_users(query, known_users)
+
+    # Share of the query that is topical, ignoring names the filters already cover
+    entity_words = {w for name in projects + users for w in re.findall(r"\w+", name.lower())}
+    topical = [kw for kw in keywords if kw not in _FILLER and kw not in entity_words]
+    density = len(topical) / len(words) if words else 0.0
+    quoted = _QUOTED_RE.findall(query)
+    semantic_intent = bool(_SEMANTIC_INTENT_RE.search(query))
+
+    sources = dict(DEFAULT_LIMITS)
+    reasons = []
+    fallback = []
+
+    if since is not None:
+        sources["timeline"] = 10
+        origin = "explicit since" if explicit_since else "time expression"
+        reasons.append(f"{origin} -> timeline since {since:%Y-%m-%d}")
+    elif users and projects:
+        sources["timeline"] = 10
+        reasons.append("named user + project -> filtered timeline")
+    else:
+        sources["timeline"] = 0
+        reasons.append("no time expression -> skip timeline scan")
+
+    keyword_dense = bool(quoted) or density >= 0.5
+    if keyword_dense:
+        sources["lexical"] = 8
+        reasons.append("keyword-dense query -> widen lexical")
+    elif not topical and not projects:
+        # A project name is itself a useful BM25 term, so keep lexical when one is present
+        sources["lexical"] = 0
+        reasons.append("no topical keywords or project -> skip lexical")
+
+    if since is not None and not semantic_intent and not topical:
+        sources["semantic"] = 0
+        reasons.append("pure time lookup -> skip vector search")
+    elif keyword_dense and not semantic_intent:
+        fallback.append("semantic")
+        reasons.append("keyword lookup -> vector search only if lexical comes back short")
+
+    # The graph is anchored on named projects, or on the project the semantic and
+    # lexical heads point to; with neither there is nothing to expand from
+    if not projects and not sources["semantic"] and not sources["lexical"]:
+        sources["relational"] = 0
+        reasons.append("no named project and no head to infer one -> skip graph")
+
+    plan = QueryPlan(
+        sources=sources, since=since, projects=projects, users=users,
+        keywords=keywords, reasons=reasons, fallback=fallback
+    )
+    logger.debug("Plan for %r: sources=%s projects=%s users=%s since=%s reasons=%s",
+                 query, sources, projects, users, since, reasons)
+    return plan
+
+# ------------------------- Latency Accounting -------------------------
+
+class PlannerStats:
+    """
+    Per-source latency (EWMA) observed when a source runs, used to estimate
+    the time a plan saves compared with querying every source.
+    """
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self.latency_ms = {}
+        self.skips = {s: 0 for s in SOURCES}
+        self.queries = 0
+        self.saved_ms = 0.0
+
+    def record_latency(self, source, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            prev = self.latency_ms.get(source)
+            self.latency_ms[source] = ms if prev is None else (1 - self.alpha) * prev + self.alpha * ms
+
+    def record_plan(self, plan):
+        skipped = plan.skipped()
+        saved = sum(self.latency_ms.get(s, 0.0) for s in skipped)
+        with self._lock:
+            self.queries += 1
+            self.saved_ms += saved
+            for s in skipped:
+                self.skips[s] += 1
+        logger.debug("Plan skipped %s, estimated %.1f ms saved vs full fan-out", skipped, saved)
+        return saved
+
+    def summary(self):
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "skips": dict(self.skips),
+                "source_latency_ms": {k: round(v, 2) for k, v in self.latency_ms.items()},
+                "estimated_saved_ms_total": round(self.saved_ms, 1),
+                "estimated_saved_ms_per_query": round(self.saved_ms / self.queries, 2) if self.queries else 0.0,
+            }
+
+planner_stats = PlannerStats()
@@ -1,7 +1,7 @@
 from neo4j import GraphDatabase
-import json
 import os
 from dotenv import load_dotenv
+from log_store import ensure_log_store, iter_records
 
 # Load .env variables
 load_dotenv()
@@ -26,10 +26,8 @@ def add_project_relationships(tx, log):
 
 def main():
     with driver.session() as session:
-        with open(LOG_FILE, "r") as f:
-            for line in f:
-                log = json.loads(line)
-                session.write_transaction(add_project_relationships, log)
+        for log in iter_records(ensure_log_store(LOG_FILE)):
+            session.write_transaction(add_project_relationships, log)
     
     print("Project relationships added to Neo4j.")
 
@@ -1,166 +1,775 @@
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 import duckdb
 from neo4j import GraphDatabase
 import os
+import time
+import logging
+import threading
 from dotenv import load_dotenv
 import json
 import numpy as np
+import pyarrow as pa
 from datetime import datetime
-from scipy.spatial.distance import cosine
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+from qdrant_client.http.models import Filter, FieldCondition, MatchValue, MatchAny, QueryRequest, DatetimeRange
+from embedding_batcher import EmbeddingBatcher, LazyModel
+from partitioning import PARTITION_ROOT, project_key
+from query_planner import plan_query, planner_stats
+from summary_tree import SUMMARY_LEVELS
+from tail_index import tail_index
+from log_record import LogRecord, to_columns, parse_timestamp
+from cache_warmer import CacheWarmer, read_data_version
 
 load_dotenv()
 
-# Load embedding model and clients
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-qdrant = QdrantClient(host="localhost", port=6333)
+logger = logging.getLogger("retrieval")
+
+# Embedding model (loaded on first encode; the service loads it at startup) and clients
+embedding_model = LazyModel("all-MiniLM-L6-v2")
+# Query encodes from concurrent requests share one forward pass
+embedding_batcher = EmbeddingBatcher(embedding_model)
+qdrant = QdrantClient(
+    host=os.getenv("QDRANT_HOST", "localhost"),
+    port=int(os.getenv("QDRANT_PORT", 6333)),
+    grpc_port=int(os.getenv("QDRANT_GRPC_PORT", 6334)),
+    prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "1") == "1",
+)
 duckdb_conn = duckdb.connect("../data/timeline_logs.duckdb")
+try:
+    duckdb_conn.execute("INSTALL fts")
+    duckdb_conn.execute("LOAD fts")
+except duckdb.Error:
+    pass  # lexical head falls back to no results without the FTS extension
 neo4j_driver = GraphDatabase.driver(
-    os.getenv("NEO4J_URL"),
-    auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
+    os.getenv("NEO4J_URL", "bolt://localhost:7687"),
+    auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")),
+    max_connection_pool_size=int(os.getenv("NEO4J_POOL_SIZE", 50)),
+    connection_acquisition_timeout=float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", 10)),
+    max_connection_lifetime=3600,
+    keep_alive=True,
 )
 
+# A DuckDB connection must not be shared across threads; each worker
+# (Streamlit script thread or service executor thread) gets its own cursor.
+_thread_state = threading.local()
+
+def get_duckdb_cursor():
+    cursor = getattr(_thread_state, "duckdb_cursor", None)
+    if cursor is None:
+        cursor = duckdb_conn.cursor()
+        _thread_state.duckdb_cursor = cursor
+    return cursor
+
+def check_readiness():
+    """Ping every memory store; returns {store: True/False}."""
+    status = {}
+    try:
+        qdrant.get_collections()
+        status["qdrant"] = True
+    except Exception:
+        status["qdrant"] = False
+    try:
+        get_duckdb_cursor().execute("SELECT 1").fetchone()
+        status["duckdb"] = True
+    except Exception:
+        status["duckdb"] = False
+    try:
+        neo4j_driver.verify_connectivity()
+        status["neo4j"] = True
+    except Exception:
+        status["neo4j"] = False
+    return status
+
 # ---------------------- Memory Source Fetchers ----------------------
 
-def get_semantic_logs(query, top_k=5):
-    vector = embedding_model.encode(query).tolist()
-    
-    results = qdrant.search(
-        collection_name=os.getenv("QDRANT_COLLECTION_NAME"),
-        query_vector=vector,
-        limit=top_k,
-        query_filter=Filter(
-            must_not=[
-                FieldCondition(key="archived", match=MatchValue(value=True))
-            ]
+_known_values = {}
+
+def _get_known_values(column, refresh=False):
+    # Re-read when a writer bumps the data version, so new projects/users are routed
+    version = read_data_version()
+    cached = _known_values.get(column)
+    if cached is None or cached[0] != version or refresh:
+        rows = get_duckdb_cursor().execute(
+            f'SELECT DISTINCT "{column}" FROM timeline_logs WHERE "{column}" IS NOT NULL'
+        ).fetchall()
+        cached = _known_values[column] = (version, sorted(r[0] for r in rows))
+    return cached[1]
+
+def get_known_projects(refresh=False):
+    return _get_known_values("project", refresh)
+
+def get_known_users(refresh=False):
+    return _get_known_values("user", refresh)
+
+USE_SUMMARY_TREE = os.getenv("USE_SUMMARY_TREE", "1") == "1"
+SUMMARY_BEAM = int(os.getenv("SUMMARY_BEAM", 2))
+
+def _project_conditions(projects):
+    # "project" is a tenant payload index, so a project filter only walks that project's graph
+    return [FieldCondition(key="project", match=MatchAny(any=list(projects)))] if projects else []
+
+def _search_batch(requests):
+    if not requests:
+        return []
+    # query_batch_points replaces search_batch, which newer qdrant-client releases removed
+    responses = qdrant.query_batch_points(collection_name=os.getenv("QDRANT_COLLECTION_NAME"), requests=requests)
+    return [response.points for response in responses]
+
+_tree_state = {"version": None, "levels": [], "covered_until": {}}
+
+def get_summary_tree_state(refresh=False):
+    """
+    Summary levels that hold nodes (finest to coarsest) and, per project, the
+    latest log timestamp its top-level nodes summarize. Re-read from Qdrant
+    only when the data version moves (the summarizer bumps it).
+    """
+    version = read_data_version()
+    if refresh or _tree_state["version"] != version:
+        collection = os.getenv("QDRANT_COLLECTION_NAME")
+        levels = [
+            level for level in SUMMARY_LEVELS
+            if qdrant.count(
+                collection_name=collection,
+                count_filter=Filter(must=[FieldCondition(key="level", match=MatchValue(value=level))]),
+                exact=False
+            ).count
+        ]
+        covered_until = {}
+        if levels:
+            nodes, _ = qdrant.scroll(
+                collection_name=collection,
+                scroll_filter=Filter(must=[FieldCondition(key="level", match=MatchValue(value=levels[-1]))]),
+                limit=10_000,
+                with_payload=["project", "covered_until"],
+                with_vectors=False
+            )
+            for node in nodes:
+                project, until = node.payload.get("project"), node.payload.get("covered_until")
+                if until and until > covered_until.get(project, ""):
+                    covered_until[project] = until
+        _tree_state.update(version=version, levels=levels, covered_until=covered_until)
+    return _tree_state
+
+def _tree_covered_until(projects):
+    # Every project in scope must have a tree, else its old logs are only reachable flat
+    covered = get_summary_tree_state()["covered_until"]
+    scope = projects or get_known_projects()
+    if not scope or any(p not in covered for p in scope):
+        return None
+    return min(covered[p] for p in scope)
+
+def get_hierarchical_logs_batch(query_vectors, top_ks, projects_list, beam=SUMMARY_BEAM):
+    """
+    Coarse-to-fine search over the summary tree built by summarizer.build_summary_tree:
+    the best `beam` nodes at each level restrict the search at the next level to
+    their children, ending at raw logs. All queries descend together, one
+    batched Qdrant query per level, starting at the coarsest level built.
+    None for a query that reaches no tree.
+    """
+    n = len(query_vectors)
+    levels = get_summary_tree_state()["levels"]
+    if not levels:
+        return [None] * n
+    vectors = [np.asarray(v).tolist() for v in query_vectors]
+    frontiers = [None] * n
+    best_summary = [None] * n
+    stopped = [False] * n
+
+    for level in reversed(levels):
+        active = [i for i in range(n) if not stopped[i]]
+        requests = []
+        for i in active:
+            must = [FieldCondition(key="level", match=MatchValue(value=level))] + _project_conditions(projects_list[i])
+            if frontiers[i] is not None:
+                must.append(FieldCondition(key="log_id", match=MatchAny(any=frontiers[i])))
+            requests.append(QueryRequest(query=vectors[i], filter=Filter(must=must), limit=beam, with_payload=True))
+        for i, hits in zip(active, _search_batch(requests)):
+            if not hits:
+                # Level not built (e.g. history shorter than a quarter) unless we are already below one
+                stopped[i] = frontiers[i] is not None
+                continue
+            best_summary[i] = hits[0]
+            frontiers[i] = [c for h in hits for c in h.payload.get("children", [])]
+
+    # Leaves may be archived: reaching them through their summary is the point of the tree
+    leaf = [i for i in range(n) if frontiers[i]]
+    requests = [
+        QueryRequest(
+            query=vectors[i],
+            filter=Filter(must=[FieldCondition(key="log_id", match=MatchAny(any=frontiers[i]))]),
+            limit=top_ks[i],
+            with_payload=True
         )
-    )
+        for i in leaf
+    ]
+    results = [None] * n
+    for i, hits in zip(leaf, _search_batch(requests)):
+        best = best_summary[i]
+        logs = [
+            LogRecord.from_qdrant(r, source="Qdrant-Tree")
+            for r in [best] + [h for h in hits if h.id != best.id]
+        ]
+        results[i] = logs[:top_ks[i]]
+    return results
+
+def get_hierarchical_logs(query_vector, top_k=5, projects=None, beam=SUMMARY_BEAM):
+    """Tree search for one query; returns None if no tree exists."""
+    return get_hierarchical_logs_batch([query_vector], [top_k], [projects], beam)[0]
+
+def get_semantic_logs_batch(query_vectors, top_ks, projects_list):
+    """
+    Semantic head for several queries. A flat batched search over un-archived
+    points keeps logs not summarized yet (recent sessions, appends) reachable;
+    for queries the tree answers it only covers logs newer than the tree.
+    Tree hits are merged in by score.
+    """
+    n = len(query_vectors)
+    tree = [None] * n
+    if USE_SUMMARY_TREE:
+        tree = get_hierarchical_logs_batch(query_vectors, top_ks, projects_list)
 
-    logs = []
-    for r in results:
-        log = r.payload
-        log["score"] = r.score
-        log["source"] = "Qdrant"
-        logs.append(log)
+    results = [None] * n
+    requests = []
+    for i in range(n):
+        must = _project_conditions(projects_list[i])
+        covered_until = _tree_covered_until(projects_list[i]) if tree[i] else None
+        if covered_until:
+            must.append(FieldCondition(key="timestamp", range=DatetimeRange(gt=covered_until)))
+        requests.append(QueryRequest(
+            query=np.asarray(query_vectors[i]).tolist(),
+            filter=Filter(
+                must=must or None,
+                must_not=[
+                    FieldCondition(key="archived", match=MatchValue(value=True))
+                ]
+            ),
+            limit=top_ks[i],
+            with_payload=True
+        ))
+    for i, hits in enumerate(_search_batch(requests)):
+        logs = [LogRecord.from_qdrant(r, source="Qdrant") for r in hits]
 
-    # Prioritize summaries over individual logs if they exist
-    summaries = [log for log in logs if log.get("type") == "summary"]
-    non_summaries = [log for log in logs if log.get("type") != "summary"]
+        if tree[i]:
+            # Tree hits and flat hits interleaved by similarity
+            seen = set()
+            merged = []
+            for log in sorted(tree[i] + logs, key=lambda x: x.score or 0.0, reverse=True):
+                if log.log_id not in seen:
+                    seen.add(log.log_id)
+                    merged.append(log)
+            results[i] = merged[:top_ks[i]]
+            continue
 
-    final_logs = summaries + non_summaries
-    return final_logs[:top_k]
+        # Prioritize summaries over individual logs if they exist
+        summaries = [log for log in logs if log.get("type") == "summary"]
+        non_summaries = [log for log in logs if log.get("type") != "summary"]
 
+        results[i] = (summaries + non_summaries)[:top_ks[i]]
+    return results
+
+def get_semantic_logs(query, top_k=5, query_vector=None, projects=None):
+    if query_vector is None:
+        query_vector = embedding_batcher.encode(query)
+    return get_semantic_logs_batch([query_vector], [top_k], [projects])[0]
+
+def _user_filter(users, params):
+    if not users:
+        return ""
+    params += [u.lower() for u in users]
+    return f' AND lower("user") IN ({", ".join("?" for _ in users)})'
+
+def _partitioned_timeline(since, projects, params):
+    # Hive partition filters prune whole project/month directories
+    where = "month >= ?"
+    params.append(str(since)[:7])
+    if projects:
+        where += f" AND project_key IN ({', '.join('?' for _ in projects)})"
+        params += [project_key(p) for p in projects]
+    return f"""(
+        SELECT * EXCLUDE (project_key, month)
+        FROM read_parquet('{PARTITION_ROOT}/*/*/*.parquet', hive_partitioning = true,
+                          hive_types = {{'project_key': VARCHAR, 'month': VARCHAR}})
+        WHERE {where}
+    )"""
+
+def get_timeline_logs(since="2024-03-01", projects=None, limit=5, users=None, use_partitions=None):
+    if use_partitions is None:
+        use_partitions = os.path.isdir(PARTITION_ROOT)
+    params = []
+    source = _partitioned_timeline(since, projects, params) if use_partitions else "timeline_logs"
+    where = "timestamp > ?"
+    params.append(since)
+    if projects and not use_partitions:
+        where += f" AND project IN ({', '.join('?' for _ in projects)})"
+        params += list(projects)
+    where += _user_filter(users, params)
 
-def get_timeline_logs(since="2024-03-01"):
     query = f"""
-        SELECT * FROM timeline_logs
-        WHERE timestamp > '{since}'
+        SELECT * FROM {source}
+        WHERE {where}
         ORDER BY timestamp DESC
-        LIMIT 5
+        LIMIT {int(limit)}
+    """
+    try:
+        results = get_duckdb_cursor().execute(query, params).fetchdf()
+    except duckdb.IOException as e:
+        if not use_partitions:
+            raise
+        # A compaction removed a file mid-read; the table holds the same rows
+        logger.warning("Partitioned timeline read failed, using timeline_logs: %s", e)
+        return get_timeline_logs(since, projects, limit, users, use_partitions=False)
+    return LogRecord.from_dataframe(results, source="DuckDB")
+
+def get_lexical_logs(query, top_k=5, projects=None, users=None):
+    # BM25 over timeline_logs.content, index built by DuckDB_store.build_fts_index()
+    params = [query]
+    # Filters sit next to the scan so only the routed projects' rows are scored
+    # (timeline_logs is loaded clustered by project, so row groups are skipped)
+    where = "TRUE"
+    if projects:
+        where = f"project IN ({', '.join('?' for _ in projects)})"
+        params += list(projects)
+    where += _user_filter(users, params)
+    sql = f"""
+        SELECT * FROM (
+            SELECT *, fts_main_timeline_logs.match_bm25(log_id, ?) AS bm25
+            FROM timeline_logs
+            WHERE {where}
+        )
+        WHERE bm25 IS NOT NULL
+        ORDER BY bm25 DESC
+        LIMIT {int(top_k)}
     """
-    results = duckdb_conn.execute(query).fetchdf()
-    logs = results.to_dict("records")
-    for log in logs:
-        log["source"] = "DuckDB"
-    return logs
+    try:
+        results = get_duckdb_cursor().execute(sql, params).fetchdf()
+    except duckdb.Error as e:
+        # Usually a missing index: run DuckDB_store.build_fts_index() after loading logs
+        logger.warning("Lexical (BM25) head unavailable: %s", e)
+        return []
+    return LogRecord.from_dataframe(results, source="DuckDB-BM25")
 
-def get_relational_logs(project=None, session_id=None):
+def get_relational_logs(project=None, session_id=None, projects=None, limit=5):
+    if project and not projects:
+        projects = [project]
     with neo4j_driver.session() as session:
-        if project:
+        if projects:
+            # Anchor on the indexed Project nodes so only their subgraphs are expanded
             result = session.run(
-                "MATCH (l:Log)-[:RELATED_TO]->(:Project {name: $project}) RETURN l LIMIT 5",
-                project=project
+                "MATCH (p:Project) WHERE p.name IN $projects "
+                "MATCH (l:Log)-[:RELATED_TO]->(p) RETURN l LIMIT $limit",
+                projects=list(projects), limit=limit
             )
-            logs = [r["l"] for r in result]
+            return [LogRecord.from_neo4j(r["l"]) for r in result]
         elif session_id:
             result = session.run(
-                "MATCH (l:Log {session_id: $sid})-[:RELATED_TO*1..2]-(n:Log) RETURN n LIMIT 5",
-                sid=session_id
+                "MATCH (l:Log {session_id: $sid})-[:RELATED_TO*1..2]-(n:Log) RETURN n LIMIT $limit",
+                sid=session_id, limit=limit
+            )
+            return [LogRecord.from_neo4j(r["n"]) for r in result]
+        return []
+
+def get_timeline_logs_batch(requests):
+    """
+    Timeline head for several queries in one statement. requests is a list of
+    (since, projects, users, limit); the request table is joined against
+    timeline_logs and each query keeps its newest `limit` rows.
+    """
+    results = [[] for _ in requests]
+    if not requests:
+        return results
+    batch = pa.table({
+        "qid": pa.array(range(len(requests)), pa.int32()),
+        "since": pa.array([parse_timestamp(since) for since, _, _, _ in requests], pa.timestamp("us")),
+        "projects": pa.array([list(projects or []) for _, projects, _, _ in requests], pa.list_(pa.string())),
+        "users": pa.array([[u.lower() for u in users or []] for _, _, users, _ in requests], pa.list_(pa.string())),
+        "lim": pa.array([int(limit) for _, _, _, limit in requests], pa.int32()),
+    })
+    params = []
+    source = "timeline_logs"
+    if os.path.isdir(PARTITION_ROOT):
+        # Pruned to the earliest month any request needs, and to the requested
+        # projects when every request names some
+        earliest = min(parse_timestamp(since) for since, _, _, _ in requests)
+        scoped = all(projects for _, projects, _, _ in requests)
+        projects = sorted({p for _, ps, _, _ in requests for p in ps or []}) if scoped else None
+        source = _partitioned_timeline(earliest, projects, params)
+    cursor = get_duckdb_cursor()
+    cursor.register("timeline_requests", batch)
+    try:
+        df = cursor.execute(f"""
+            SELECT * EXCLUDE (rn) FROM (
+                SELECT r.qid, l.*,
+                       ROW_NUMBER() OVER (PARTITION BY r.qid ORDER BY l.timestamp DESC) AS rn,
+                       r.lim
+                FROM timeline_requests r
+                JOIN {source} l
+                  ON l.timestamp > r.since
+                 AND (len(r.projects) = 0 OR list_contains(r.projects, l.project))
+                 AND (len(r.users) = 0 OR list_contains(r.users, lower(l."user")))
             )
-            logs = [r["n"] for r in result]
-        else:
-            return []
+            WHERE rn <= lim
+            ORDER BY qid, timestamp DESC
+        """, params).fetchdf()
+    finally:
+        cursor.unregister("timeline_requests")
+    for qid, group in df.groupby("qid", sort=False):
+        results[int(qid)] = LogRecord.from_dataframe(group.drop(columns=["qid", "lim"]), source="DuckDB")
+    return results
+
+def get_relational_logs_batch(requests):
+    """
+    Graph head for several queries in one Neo4j round trip. requests is a
+    list of (projects, limit); queries without a project anchor get [].
+    """
+    results = [[] for _ in requests]
+    params = [
+        {"qid": i, "projects": list(projects), "limit": int(limit)}
+        for i, (projects, limit) in enumerate(requests) if projects and limit
+    ]
+    if not params:
+        return results
+    with neo4j_driver.session() as session:
+        rows = session.run(
+            "UNWIND $requests AS r "
+            "MATCH (p:Project) WHERE p.name IN r.projects "
+            "MATCH (l:Log)-[:RELATED_TO]->(p) "
+            "WITH r, collect(l)[..r.limit] AS logs "
+            "RETURN r.qid AS qid, logs",
+            requests=params
+        )
+        for row in rows:
+            results[row["qid"]] = [LogRecord.from_neo4j(node) for node in row["logs"]]
+    return results
+
+# ---------------------- Reciprocal Rank Fusion ----------------------
+
+RRF_K = 60
+
+def reciprocal_rank_fusion(ranked_lists, k=RRF_K):
+    """
+    Fuse several ranked candidate lists into one, scoring each log by
+    sum(1 / (k + rank)) over the lists it appears in.
+    """
+    fused = {}
+    order = []
+    for ranked in ranked_lists:
+        for rank, log in enumerate(ranked, 1):
+            log_id = log.get("log_id")
+            if not log_id:
+                continue
+            if log_id not in fused:
+                fused[log_id] = 0.0
+                log["rrf_score"] = 0.0
+                order.append(log)
+            fused[log_id] += 1.0 / (k + rank)
 
-        for log in logs:
-            log["source"] = "Neo4j"
-        return logs
+    for log in order:
+        log["rrf_score"] = round(fused[log.get("log_id")], 6)
+    order.sort(key=lambda x: x["rrf_score"], reverse=True)
+    return order
 
 # ---------------------- CRAG-Style Multi-Head Relevance ----------------------
 
-def compute_crag_score(log, query_vector, query_project=None):
-    # Semantic similarity
-    log_vector = embedding_model.encode(log.get("content", "")).tolist()
-    semantic_sim = 1 - cosine(query_vector, log_vector)
+# "fusion" credits a log's fused rank (rrf_score) among its query's candidates.
+# Weights sum to 1.0, the scale RELEVANCE_THRESHOLD is calibrated against.
+CRAG_WEIGHTS = {"semantic": 0.35, "recency": 0.25, "project": 0.15, "speaker": 0.1, "fusion": 0.15}
+SPEAKER_WEIGHTS = {"carol": 1.0, "eve": 0.7, "bob": 0.5}
+DEFAULT_SPEAKER_WEIGHT = 0.2
 
-    # Recency score
+RETENTION_DB_PATH = "../data/retention_boosts.duckdb"   # summarizer.RETENTION_DB_PATH
+_retention_boosts = {"version": None, "boosts": {}}
+_retention_lock = threading.Lock()
+
+def _load_retention_boosts():
+    # The summarizer owns the file: attach it read-only just long enough to copy the table
+    cursor = get_duckdb_cursor()
+    cursor.execute(f"ATTACH '{RETENTION_DB_PATH}' AS retention (READ_ONLY)")
     try:
-        ts = datetime.fromisoformat(log["timestamp"])
-        age_days = (datetime.now() - ts).days
-        recency = np.exp(-age_days / 30)
-    except:
-        recency = 0.5
+        rows = cursor.execute("SELECT log_id, boost FROM retention.memory_retention_boosts").fetchall()
+    finally:
+        cursor.execute("DETACH retention")
+    return {log_id: float(boost) for log_id, boost in rows}
+
+def get_retention_boosts(log_ids):
+    """Boosts for `log_ids`, from a copy of memory_retention_boosts re-read when the data version moves."""
+    if not log_ids:
+        return {}
+    version = read_data_version()
+    with _retention_lock:
+        if _retention_boosts["version"] != version:
+            try:
+                _retention_boosts.update(boosts=_load_retention_boosts(), version=version)
+            except duckdb.Error as e:
+                # No boosts yet, or the summarizer is writing: keep the last copy and retry next call
+                logger.debug("Retention boosts unavailable: %s", e)
+        boosts = _retention_boosts["boosts"]
+    return {log_id: boosts[log_id] for log_id in log_ids if log_id in boosts}
+
+# Hot-project timeline windows, graph neighbourhoods, embeddings and boosts
+cache_warmer = CacheWarmer(
+    fetch_timeline=lambda since, **kw: get_timeline_logs(since, **kw),
+    fetch_relational=lambda **kw: get_relational_logs(**kw),
+    fetch_boosts=get_retention_boosts,
+    encode=lambda texts: embedding_model.encode(texts, batch_size=64),
+)
+
+def fused_rank_scores(rrf_scores, groups=None):
+    """
+    Share of a query's candidates whose rrf_score is at or below each one's:
+    1.0 for the best fused rank down to 1/n for the worst, ties scored alike.
+    Raw rrf_scores barely move with rank (1/61 vs 1/70 for ranks 1 and 10).
+    """
+    rrf = np.asarray(rrf_scores, dtype=np.float64)
+    groups = np.zeros(len(rrf), dtype=np.int64) if groups is None else np.asarray(groups)
+    fusion = np.zeros(len(rrf))
+    for group in np.unique(groups):
+        mask = groups == group
+        ranked = np.sort(rrf[mask])
+        fusion[mask] = np.searchsorted(ranked, rrf[mask], side="right") / len(ranked)
+    return fusion
+
+def score_candidates(records, query_vector, query_project=None, weights=None, speaker_weights=None, groups=None):
+    """
+    CRAG score for every candidate at once: one batched encode for the
+    semantic head, NumPy for recency/project/speaker, one query for boosts.
+    weights / speaker_weights override CRAG_WEIGHTS / SPEAKER_WEIGHTS (see eval_sweep.py).
+    query_vector / query_project may also be given per candidate (one row
+    each) to score the candidates of several queries in the same pass, with
+    groups giving each candidate's query so fused ranks compare within it.
+    With query_vector=None nothing is embedded: the semantic head is dropped
+    and the recency/project/speaker weights are rescaled to the same total.
+    """
+    if not records:
+        return []
+    weights = weights or CRAG_WEIGHTS
+    speaker_weights = speaker_weights or SPEAKER_WEIGHTS
+    cols = to_columns(records)
+
+    if query_vector is None:
+        semantic_sim = np.zeros(len(records))
+        rest = weights["recency"] + weights["project"] + weights["speaker"]
+        scale = (rest + weights["semantic"]) / rest if rest else 0.0
+    else:
+        # Semantic similarity; only candidates the warmer has not embedded are encoded
+        warm = [cache_warmer.vector(i) for i in cols["log_id"]]
+        cold = [j for j, v in enumerate(warm) if v is None]
+        if cold:
+            encoded = embedding_model.encode([cols["content"][j] for j in cold], batch_size=64)
+            for j, v in zip(cold, encoded):
+                warm[j] = v
+        log_vectors = np.asarray(warm)
+        q = np.broadcast_to(np.asarray(query_vector, dtype=np.float32), log_vectors.shape)
+        norms = np.linalg.norm(log_vectors, axis=1) * np.linalg.norm(q, axis=1)
+        semantic_sim = np.einsum("ij,ij->i", log_vectors, q) / np.where(norms == 0, 1.0, norms)
+        scale = 1.0
+
+    # Recency score
+    age_days = np.floor((datetime.now().timestamp() - cols["epoch"]) / 86400)
+    recency = np.where(np.isnan(age_days), 0.5, np.exp(-age_days / 30))
 
     # Project match
-    project_match = 1.0 if log.get("project") == query_project else 0.0
+    project_match = (cols["project"] == query_project).astype(np.float64)
 
     # Speaker priority
-    speaker = log.get("user", "").lower()
-    speaker_weights = {"carol": 1.0, "eve": 0.7, "bob": 0.5}
-    speaker_score = speaker_weights.get(speaker, 0.2)
+    speaker_score = np.array([speaker_weights.get(u, DEFAULT_SPEAKER_WEIGHT) for u in cols["user"]])
 
-    # Retention boost (from DuckDB)
-    boost = 0.0
-    try:
-        query = f"SELECT boost FROM memory_retention_boosts WHERE log_id = '{log['log_id']}'"
-        result = duckdb_conn.execute(query).fetchone()
-        if result:
-            boost = float(result[0])
-    except:
-        boost = 0.0
+    # Retention boost (warm snapshot, else DuckDB)
+    warm_boosts = [cache_warmer.boost(i) for i in cols["log_id"]]
+    boosts = get_retention_boosts([i for i, b in zip(cols["log_id"], warm_boosts) if b is None])
+    boost = np.array([b if b is not None else boosts.get(i, 0.0) for i, b in zip(cols["log_id"], warm_boosts)])
+
+    # Fused rank among the same query's candidates
+    fusion = fused_rank_scores([r.rrf_score or 0.0 for r in records], groups)
 
     # Final weighted score
-    total_score = (
-        0.4 * semantic_sim +
-        0.3 * recency +
-        0.2 * project_match +
-        0.1 * speaker_score +
+    total = (
+        weights["semantic"] * semantic_sim +
+        scale * (
+            weights["recency"] * recency +
+            weights["project"] * project_match +
+            weights["speaker"] * speaker_score
+        ) +
+        weights.get("fusion", 0.0) * fusion +
         boost  # additive bonus
     )
 
-    log["score"] = total_score
-    return total_score
+    scores = [round(float(t), 4) for t in total]
+    for record, score in zip(records, scores):
+        record.score = score
+    return scores
+
+def compute_crag_score(log, query_vector, query_project=None):
+    record = log if isinstance(log, LogRecord) else LogRecord.from_dict(log)
+    score = score_candidates([record], query_vector, query_project)[0]
+    log["score"] = score
+    return score
 
 # ---------------------- Combiner with Adaptive Forgetting + Score Filtering ----------------------
 
 RELEVANCE_THRESHOLD = 0.4  
+DEFAULT_SINCE = "2024-03-01"   # timeline start when neither the caller nor the query gives one
 
-def get_combined_logs(query, since="2024-03-01", top_k=12, return_discarded=False):
-    semantic = get_semantic_logs(query)
-    timeline = get_timeline_logs(since)
-    related = get_relational_logs(project=semantic[0]["project"] if semantic else None)
+def _timed(source, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    planner_stats.record_latency(source, time.perf_counter() - start)
+    return result
 
-    all_logs = semantic + timeline + related
-    seen_ids = set()
-    combined = []
+def _anchor(plan, semantic, lexical):
+    # Semantic + lexical heads decide the project the graph head expands on
+    if len(plan.projects) == 1:
+        query_project = plan.projects[0]
+    else:
+        head = reciprocal_rank_fusion([semantic, lexical])
+        query_project = head[0].get("project") if head else None
+    return query_project, plan.projects or ([query_project] if query_project else [])
 
-    query_vector = embedding_model.encode(query)
-    query_project = semantic[0].get("project") if semantic else None
+def _merge_candidates(semantic, lexical, related, tail, timeline):
+    # RRF over every ranked list (the timeline window is ranked by recency),
+    # first occurrence of each log_id wins
+    return reciprocal_rank_fusion([semantic, lexical, related, tail, timeline])
 
-    for log in all_logs:
-        log_id = log.get("log_id")
-        if log_id and log_id not in seen_ids:
-            score = compute_crag_score(log, query_vector, query_project)
-            log["score"] = round(score, 4)
-            combined.append(log)
-            seen_ids.add(log_id)
+def _heads_full(limits, lexical, timeline):
+    return all(len(found) >= limits[s] for s, found in (("lexical", lexical), ("timeline", timeline)) if limits[s])
 
+def _select(combined, threshold, top_k, return_discarded):
     combined.sort(key=lambda x: x["score"], reverse=True)
+    retained = [log for log in combined if log["score"] >= threshold][:top_k]
+    if return_discarded:
+        return retained, [log for log in combined if log["score"] < threshold]
+    return retained
 
-    retained = [log for log in combined if log["score"] >= RELEVANCE_THRESHOLD][:top_k]
-    discarded = [log for log in combined if log["score"] < RELEVANCE_THRESHOLD]
+def get_combined_logs(query, since=None, top_k=12, return_discarded=False, plan=None,
+                      threshold=None, weights=None, speaker_weights=None, source_limits=None):
+    # Sources, limits and partitions come from the query planner (all if it finds nothing to narrow);
+    # an explicit since always runs the timeline head from that date
+    if plan is None:
+        plan = plan_query(query, get_known_projects(), get_known_users(), since=since)
+    planner_stats.record_plan(plan)
+    projects = plan.projects
+    threshold = RELEVANCE_THRESHOLD if threshold is None else threshold
+    # source_limits resizes the sources the plan runs; it never re-enables a skipped one
+    limits = {s: (source_limits.get(s, n) if source_limits and n else n) for s, n in plan.sources.items()}
 
-    if return_discarded:
-        return retained, discarded
+    semantic = lexical = timeline = related = []
+    if limits["lexical"]:
+        lexical = _timed("lexical", get_lexical_logs, query, top_k=limits["lexical"],
+                         projects=projects, users=plan.users)
+    if limits["timeline"]:
+        timeline = cache_warmer.get_timeline(projects, plan.since or DEFAULT_SINCE, limits["timeline"], plan.users)
+        if timeline is None:
+            timeline = _timed("timeline", get_timeline_logs, plan.since or DEFAULT_SINCE, projects=projects,
+                              limit=limits["timeline"], users=plan.users)
+
+    # Lexical/timeline heads that came back full answer the query on their own: fallback
+    # sources are skipped, and with no unflushed appends so is the embedding call
+    full = _heads_full(limits, lexical, timeline)
+    if "semantic" in plan.fallback and full:
+        limits["semantic"] = 0
+    if limits["semantic"] or len(tail_index) or not full:
+        query_vector = embedding_batcher.encode(query)
     else:
-        return retained
+        query_vector = None
+    if limits["semantic"]:
+        semantic = _timed("semantic", get_semantic_logs, query, top_k=limits["semantic"],
+                          query_vector=query_vector, projects=projects)
+
+    query_project, anchor = _anchor(plan, semantic, lexical)
+    cache_warmer.record_query(anchor)
+    if limits["relational"]:
+        related = cache_warmer.get_relational(anchor, limits["relational"])
+        if related is None:
+            related = _timed("relational", get_relational_logs,
+                             projects=anchor or None, limit=limits["relational"])
+
+    # Appended logs not yet flushed to the stores (see append_log.py)
+    tail = []
+    if query_vector is not None:
+        tail = [LogRecord.from_dict(log) for log in tail_index.search(query_vector, top_k=limits["tail"], projects=projects)]
+
+    combined = _merge_candidates(semantic, lexical, related, tail, timeline)
+
+    # All candidates scored in one vectorized pass
+    score_candidates(combined, query_vector, query_project, weights, speaker_weights)
+    return _select(combined, threshold, top_k, return_discarded)
+
+def get_combined_logs_batch(queries, since=None, top_k=12, return_discarded=False,
+                            threshold=None, weights=None, speaker_weights=None):
+    """
+    get_combined_logs for many queries at once, for offline jobs: one encode
+    forward pass, batched Qdrant queries, one windowed DuckDB timeline query,
+    one Neo4j UNWIND and a single scoring pass over every query's candidates.
+    An explicit since applies to every query. Returns one result per query, in order.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    n = len(queries)
+    threshold = RELEVANCE_THRESHOLD if threshold is None else threshold
+    known_projects, known_users = get_known_projects(), get_known_users()
+    plans = [plan_query(q, known_projects, known_users, since=since) for q in queries]
+    for plan in plans:
+        planner_stats.record_plan(plan)
+
+    query_vectors = np.asarray(embedding_model.encode(queries, batch_size=64))
+
+    # The BM25 macro takes a constant query string, so lexical stays one statement per query
+    lexical = [
+        get_lexical_logs(q, top_k=plan.limit("lexical"), projects=plan.projects, users=plan.users)
+        if plan.uses("lexical") else []
+        for q, plan in zip(queries, plans)
+    ]
+
+    timeline = [[] for _ in range(n)]
+    idx = [i for i in range(n) if plans[i].uses("timeline")]
+    found = get_timeline_logs_batch([
+        (plans[i].since or DEFAULT_SINCE, plans[i].projects, plans[i].users, plans[i].limit("timeline")) for i in idx
+    ])
+    for i, logs in zip(idx, found):
+        timeline[i] = logs
+
+    # Fallback vector searches are dropped for queries whose lexical/timeline heads came back full
+    semantic = [[] for _ in range(n)]
+    idx = [
+        i for i in range(n) if plans[i].uses("semantic")
+        and not ("semantic" in plans[i].fallback and _heads_full(plans[i].sources, lexical[i], timeline[i]))
+    ]
+    found = get_semantic_logs_batch(
+        [query_vectors[i] for i in idx], [plans[i].limit("semantic") for i in idx], [plans[i].projects for i in idx]
+    )
+    for i, logs in zip(idx, found):
+        semantic[i] = logs
+
+    anchored = [_anchor(plans[i], semantic[i], lexical[i]) for i in range(n)]
+    query_projects = [query_project for query_project, _ in anchored]
+    anchors = [anchor for _, anchor in anchored]
+    related = get_relational_logs_batch([
+        (anchors[i], plans[i].limit("relational")) for i in range(n)
+    ])
+
+    candidates, owners = [], []
+    for i, plan in enumerate(plans):
+        tail = [
+            LogRecord.from_dict(log)
+            for log in tail_index.search(query_vectors[i], top_k=plan.limit("tail"), projects=plan.projects)
+        ]
+        combined = _merge_candidates(semantic[i], lexical[i], related[i], tail, timeline[i])
+        candidates += combined
+        owners += [i] * len(combined)
+
+    # Every query's candidates scored in one vectorized pass
+    owners = np.asarray(owners, dtype=np.int64)
+    if candidates:
+        score_candidates(
+            candidates,
+            query_vectors[owners],
+            np.array(query_projects, dtype=object)[owners],
+            weights,
+            speaker_weights,
+            groups=owners
+        )
+
+    per_query = [[] for _ in range(n)]
+    for log, owner in zip(candidates, owners):
+        per_query[owner].append(log)
+
+    return [_select(combined, threshold, top_k, return_discarded) for combined in per_query]
@@ -0,0 +1,191 @@
+# core/service.py
+
+import os
+import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from aiohttp import web
+from dotenv import load_dotenv
+
+from retrieval import get_combined_logs, get_duckdb_cursor, check_readiness, embedding_model, embedding_batcher, cache_warmer
+from generate_response import generate_response
+from append_log import get_append_buffer
+from near_dup_index import get_near_dup_index
+from snapshot import create_snapshot
+from query_planner import planner_stats
+
+load_dotenv()
+
+# ---- Config ----
+SERVICE_HOST = os.getenv("MEMORY_SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("MEMORY_SERVICE_PORT", 8765))
+SERVICE_WORKERS = int(os.getenv("MEMORY_SERVICE_WORKERS", 8))
+MAX_CONCURRENCY = int(os.getenv("MEMORY_SERVICE_MAX_CONCURRENCY", SERVICE_WORKERS))
+MAX_QUEUED = int(os.getenv("MEMORY_SERVICE_MAX_QUEUED", 64))
+
+# Retrieval and the OpenAI client are blocking; they run on a fixed pool of
+# worker threads, each of which keeps its own DuckDB cursor.
+executor = ThreadPoolExecutor(max_workers=SERVICE_WORKERS, thread_name_prefix="memory-worker")
+
+def _dumps(data):
+    return json.dumps(data, default=str)
+
+def _serialize_logs(logs):
+    return [log.to_dict() for log in logs]
+
+async def _run_blocking(request, fn, *args, **kwargs):
+    app = request.app
+    state = app["state"]
+    if state["queued"] >= MAX_QUEUED:
+        raise web.HTTPServiceUnavailable(text="Too many queued requests")
+    state["queued"] += 1
+    try:
+        await app["semaphore"].acquire()
+    finally:
+        state["queued"] -= 1
+
+    state["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+    finally:
+        state["in_flight"] -= 1
+        app["semaphore"].release()
+
+MAX_TOP_K = 100
+
+async def _read_body(request):
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text="Body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Body must be a JSON object")
+    return body
+
+async def _read_query(request):
+    body = await _read_body(request)
+    query = body.get("query")
+    if not isinstance(query, str) or not query.strip():
+        raise web.HTTPBadRequest(text="Missing 'query'")
+    return query.strip(), body
+
+def _read_top_k(body, default=12):
+    top_k = body.get("top_k", default)
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+        raise web.HTTPBadRequest(text=f"'top_k' must be an integer between 1 and {MAX_TOP_K}")
+    return top_k
+
+# ---- Handlers ----
+async def health(request):
+    state = request.app["state"]
+    return web.json_response(
+        {
+            "status": "ok",
+            "in_flight": state["in_flight"],
+            "queued": state["queued"],
+            "embedding_batcher": embedding_batcher.metrics(),
+            "append_buffer": get_append_buffer().stats(),
+            "query_planner": planner_stats.summary(),
+            "cache_warmer": cache_warmer.stats(),
+        },
+        dumps=_dumps
+    )
+
+async def ready(request):
+    loop = asyncio.get_running_loop()
+    status = await loop.run_in_executor(executor, check_readiness)
+    ok = all(status.values())
+    return web.json_response(
+        {"ready": ok, "stores": status}, status=200 if ok else 503, dumps=_dumps
+    )
+
+async def retrieve(request):
+    query, body = await _read_query(request)
+    # Optional; when given, the timeline head always runs from it
+    since = body.get("since")
+    if since is not None and not isinstance(since, str):
+        raise web.HTTPBadRequest(text="'since' must be an ISO date string")
+    retained, discarded = await _run_blocking(
+        request, get_combined_logs, query,
+        since=since,
+        top_k=_read_top_k(body),
+        return_discarded=True,
+    )
+    return web.json_response(
+        {"retained": _serialize_logs(retained), "discarded": _serialize_logs(discarded)},
+        dumps=_dumps
+    )
+
+def _respond(query, bypass_cache=False):
+    retained, discarded = get_combined_logs(query, return_discarded=True)
+    raw, memory, pack_stats = generate_response(query, bypass_cache=bypass_cache, logs=retained)
+    return {
+        "raw": raw,
+        "memory": memory,
+        "context_tokens": pack_stats,
+        "retained": _serialize_logs(retained),
+        "discarded": _serialize_logs(discarded),
+    }
+
+async def respond(request):
+    query, body = await _read_query(request)
+    result = await _run_blocking(
+        request, _respond, query, bypass_cache=bool(body.get("bypass_cache", False))
+    )
+    return web.json_response(result, dumps=_dumps)
+
+async def append(request):
+    body = await _read_body(request)
+    try:
+        log = await _run_blocking(request, get_append_buffer().append, body)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    return web.json_response(
+        {"log_id": log["log_id"], "timestamp": log["timestamp"], "duplicate_of": log.get("duplicate_of")},
+        dumps=_dumps
+    )
+
+def _snapshot(name):
+    # The service holds the DuckDB and near-dup index locks, so the export uses its handles
+    return create_snapshot(name, timeline_conn=get_duckdb_cursor(), near_dup_index=get_near_dup_index())
+
+async def snapshot(request):
+    body = await _read_body(request) if request.can_read_body else {}
+    name = body.get("name")
+    if name is not None and (not isinstance(name, str) or not name or os.sep in name or name.startswith(".")):
+        raise web.HTTPBadRequest(text="'name' must be a plain directory name")
+    try:
+        path = await _run_blocking(request, _snapshot, name)
+    except (FileExistsError, RuntimeError) as e:
+        raise web.HTTPConflict(text=str(e))
+    return web.json_response({"snapshot": path}, dumps=_dumps)
+
+def create_app():
+    app = web.Application()
+    app["semaphore"] = asyncio.Semaphore(MAX_CONCURRENCY)
+    app["state"] = {"in_flight": 0, "queued": 0}
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", ready)
+    app.router.add_post("/retrieve", retrieve)
+    app.router.add_post("/respond", respond)
+    app.router.add_post("/append", append)
+    app.router.add_post("/snapshot", snapshot)
+    app.on_startup.append(_startup)
+    app.on_cleanup.append(_shutdown)
+    return app
+
+async def _startup(app):
+    # Loads the model, then replays any unflushed WAL entries before the first request
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, embedding_model.load)
+    await loop.run_in_executor(executor, get_append_buffer)
+
+async def _shutdown(app):
+    # Drain pending appends to the stores before exiting
+    get_append_buffer().close()
+    executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host=SERVICE_HOST, port=SERVICE_PORT)
@@ -0,0 +1,81 @@
+# core/service_client.py
+
+import os
+import json
+import urllib.request
+import urllib.error
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVICE_URL = os.getenv("MEMORY_SERVICE_URL", "http://localhost:8765")
+SERVICE_TIMEOUT = float(os.getenv("MEMORY_SERVICE_TIMEOUT", 120))
+
+class MemoryServiceError(RuntimeError):
+    """The memory service answered with an error status."""
+
+class MemoryServiceUnavailable(MemoryServiceError):
+    """The memory service could not be reached (not running, refused, timed out)."""
+
+class MemoryServiceClient:
+    """Thin HTTP client for service.py; holds no models or database connections."""
+
+    def __init__(self, base_url=SERVICE_URL, timeout=SERVICE_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code == 503:
+                raise MemoryServiceUnavailable(f"Memory service {path} is overloaded or not ready") from e
+            raise MemoryServiceError(f"Memory service {path} failed ({e.code}): {e.read().decode('utf-8')}") from e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e:
+            raise MemoryServiceUnavailable(f"Memory service unavailable at {self.base_url}: {e}") from e
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def ready(self):
+        try:
+            return self._request("GET", "/ready")
+        except MemoryServiceError:
+            return {"ready": False}
+
+    def retrieve(self, query, since=None, top_k=12):
+        """Returns (retained, discarded) like retrieval.get_combined_logs(..., return_discarded=True)."""
+        body = {"query": query, "top_k": top_k}
+        if since is not None:
+            body["since"] = since
+        result = self._request("POST", "/retrieve", body)
+        return result["retained"], result["discarded"]
+
+    def respond(self, query, bypass_cache=False):
+        """Returns {"raw", "memory", "context_tokens", "retained", "discarded"} in one round trip."""
+        return self._request("POST", "/respond", {"query": query, "bypass_cache": bypass_cache})
+
+    def append(self, log):
+        """Append one log event; it is searchable as soon as this returns."""
+        return self._request("POST", "/append", log)
+
+if __name__ == "__main__":
+    client = MemoryServiceClient()
+    user_query = input("Ask a question: ")
+    result = client.respond(user_query)
+
+    print("\nTop Relevant Logs:")
+    for i, log in enumerate(result["retained"]):
+        content = log.get("content", "")[:120].strip().replace("\n", " ")
+        print(f"Log {i+1} | Score: {log.get('score', 0)} | {content}...")
+
+    print("\nLLM Only:\n", result["raw"])
+    print("\nLLM + Memory:\n", result["memory"])
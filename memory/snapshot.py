@@ -0,0 +1,380 @@
+# core/snapshot.py
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+from datetime import datetime
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from neo4j import GraphDatabase, basic_auth
+from neo4j.exceptions import ClientError
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import (
+    PointStruct, VectorParams, Distance, KeywordIndexParams, KeywordIndexType, PayloadSchemaType
+)
+from dotenv import load_dotenv
+
+from cache_warmer import bump_data_version, read_data_version
+from DuckDB_store import build_fts_index, export_partitioned_timeline
+
+load_dotenv()
+
+# ---- Config ----
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_ROOT", "../data/snapshots")
+DUCKDB_PATH = "../data/timeline_logs.duckdb"
+RETENTION_DB_PATH = "../data/retention_boosts.duckdb"   # summarizer.RETENTION_DB_PATH
+# Every table a snapshot must contain, and the database file it lives in
+DUCKDB_TABLES = {"timeline_logs": DUCKDB_PATH, "memory_retention_boosts": RETENTION_DB_PATH}
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION_NAME", "semantic_logs")
+WAL_PATH = os.getenv("APPEND_WAL_PATH", "../data/wal/append.wal")
+NEAR_DUP_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", "../data/near_dup_index.duckdb")
+BATCH_SIZE = 2048
+MANIFEST_VERSION = 2
+
+# Clients are created here rather than imported from retrieval.py so a
+# restore never loads the embedding model.
+qdrant = QdrantClient(
+    host=os.getenv("QDRANT_HOST", "localhost"),
+    port=int(os.getenv("QDRANT_PORT", 6333)),
+    grpc_port=int(os.getenv("QDRANT_GRPC_PORT", 6334)),
+    prefer_grpc=os.getenv("QDRANT_PREFER_GRPC", "1") == "1",
+)
+neo4j_driver = GraphDatabase.driver(
+    os.getenv("NEO4J_URL", "bolt://localhost:7687"),
+    auth=basic_auth(os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD"))
+)
+
+QDRANT_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("vector", pa.list_(pa.float32())),
+    ("payload", pa.string()),
+])
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Neo4j temporal values survive the JSONL round trip as tagged ISO strings
+def _encode_value(value):
+    if hasattr(value, "to_native"):
+        return {"$datetime": value.to_native().isoformat()}
+    if isinstance(value, list):
+        return [_encode_value(v) for v in value]
+    return value
+
+def _decode_value(value):
+    if isinstance(value, dict) and "$datetime" in value:
+        return datetime.fromisoformat(value["$datetime"])
+    if isinstance(value, list):
+        return [_decode_value(v) for v in value]
+    return value
+
+def _encode_props(props):
+    return {k: _encode_value(v) for k, v in props.items()}
+
+def _decode_props(props):
+    return {k: _decode_value(v) for k, v in props.items()}
+
+def _quote(name):
+    return "`" + name.replace("`", "``") + "`"
+
+def _connect(path, read_only=False):
+    # DuckDB allows one writer process per file and no readers alongside it
+    try:
+        return duckdb.connect(path, read_only=read_only)
+    except duckdb.IOException as e:
+        raise RuntimeError(
+            f"{path} is locked by another process. Snapshot a running memory service "
+            f"with POST /snapshot, or stop it (and the summarizer) before running this script: {e}"
+        ) from e
+
+def _replace_file(src, dst):
+    # Copy next to the target first so a crash never leaves a half-written file in place
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = dst + ".tmp"
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+# ---------------------- Export ----------------------
+
+def export_qdrant(out_dir):
+    info = qdrant.get_collection(QDRANT_COLLECTION)
+    vectors = info.config.params.vectors
+    path = os.path.join(out_dir, "qdrant_points.parquet")
+    count = 0
+    offset = None
+    with pq.ParquetWriter(path, QDRANT_SCHEMA, compression="zstd") as writer:
+        while True:
+            points, offset = qdrant.scroll(
+                collection_name=QDRANT_COLLECTION,
+                limit=BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                writer.write_table(pa.table({
+                    "id": [str(p.id) for p in points],
+                    "vector": [p.vector for p in points],
+                    "payload": [json.dumps(p.payload, default=str) for p in points],
+                }, schema=QDRANT_SCHEMA))
+                count += len(points)
+            if offset is None:
+                break
+    return {
+        "collection": QDRANT_COLLECTION,
+        "vector_size": vectors.size,
+        "distance": str(getattr(vectors.distance, "value", vectors.distance)),
+        "payload_schema": {
+            field: str(getattr(schema.data_type, "value", schema.data_type))
+            for field, schema in (info.payload_schema or {}).items()
+        },
+        "points": count,
+    }
+
+def export_duckdb(out_dir, timeline_conn=None):
+    """
+    timeline_conn is the memory service's own connection when the snapshot
+    runs inside the service, which holds the lock on DUCKDB_PATH.
+    """
+    tables = {}
+    for table, db_path in DUCKDB_TABLES.items():
+        own = timeline_conn is None or db_path != DUCKDB_PATH
+        conn = _connect(db_path, read_only=True) if own else timeline_conn
+        try:
+            # DDL is kept so restores recreate primary keys (summarizer upserts boosts ON CONFLICT)
+            ddl = conn.execute(
+                "SELECT sql FROM duckdb_tables() WHERE table_name = ?", (table,)
+            ).fetchone()
+            if ddl is None:
+                raise RuntimeError(f"Expected table {table} is missing from {db_path}")
+            path = os.path.join(out_dir, f"duckdb_{table}.parquet")
+            conn.execute(f"COPY {table} TO '{path}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+            rows = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        finally:
+            if own:
+                conn.close()
+        tables[table] = {"rows": rows, "ddl": ddl[0]}
+    return tables
+
+def copy_near_dup_index(out_dir, index=None):
+    # The index keeps recent writes in a .wal next to the file; checkpoint them
+    # into the main file so a plain copy is complete
+    dst = os.path.join(out_dir, "near_dup_index.duckdb")
+    if index is not None:
+        index.backup(dst)
+    elif os.path.exists(NEAR_DUP_INDEX_PATH):
+        conn = _connect(NEAR_DUP_INDEX_PATH)
+        conn.execute("CHECKPOINT")
+        conn.close()
+        shutil.copy2(NEAR_DUP_INDEX_PATH, dst)
+
+def export_neo4j(out_dir):
+    nodes_path = os.path.join(out_dir, "neo4j_nodes.jsonl")
+    rels_path = os.path.join(out_dir, "neo4j_relationships.jsonl")
+    with neo4j_driver.session() as session:
+        schema = [r["createStatement"] for r in session.run("SHOW CONSTRAINTS YIELD createStatement")]
+        schema += [
+            r["createStatement"] for r in session.run(
+                "SHOW INDEXES YIELD createStatement, owningConstraint, type "
+                "WHERE owningConstraint IS NULL AND type <> 'LOOKUP' RETURN createStatement"
+            )
+        ]
+        node_count = 0
+        with open(nodes_path, "w") as f:
+            result = session.run("MATCH (n) RETURN elementId(n) AS sid, labels(n) AS labels, properties(n) AS props")
+            for r in result:
+                f.write(json.dumps({"sid": r["sid"], "labels": r["labels"], "props": _encode_props(r["props"])}) + "\n")
+                node_count += 1
+        rel_count = 0
+        with open(rels_path, "w") as f:
+            result = session.run(
+                "MATCH (a)-[r]->(b) "
+                "RETURN elementId(a) AS src, elementId(b) AS dst, type(r) AS type, properties(r) AS props"
+            )
+            for r in result:
+                f.write(json.dumps({"src": r["src"], "dst": r["dst"], "type": r["type"],
+                                    "props": _encode_props(r["props"])}) + "\n")
+                rel_count += 1
+    return {"nodes": node_count, "relationships": rel_count, "schema": schema}
+
+def create_snapshot(name=None, timeline_conn=None, near_dup_index=None):
+    """
+    Export Qdrant points with vectors, the DuckDB timeline/boost tables, the
+    Neo4j graph, the append WAL and the near-duplicate index, plus a manifest
+    with sha256 checksums. Fails if the data version moves while exporting.
+    The service passes its DuckDB connection and near-dup index (see POST
+    /snapshot); standalone runs need the service stopped.
+    """
+    name = name or datetime.now().strftime("%Y%m%dT%H%M%S")
+    out_dir = os.path.join(SNAPSHOT_ROOT, name)
+    os.makedirs(out_dir)
+    version = read_data_version()
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "data_version": version,
+        "qdrant": export_qdrant(out_dir),
+        "duckdb": export_duckdb(out_dir, timeline_conn),
+        "neo4j": export_neo4j(out_dir),
+    }
+    if os.path.exists(WAL_PATH):
+        shutil.copy2(WAL_PATH, os.path.join(out_dir, "append.wal"))
+    copy_near_dup_index(out_dir, near_dup_index)
+
+    if read_data_version() != version:
+        shutil.rmtree(out_dir)
+        raise RuntimeError("Memory stores were written to during the snapshot; retry when ingest is idle")
+
+    manifest["files"] = {
+        f: {"sha256": sha256_file(os.path.join(out_dir, f)), "bytes": os.path.getsize(os.path.join(out_dir, f))}
+        for f in sorted(os.listdir(out_dir))
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Snapshot written to: {out_dir}")
+    print(f"  Qdrant points: {manifest['qdrant']['points']}")
+    print(f"  DuckDB rows: { {t: meta['rows'] for t, meta in manifest['duckdb'].items()} }")
+    print(f"  Neo4j: {manifest['neo4j']['nodes']} nodes, {manifest['neo4j']['relationships']} relationships")
+    return out_dir
+
+# ---------------------- Restore ----------------------
+
+def verify_snapshot(snapshot_dir):
+    with open(os.path.join(snapshot_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported snapshot manifest version: {manifest.get('version')}")
+    for name, meta in manifest["files"].items():
+        path = os.path.join(snapshot_dir, name)
+        if not os.path.exists(path) or sha256_file(path) != meta["sha256"]:
+            raise ValueError(f"Checksum mismatch for {name} in {snapshot_dir}")
+    return manifest
+
+def restore_qdrant(snapshot_dir, meta):
+    if qdrant.collection_exists(meta["collection"]):
+        qdrant.delete_collection(meta["collection"])
+    qdrant.create_collection(
+        collection_name=meta["collection"],
+        vectors_config=VectorParams(size=meta["vector_size"], distance=Distance(meta["distance"])),
+    )
+    # Indexes first so the tenant layout is built while points stream in
+    for field, data_type in meta["payload_schema"].items():
+        if data_type == PayloadSchemaType.KEYWORD.value:
+            schema = KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=field == "project")
+        else:
+            schema = PayloadSchemaType(data_type)
+        qdrant.create_payload_index(collection_name=meta["collection"], field_name=field, field_schema=schema)
+
+    parquet = pq.ParquetFile(os.path.join(snapshot_dir, "qdrant_points.parquet"))
+    for batch in parquet.iter_batches(batch_size=BATCH_SIZE):
+        rows = batch.to_pydict()
+        points = [
+            PointStruct(id=int(pid) if pid.isdigit() else pid, vector=vector, payload=json.loads(payload))
+            for pid, vector, payload in zip(rows["id"], rows["vector"], rows["payload"])
+        ]
+        qdrant.upsert(collection_name=meta["collection"], points=points)
+
+def restore_duckdb(snapshot_dir, tables):
+    missing = set(DUCKDB_TABLES) - set(tables)
+    if missing:
+        raise ValueError(f"Snapshot is missing DuckDB tables: {', '.join(sorted(missing))}")
+    for table, meta in tables.items():
+        path = os.path.join(snapshot_dir, f"duckdb_{table}.parquet")
+        conn = _connect(DUCKDB_TABLES[table])
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(meta["ddl"])
+        conn.execute(f"INSERT INTO {table} SELECT * FROM read_parquet('{path}')")
+        conn.close()
+    if "timeline_logs" in tables:
+        build_fts_index(DUCKDB_PATH)
+        export_partitioned_timeline(DUCKDB_PATH)
+
+def _read_jsonl_batches(path):
+    batch = []
+    with open(path) as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def restore_neo4j(snapshot_dir, meta):
+    with neo4j_driver.session() as session:
+        session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+        for statement in meta["schema"]:
+            try:
+                session.run(statement).consume()
+            except ClientError:
+                pass  # already exists on this server
+        # Temporary label + index so relationships can find their endpoints by snapshot id
+        session.run("CREATE INDEX snapshot_sid IF NOT EXISTS FOR (n:SnapshotNode) ON (n._sid)").consume()
+        session.run("CALL db.awaitIndexes()").consume()
+
+        for batch in _read_jsonl_batches(os.path.join(snapshot_dir, "neo4j_nodes.jsonl")):
+            by_labels = {}
+            for node in batch:
+                by_labels.setdefault(tuple(node["labels"]), []).append(
+                    {"sid": node["sid"], "props": _decode_props(node["props"])}
+                )
+            for labels, rows in by_labels.items():
+                label_sql = "".join(":" + _quote(l) for l in labels)
+                session.run(
+                    f"UNWIND $rows AS row CREATE (n:SnapshotNode{label_sql}) SET n = row.props, n._sid = row.sid",
+                    rows=rows
+                ).consume()
+
+        for batch in _read_jsonl_batches(os.path.join(snapshot_dir, "neo4j_relationships.jsonl")):
+            by_type = {}
+            for rel in batch:
+                by_type.setdefault(rel["type"], []).append(
+                    {"src": rel["src"], "dst": rel["dst"], "props": _decode_props(rel["props"])}
+                )
+            for rel_type, rows in by_type.items():
+                session.run(
+                    "UNWIND $rows AS row "
+                    "MATCH (a:SnapshotNode {_sid: row.src}) MATCH (b:SnapshotNode {_sid: row.dst}) "
+                    f"CREATE (a)-[r:{_quote(rel_type)}]->(b) SET r = row.props",
+                    rows=rows
+                ).consume()
+
+        session.run(
+            "MATCH (n:SnapshotNode) CALL { WITH n REMOVE n:SnapshotNode, n._sid } IN TRANSACTIONS OF 10000 ROWS"
+        ).consume()
+        session.run("DROP INDEX snapshot_sid IF EXISTS").consume()
+
+def restore_snapshot(snapshot_dir):
+    """
+    Bulk-load a snapshot made by create_snapshot into empty or stale stores.
+    Vectors come from the snapshot, so no embedding model is loaded.
+    """
+    manifest = verify_snapshot(snapshot_dir)
+    restore_qdrant(snapshot_dir, manifest["qdrant"])
+    restore_duckdb(snapshot_dir, manifest["duckdb"])
+    restore_neo4j(snapshot_dir, manifest["neo4j"])
+    # A stale .wal from the old index would be replayed onto the restored file
+    if "near_dup_index.duckdb" in manifest["files"] and os.path.exists(NEAR_DUP_INDEX_PATH + ".wal"):
+        os.remove(NEAR_DUP_INDEX_PATH + ".wal")
+    for name, dst in (("append.wal", WAL_PATH), ("near_dup_index.duckdb", NEAR_DUP_INDEX_PATH)):
+        if name in manifest["files"]:
+            _replace_file(os.path.join(snapshot_dir, name), dst)
+    bump_data_version()
+    print(f"Restored snapshot from: {snapshot_dir}")
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "create":
+        create_snapshot(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif len(sys.argv) == 3 and sys.argv[1] == "restore":
+        restore_snapshot(sys.argv[2])
+    else:
+        print("Usage: python snapshot.py create [name] | restore <snapshot_dir>")
@@ -3,24 +3,42 @@ import json
 from datetime import datetime
 from collections import defaultdict
 from openai import OpenAI
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue, PayloadSchemaType
 from dotenv import load_dotenv
 import duckdb
+from embedding_batcher import LazyModel
+from llm_cache import cached_chat_completion
+from summary_tree import SUMMARY_LEVELS, period_key, node_id, point_id
+from cache_warmer import bump_data_version
 
 load_dotenv()
 
 # === Clients ===
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
+embedding_model = LazyModel("all-MiniLM-L6-v2")
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 qdrant = QdrantClient(host="localhost", port=6333)
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION_NAME", "semantic_logs")
-retention_db = duckdb.connect("../data/retention_boosts.duckdb")
+RETENTION_DB_PATH = "../data/retention_boosts.duckdb"
+_retention_db = None
+
+def get_retention_db():
+    # Opened on first use so importing the tree helpers takes no file lock
+    global _retention_db
+    if _retention_db is None:
+        _retention_db = duckdb.connect(RETENTION_DB_PATH)
+    return _retention_db
+
+def close_retention_db():
+    # Releases the write lock so retrieval can attach the file once the version is bumped
+    global _retention_db
+    if _retention_db is not None:
+        _retention_db.close()
+        _retention_db = None
 
 # === Ensure Table Exists ===
 def init_retention_db():
-    retention_db.execute("""
+    get_retention_db().execute("""
         CREATE TABLE IF NOT EXISTS memory_retention_boosts (
             log_id TEXT PRIMARY KEY,
             boost FLOAT
@@ -33,7 +51,7 @@ def get_old_logs(days_old=30):
     old_logs = []
     for item in results:
         ts_str = item.payload.get("timestamp")
-        if not ts_str or item.payload.get("archived"):
+        if not ts_str or item.payload.get("archived") or item.payload.get("level"):
             continue
         try:
             ts = datetime.fromisoformat(ts_str)
@@ -56,14 +74,16 @@ def group_logs(logs):
 def summarize_logs(logs, project, month_key):
     text = "\n".join([f"- {log['content']}" for log in logs])
     prompt = f"Summarize the following logs for project '{project}' during {month_key} into key decisions, impactful data points, and action items:\n\n{text}"
-    response = client.chat.completions.create(
+    # Unchanged groups produce the same prompt and are served from the cache
+    response = cached_chat_completion(
+        client,
         model="gpt-4",
         messages=[
             {"role": "system", "content": "You are a senior technical summarizer."},
             {"role": "user", "content": prompt}
         ]
     )
-    return response.choices[0].message.content.strip()
+    return response.strip()
 
 # === Write back summary to Qdrant ===
 def upload_summary_to_qdrant(summary_text, project, month_key):
@@ -83,6 +103,112 @@ def upload_summary_to_qdrant(summary_text, project, month_key):
     )
     print(f"Uploaded summary for {project} {month_key}")
 
+# === Hierarchical summary tree (session -> day -> month -> quarter) ===
+MIN_CHILDREN_TO_SUMMARIZE = 3  # smaller groups reuse their children's text instead of a GPT call
+
+def init_summary_tree_indexes():
+    for field in ("level", "log_id"):
+        qdrant.create_payload_index(
+            collection_name=COLLECTION_NAME,
+            field_name=field,
+            field_schema=PayloadSchemaType.KEYWORD
+        )
+    # retrieval limits the flat search to logs newer than the tree's coverage
+    qdrant.create_payload_index(
+        collection_name=COLLECTION_NAME,
+        field_name="timestamp",
+        field_schema=PayloadSchemaType.DATETIME
+    )
+
+def existing_children(level, keys):
+    """
+    Children already under the (project, period) nodes of `level` from earlier
+    runs. Node ids are deterministic, so without these a rerun would rebuild a
+    node from only the new children and orphan the archived ones.
+    """
+    ids = {point_id(node_id(level, project, period)): (project, period) for project, period in keys}
+    found = qdrant.retrieve(collection_name=COLLECTION_NAME, ids=list(ids), with_payload=True)
+    child_ids = {str(p.id): p.payload.get("children", []) for p in found}
+    all_children = [c for cs in child_ids.values() for c in cs]
+    if not all_children:
+        return {}
+    payloads = {
+        p.payload["log_id"]: p.payload
+        for p in qdrant.retrieve(
+            collection_name=COLLECTION_NAME, ids=[point_id(c) for c in all_children], with_payload=True
+        )
+        if p.payload.get("log_id")
+    }
+    return {
+        ids[pid]: [payloads[c] for c in cs if c in payloads]
+        for pid, cs in child_ids.items()
+    }
+
+def build_summary_level(level, children):
+    groups = defaultdict(list)
+    for child in children:
+        groups[(child["project"], period_key(level, child))].append(child)
+
+    # Rebuild the whole period: merge in children from earlier runs
+    for key, previous in existing_children(level, groups).items():
+        present = {m["log_id"] for m in groups[key]}
+        groups[key].extend(c for c in previous if c["log_id"] not in present)
+
+    nodes = []
+    for (project, period), members in groups.items():
+        members.sort(key=lambda x: x["timestamp"])
+        if len(members) >= MIN_CHILDREN_TO_SUMMARIZE:
+            content = summarize_logs(members, project, period)
+        else:
+            content = "\n".join(m["content"] for m in members)
+        nodes.append({
+            "log_id": node_id(level, project, period),
+            "content": content,
+            "timestamp": members[0]["timestamp"],
+            "project": project,
+            "user": "summarizer",
+            "type": "summary",
+            "level": level,
+            "period": period,
+            "children": [m["log_id"] for m in members],
+            # Latest raw log under this node; retrieval searches only newer logs flat
+            "covered_until": max(m.get("covered_until") or m["timestamp"] for m in members),
+            "source": "summarizer",
+        })
+    return nodes
+
+def upload_summary_nodes(nodes):
+    if not nodes:
+        return
+    vectors = embedding_model.encode([n["content"] for n in nodes])
+    qdrant.upsert(
+        collection_name=COLLECTION_NAME,
+        points=[
+            PointStruct(id=point_id(n["log_id"]), vector=v.tolist(), payload=n)
+            for n, v in zip(nodes, vectors)
+        ]
+    )
+
+def link_children(nodes):
+    # Children point back at their parent so a hit can be walked upwards as well
+    for node in nodes:
+        qdrant.set_payload(
+            collection_name=COLLECTION_NAME,
+            payload={"parent_id": node["log_id"]},
+            points=[point_id(c) for c in node["children"]]
+        )
+
+def build_summary_tree(logs):
+    init_summary_tree_indexes()
+    children = logs
+    for level in SUMMARY_LEVELS:
+        nodes = build_summary_level(level, children)
+        upload_summary_nodes(nodes)
+        link_children(nodes)
+        print(f"Uploaded {len(nodes)} {level} summaries")
+        children = nodes
+    return children
+
 # === Archive original logs ===
 def archive_logs(logs):
     for log in logs:
@@ -100,7 +226,7 @@ def reinforce_logs(logs):
         log_id = log.get("log_id")
         if not log_id:
             continue
-        retention_db.execute("""
+        get_retention_db().execute("""
             INSERT INTO memory_retention_boosts (log_id, boost)
             VALUES (?, 0.05)
             ON CONFLICT (log_id) DO UPDATE SET boost = memory_retention_boosts.boost + 0.05
@@ -108,9 +234,17 @@ def reinforce_logs(logs):
     print(f"🔁 Boosted {len(logs)} logs in memory_retention_boosts")
 
 # === Entry point ===
-def run_summarizer():
+def run_summarizer(hierarchical=True):
     init_retention_db()
     old_logs = get_old_logs(days_old=30)
+    if hierarchical:
+        build_summary_tree(old_logs)
+        archive_logs(old_logs)
+        reinforce_logs(old_logs)
+        close_retention_db()
+        bump_data_version()
+        return
+
     grouped = group_logs(old_logs)
     for month_key, logs in grouped.items():
         project = logs[0]["project"]
@@ -118,6 +252,8 @@ def run_summarizer():
         upload_summary_to_qdrant(summary_text, project, month_key)
         archive_logs(logs)
         reinforce_logs(logs)
+    close_retention_db()
+    bump_data_version()
 
 if __name__ == "__main__":
     run_summarizer()
@@ -0,0 +1,32 @@
+# core/summary_tree.py
+
+import uuid
+from datetime import datetime
+
+# Finest to coarsest. Each level summarizes the nodes of the level below it;
+# "session" nodes summarize raw logs.
+SUMMARY_LEVELS = ["session", "day", "month", "quarter"]
+
+def period_key(level, node):
+    if level == "session":
+        return node.get("session_id") or "no_session"
+    ts = node["timestamp"]
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if level == "day":
+        return ts.date().isoformat()
+    if level == "month":
+        return f"{ts.year}-{ts.month:02}"
+    if level == "quarter":
+        return f"{ts.year}-Q{(ts.month - 1) // 3 + 1}"
+    raise ValueError(f"Unknown summary level: {level}")
+
+def node_id(level, project, period):
+    return f"summary::{level}::{project}::{period}"
+
+def point_id(log_id):
+    # Qdrant point ids must be UUIDs or integers
+    try:
+        return str(uuid.UUID(log_id))
+    except ValueError:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, log_id))
@@ -91,28 +91,30 @@ def generate_impact_log(i):
         "log_id": str(uuid.uuid4())
     }
 
-# Step 1: Generate current logs
-current_logs = [generate_log_entry(i) for i in range(num_current_logs)]
-
-# Step 2: Generate old impactful logs
-old_logs = [generate_impact_log(i) for i in range(num_old_logs)]
-
-# Step 3: Add duplicates (10% of current logs)
-duplicates = []
-num_duplicates = int(duplicate_ratio * num_current_logs)
-for entry in random.sample(current_logs, num_duplicates):
-    dup = entry.copy()
-    shifted_ts = datetime.fromisoformat(dup["timestamp"]) + timedelta(minutes=random.randint(-5, 5))
-    dup["timestamp"] = shifted_ts.isoformat()
-    dup["log_id"] = str(uuid.uuid4())
-    duplicates.append(dup)
-
-# Step 4: Combine all
-all_logs = current_logs + old_logs + duplicates
-random.shuffle(all_logs)
-
-with open(output_path, "w") as f:
-    for log in all_logs:
-        f.write(json.dumps(log) + "\n")
-
-print(f"Generated {len(current_logs)} recent logs, {len(old_logs)} old impact logs, and {len(duplicates)} duplicates.")
+# Importable (templates / generators are reused by eval_sweep.py); generate only when run
+if __name__ == "__main__":
+    # Step 1: Generate current logs
+    current_logs = [generate_log_entry(i) for i in range(num_current_logs)]
+
+    # Step 2: Generate old impactful logs
+    old_logs = [generate_impact_log(i) for i in range(num_old_logs)]
+
+    # Step 3: Add duplicates (10% of current logs)
+    duplicates = []
+    num_duplicates = int(duplicate_ratio * num_current_logs)
+    for entry in random.sample(current_logs, num_duplicates):
+        dup = entry.copy()
+        shifted_ts = datetime.fromisoformat(dup["timestamp"]) + timedelta(minutes=random.randint(-5, 5))
+        dup["timestamp"] = shifted_ts.isoformat()
+        dup["log_id"] = str(uuid.uuid4())
+        duplicates.append(dup)
+
+    # Step 4: Combine all
+    all_logs = current_logs + old_logs + duplicates
+    random.shuffle(all_logs)
+
+    with open(output_path, "w") as f:
+        for log in all_logs:
+            f.write(json.dumps(log) + "\n")
+
+    print(f"Generated {len(current_logs)} recent logs, {len(old_logs)} old impact logs, and {len(duplicates)} duplicates.")
@@ -0,0 +1,57 @@
+# core/tail_index.py
+
+import threading
+import numpy as np
+
+class TailIndex:
+    """
+    In-memory index over appended logs that have not been flushed to the
+    stores yet, so they are searchable as soon as append() returns.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logs = {}
+        self._vectors = {}
+
+    def __len__(self):
+        return len(self._logs)
+
+    def add(self, log, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        with self._lock:
+            self._logs[log["log_id"]] = log
+            self._vectors[log["log_id"]] = vector / norm if norm else vector
+
+    def remove(self, log_ids):
+        with self._lock:
+            for log_id in log_ids:
+                self._logs.pop(log_id, None)
+                self._vectors.pop(log_id, None)
+
+    def vector(self, log_id):
+        return self._vectors.get(log_id)
+
+    def search(self, query_vector, top_k=5, projects=None):
+        with self._lock:
+            ids = [i for i, log in self._logs.items() if not projects or log.get("project") in projects]
+            if not ids:
+                return []
+            matrix = np.stack([self._vectors[i] for i in ids])
+            logs = [self._logs[i] for i in ids]
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm if norm else query)
+        order = np.argsort(-scores)[:top_k]
+
+        results = []
+        for idx in order:
+            log = dict(logs[idx])
+            log["score"] = float(scores[idx])
+            log["source"] = "Tail"
+            results.append(log)
+        return results
+
+tail_index = TailIndex()
@@ -0,0 +1,23 @@
+import os
+import sys
+import importlib
+import pytest
+
+# Modules import each other by flat name and use ../data paths, as when run from memory/
+MEMORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "memory")
+sys.path.insert(0, MEMORY_DIR)
+
+@pytest.fixture(autouse=True)
+def _run_from_memory_dir(monkeypatch):
+    monkeypatch.chdir(MEMORY_DIR)
+
+def import_or_skip(name):
+    """Import a module that needs the full stack (models, store clients), or skip."""
+    cwd = os.getcwd()
+    os.chdir(MEMORY_DIR)
+    try:
+        return importlib.import_module(name)
+    except Exception as e:
+        pytest.skip(f"{name} unavailable: {e}", allow_module_level=True)
+    finally:
+        os.chdir(cwd)
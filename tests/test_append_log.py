@@ -0,0 +1,138 @@
+import json
+import numpy as np
+import pytest
+import append_log
+from near_dup_index import NearDuplicateIndex
+from tail_index import TailIndex
+
+class FakeEmbedder:
+    def encode(self, text):
+        return np.ones(4, dtype=np.float32)
+
+    def encode_many(self, texts):
+        return [self.encode(t) for t in texts]
+
+class FakeStores:
+    def __init__(self):
+        self.written = []
+        self.fail = lambda batch: False
+        self.flushes = 0
+
+    def write(self, batch, vectors):
+        assert all(v is not None for v in vectors)
+        if self.fail(batch):
+            raise RuntimeError("store unavailable")
+        self.written.extend(log["log_id"] for log in batch)
+
+    def rebuild_fts(self):
+        pass
+
+    def flushed(self):
+        self.flushes += 1
+
+@pytest.fixture
+def stores(monkeypatch, tmp_path):
+    monkeypatch.setattr(append_log, "tail_index", TailIndex())
+    monkeypatch.setattr(append_log, "DEAD_LETTER_PATH", str(tmp_path / "dead_letter.jsonl"))
+    fake = FakeStores()
+    fake.index = NearDuplicateIndex(path=None)
+    fake.wal = str(tmp_path / "wal" / "append.wal")
+    fake.tmp = tmp_path
+    return fake
+
+def make_buffer(stores):
+    # Long interval: the background flusher stays idle, tests flush explicitly
+    return append_log.AppendBuffer(wal_path=stores.wal, flush_batch_size=1000, flush_interval_ms=600_000,
+                                   encoder=FakeEmbedder(), stores=stores, near_dups=stores.index)
+
+def event(i, **fields):
+    return {"log_id": f"log-{i}", "user": "carol", "project": "AI Assistant",
+            "content": f"Event number {i} about topic {i * 7919} in sprint {i}", **fields}
+
+def wal_ids(path):
+    with open(path) as f:
+        return [json.loads(line)["log_id"] for line in f]
+
+def test_append_writes_wal_and_replays(stores):
+    buffer = make_buffer(stores)
+    buffer.append(event(1))
+    buffer.append(event(2))
+    assert wal_ids(stores.wal) == ["log-1", "log-2"]
+    assert len(append_log.tail_index) == 2
+
+    # A restart before the flush replays the WAL into the tail and the pending queue
+    append_log.tail_index.remove(["log-1", "log-2"])
+    replayed = make_buffer(stores)
+    assert [log["log_id"] for log in replayed._pending] == ["log-1", "log-2"]
+    assert len(append_log.tail_index) == 2
+
+def test_replay_skips_torn_tail(stores):
+    buffer = make_buffer(stores)
+    buffer.append(event(1))
+    with open(stores.wal, "a") as f:
+        f.write('{"log_id": "log-2", "con')
+    replayed = make_buffer(stores)
+    assert [log["log_id"] for log in replayed._pending] == ["log-1"]
+
+def test_flush_checkpoints_wal(stores):
+    buffer = make_buffer(stores)
+    buffer.append(event(1))
+    buffer.append(event(2))
+    assert buffer.flush() == 2
+    assert stores.written == ["log-1", "log-2"]
+    assert wal_ids(stores.wal) == []
+    assert len(append_log.tail_index) == 0
+    assert buffer.stats()["pending"] == 0
+    assert stores.flushes == 1
+
+def test_store_outage_keeps_batch_pending(stores):
+    buffer = make_buffer(stores)
+    buffer.append(event(1))
+    buffer.append(event(2))
+    stores.fail = lambda batch: True
+    assert buffer.flush() == 0
+    assert wal_ids(stores.wal) == ["log-1", "log-2"]
+    assert buffer.stats()["pending"] == 2
+    assert buffer.stats()["dead_lettered"] == 0
+
+def test_failing_event_is_dead_lettered(stores):
+    buffer = make_buffer(stores)
+    for i in (1, 2, 3):
+        buffer.append(event(i))
+    stores.fail = lambda batch: any(log["log_id"] == "log-2" for log in batch)
+    assert buffer.flush() == 2
+    assert stores.written == ["log-1", "log-3"]
+    assert wal_ids(stores.wal) == []
+    assert wal_ids(stores.tmp / "dead_letter.jsonl") == ["log-2"]
+
+def test_near_duplicate_is_aliased_not_logged(stores):
+    buffer = make_buffer(stores)
+    buffer.append(event(1))
+    duplicate = buffer.append({**event(1), "log_id": "log-1b"})
+    assert duplicate["duplicate_of"] == "log-1"
+    assert wal_ids(stores.wal) == ["log-1"]
+
+def test_failed_wal_write_does_not_register_near_dup(stores):
+    buffer = make_buffer(stores)
+
+    class BrokenWal:
+        def write(self, data):
+            raise OSError("disk full")
+
+    buffer._wal = BrokenWal()
+    with pytest.raises(OSError):
+        buffer.append(event(1))
+    assert stores.index.check(event(1)) is None
+    assert len(append_log.tail_index) == 0
+
+def test_normalize_log_defaults_and_validation():
+    log = append_log.normalize_log(event(1, type=None, session_id=None, timestamp="2024-03-01T08:00:00"))
+    assert log["type"] == "general"
+    assert log["session_id"] == "sess_live"
+    assert log["month"] == "2024-03"
+    with pytest.raises(ValueError):
+        append_log.normalize_log({"user": "carol", "project": "AI Assistant"})
+    with pytest.raises(ValueError):
+        append_log.normalize_log(event(1, user=42))
+    with pytest.raises(ValueError):
+        append_log.normalize_log(event(1, timestamp="yesterday"))
@@ -0,0 +1,81 @@
+import time
+import pytest
+import cache_warmer
+from cache_warmer import CacheWarmer, bump_data_version
+from log_record import LogRecord
+
+def record(log_id, project="Infra Migration", timestamp="2024-03-01T09:00:00"):
+    return LogRecord(log_id, timestamp, "carol", project, content=f"content of {log_id}")
+
+class FakeStores:
+    def __init__(self):
+        self.timeline = {"Infra Migration": [record("a"), record("b")]}
+        self.encoded = []
+
+    def fetch_timeline(self, since, projects, limit):
+        return list(self.timeline.get(projects[0], []))
+
+    def fetch_relational(self, projects, limit):
+        return []
+
+    def encode(self, texts):
+        self.encoded += texts
+        return [[float(len(t)), 1.0] for t in texts]
+
+@pytest.fixture
+def stores(monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_warmer, "DATA_VERSION_PATH", str(tmp_path / ".memory_version"))
+    return FakeStores()
+
+def make_warmer(stores):
+    warmer = CacheWarmer(stores.fetch_timeline, stores.fetch_relational, lambda ids: {"a": 0.05}, stores.encode)
+    # Marked hot directly so no background thread starts; tests drive refresh() themselves
+    warmer._frequency["Infra Migration"] = 1.0
+    return warmer
+
+def test_refresh_serves_hot_project_from_memory(stores):
+    warmer = make_warmer(stores)
+    warmer.refresh()
+    rows = warmer.get_timeline(["Infra Migration"], "2024-01-01", 5)
+    assert [r.log_id for r in rows] == ["a", "b"]
+    assert warmer.boost("a") == 0.05 and warmer.boost("b") == 0.0
+    assert warmer.vector("a") is not None
+    assert warmer.get_timeline(["AI Assistant"], "2024-01-01", 5) is None
+
+def test_version_bump_makes_snapshot_stale(stores):
+    warmer = make_warmer(stores)
+    warmer.refresh()
+    time.sleep(0.01)
+    bump_data_version()
+    assert warmer.get_timeline(["Infra Migration"], "2024-01-01", 5) is None
+    assert warmer.stats()["stale"] == 1
+
+def test_refresh_encodes_only_new_records(stores):
+    warmer = make_warmer(stores)
+    warmer.refresh()
+    stores.timeline["Infra Migration"].append(record("c"))
+    warmer.refresh()
+    assert stores.encoded == ["content of a", "content of b", "content of c"]
+
+def test_background_thread_picks_up_version_bump(stores, monkeypatch):
+    monkeypatch.setattr(cache_warmer, "WARM_POLL_SECONDS", 0.01)
+    warmer = CacheWarmer(stores.fetch_timeline, stores.fetch_relational, lambda ids: {}, stores.encode)
+    warmer.record_query(["Infra Migration"])  # starts the thread and requests the first refresh
+    try:
+        deadline = time.time() + 2
+        while warmer.stats()["refreshes"] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        bump_data_version()
+        while warmer.stats()["refreshes"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert warmer.stats()["refreshes"] == 2
+    finally:
+        warmer.stop()
+
+def test_stop_drops_snapshot(stores):
+    warmer = make_warmer(stores)
+    warmer.refresh()
+    warmer.stop()
+    assert warmer.get_timeline(["Infra Migration"], "2024-01-01", 5) is None
+    assert warmer.vector("a") is None
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from conftest import import_or_skip
+from tail_index import TailIndex
+
+retrieval = import_or_skip("retrieval")
+
+def encode(texts, batch_size=64):
+    # Deterministic stand-in for the sentence-transformer: vowel counts
+    return np.array([[t.lower().count(c) + 1.0 for c in "aeiou"] for t in texts], dtype=np.float32)
+
+def records(source, *rows):
+    return lambda: [
+        retrieval.LogRecord(log_id, timestamp=ts, user=user, project="Infra Migration",
+                            content=f"{log_id} rollback checklist", source=source)
+        for log_id, ts, user in rows
+    ]
+
+LEXICAL = records("lexical", ("a", "2024-03-02T09:00:00", "carol"), ("b", "2024-03-01T09:00:00", "eve"))
+TIMELINE = records("timeline", ("c", "2024-03-05T09:00:00", "dave"), ("a", "2024-03-02T09:00:00", "carol"))
+SEMANTIC = records("semantic", ("d", "2024-02-20T09:00:00", "alice"), ("b", "2024-03-01T09:00:00", "eve"))
+RELATED = records("relational", ("e", "2024-02-10T09:00:00", "bob"))
+
+@pytest.fixture
+def stores(monkeypatch):
+    """Both retrieval paths served the same candidates from fakes."""
+    monkeypatch.setattr(retrieval, "embedding_model", SimpleNamespace(encode=encode))
+    monkeypatch.setattr(retrieval.embedding_batcher, "encode", lambda text: encode([text])[0])
+    monkeypatch.setattr(retrieval, "cache_warmer", SimpleNamespace(
+        get_timeline=lambda *a, **kw: None, get_relational=lambda *a, **kw: None,
+        record_query=lambda projects: None, vector=lambda log_id: None, boost=lambda log_id: None,
+    ))
+    monkeypatch.setattr(retrieval, "tail_index", TailIndex())
+    monkeypatch.setattr(retrieval, "get_retention_boosts", lambda log_ids: {})
+    monkeypatch.setattr(retrieval, "get_known_projects", lambda refresh=False: ["Infra Migration"])
+    monkeypatch.setattr(retrieval, "get_known_users", lambda refresh=False: ["carol"])
+
+    monkeypatch.setattr(retrieval, "get_lexical_logs", lambda query, top_k=5, **kw: LEXICAL()[:top_k])
+    monkeypatch.setattr(retrieval, "get_timeline_logs", lambda since, limit=5, **kw: TIMELINE()[:limit])
+    monkeypatch.setattr(retrieval, "get_semantic_logs", lambda query, top_k=5, **kw: SEMANTIC()[:top_k])
+    monkeypatch.setattr(retrieval, "get_relational_logs", lambda limit=5, **kw: RELATED()[:limit])
+    monkeypatch.setattr(retrieval, "get_timeline_logs_batch",
+                        lambda requests: [TIMELINE()[:limit] for _, _, _, limit in requests])
+    monkeypatch.setattr(retrieval, "get_semantic_logs_batch",
+                        lambda vectors, top_ks, projects_list: [SEMANTIC()[:k] for k in top_ks])
+    monkeypatch.setattr(retrieval, "get_relational_logs_batch",
+                        lambda requests: [RELATED()[:limit] for _, limit in requests])
+
+def ranked(logs):
+    return [(log["log_id"], log["score"]) for log in logs]
+
+def test_batch_matches_single_query_path(stores):
+    queries = ["What did Carol say about the Infra Migration rollback?", "open questions on the cutover"]
+    batch = retrieval.get_combined_logs_batch(queries, since="2024-02-01", threshold=0.0)
+    single = [retrieval.get_combined_logs(q, since="2024-02-01", threshold=0.0) for q in queries]
+    assert [ranked(logs) for logs in batch] == [ranked(logs) for logs in single]
+    assert {log["log_id"] for log in batch[0]} == {"a", "b", "c", "d", "e"}
+
+def test_batch_returns_discarded_like_single(stores):
+    query = "What did Carol say about the Infra Migration rollback?"
+    [(retained, discarded)] = retrieval.get_combined_logs_batch([query], top_k=2, threshold=0.5, return_discarded=True)
+    single_retained, single_discarded = retrieval.get_combined_logs(query, top_k=2, threshold=0.5, return_discarded=True)
+    assert ranked(retained) == ranked(single_retained)
+    assert ranked(discarded) == ranked(single_discarded)
+
+def test_select_applies_threshold_then_top_k():
+    combined = [{"log_id": i, "score": s} for i, s in [("a", 0.2), ("b", 0.9), ("c", 0.5), ("d", 0.7)]]
+    assert [log["log_id"] for log in retrieval._select(list(combined), 0.4, 2, False)] == ["b", "d"]
+    retained, discarded = retrieval._select(list(combined), 0.4, 5, True)
+    assert [log["log_id"] for log in retained] == ["b", "d", "c"]
+    assert [log["log_id"] for log in discarded] == ["a"]
+
+def test_anchor_prefers_the_planned_project():
+    plan = SimpleNamespace(projects=["AI Assistant"])
+    head = [{"log_id": "a", "project": "Infra Migration"}]
+    assert retrieval._anchor(plan, head, []) == ("AI Assistant", ["AI Assistant"])
+    assert retrieval._anchor(SimpleNamespace(projects=[]), head, []) == ("Infra Migration", ["Infra Migration"])
+    assert retrieval._anchor(SimpleNamespace(projects=[]), [], []) == (None, [])
+
+def test_search_batch_unwraps_query_batch_points(monkeypatch):
+    calls = []
+    def query_batch_points(collection_name, requests):
+        calls.append(requests)
+        return [SimpleNamespace(points=[f"hit for {r}"]) for r in requests]
+    monkeypatch.setattr(retrieval, "qdrant", SimpleNamespace(query_batch_points=query_batch_points))
+    assert retrieval._search_batch([]) == []
+    assert calls == []
+    assert retrieval._search_batch(["q1", "q2"]) == [["hit for q1"], ["hit for q2"]]
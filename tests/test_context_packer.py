@@ -0,0 +1,46 @@
+from context_packer import pack_context, collapse_near_duplicates, count_tokens, render_log_entry
+
+def log(log_id, content, score, user="carol"):
+    return {"log_id": log_id, "timestamp": f"2024-03-0{log_id[-1]}T08:00:00", "user": user,
+            "content": content, "score": score}
+
+def test_collapse_keeps_highest_scoring_and_cites_duplicates():
+    logs = [
+        log("a1", "Decided to move the onboarding flow to the new design system.", 0.5),
+        log("a2", "Decided to move the onboarding flow to the new design system!", 0.9, user="bob"),
+        log("a3", "Infra migration blocked on the database cutover.", 0.7),
+    ]
+    kept, merged = collapse_near_duplicates(logs)
+    assert merged == 1
+    assert [l["log_id"] for l in kept] == ["a2", "a3"]
+    assert kept[0]["duplicates"] == [{"log_id": "a1", "timestamp": "2024-03-01T08:00:00", "user": "carol"}]
+    # Inputs are not mutated
+    assert "duplicates" not in logs[1]
+
+def test_collapse_leaves_distinct_logs():
+    logs = [log("a1", "Feature flags rollout finished.", 0.4), log("a2", "Analytics dashboard latency regressed.", 0.3)]
+    kept, merged = collapse_near_duplicates(logs)
+    assert merged == 0
+    assert len(kept) == 2
+
+def test_pack_context_fits_everything_under_budget():
+    logs = [log("a1", "Short note one.", 0.9), log("a2", "Short note two.", 0.8)]
+    packed, stats = pack_context(logs, token_budget=1000)
+    assert [l["log_id"] for l in packed] == ["a1", "a2"]
+    assert stats["tokens_after"] == sum(count_tokens(render_log_entry(l)) for l in logs)
+    assert stats["tokens_saved"] == 0
+    assert stats["dropped"] == stats["truncated"] == 0
+
+def test_pack_context_truncates_then_drops():
+    first = log("a1", "word " * 40, 0.9)
+    second = log("a2", "other " * 400, 0.8)
+    third = log("a3", "third entry " * 50, 0.7)
+    budget = count_tokens(render_log_entry(first)) + 60
+    packed, stats = pack_context([first, second, third], token_budget=budget)
+    assert [l["log_id"] for l in packed] == ["a1", "a2"]
+    assert packed[1]["truncated"] is True
+    assert packed[1]["content"].endswith(" ...")
+    assert stats["truncated"] == 1
+    assert stats["dropped"] == 1
+    assert stats["tokens_after"] <= budget
+    assert stats["tokens_saved"] == stats["tokens_before"] - stats["tokens_after"]
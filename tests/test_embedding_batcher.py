@@ -0,0 +1,60 @@
+import sys
+import threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from embedding_batcher import EmbeddingBatcher, LazyModel
+
+class FakeModel:
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+        self.entered = threading.Event()
+
+    def encode(self, texts, batch_size=None):
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        self.calls.append(list(texts))
+        if "boom" in texts:
+            raise ValueError("encode failed")
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+def test_encode_returns_each_texts_vector():
+    batcher = EmbeddingBatcher(FakeModel(), max_wait_ms=1)
+    assert list(batcher.encode("abc")) == [3.0, 1.0]
+    assert [list(v) for v in batcher.encode_many(["a", "abcd"], timeout=5)] == [[1.0, 1.0], [4.0, 1.0]]
+
+def test_queued_requests_share_one_encode_call():
+    gate = threading.Event()
+    model = FakeModel(gate)
+    batcher = EmbeddingBatcher(model, max_batch_size=3, max_wait_ms=1)
+    first = batcher.submit("warm")
+    assert model.entered.wait(timeout=5)    # the dispatcher is held inside encode
+    futures = [batcher.submit(t) for t in ("a", "bb", "ccc", "dddd")]
+    gate.set()
+    assert [f.result(timeout=5)[0] for f in futures] == [1.0, 2.0, 3.0, 4.0]
+    first.result(timeout=5)
+    # The four queued texts go out as max_batch_size + the rest
+    assert model.calls[1:] == [["a", "bb", "ccc"], ["dddd"]]
+    metrics = batcher.metrics()
+    assert metrics["requests"] == 5 and metrics["batches"] == 3
+    assert metrics["max_batch_size"] == 3
+
+def test_encode_error_reaches_every_caller_in_the_batch():
+    batcher = EmbeddingBatcher(FakeModel(), max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.encode("boom", timeout=5)
+    assert list(batcher.encode("ok", timeout=5)) == [2.0, 1.0]
+
+def test_lazy_model_loads_once(monkeypatch):
+    loads = []
+    def load(name):
+        loads.append(name)
+        return SimpleNamespace(encode=lambda texts, **kwargs: texts)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", SimpleNamespace(SentenceTransformer=load))
+    model = LazyModel("all-MiniLM-L6-v2")
+    assert loads == []
+    assert model.encode(["x"]) == ["x"]
+    model.encode(["y"])
+    assert loads == ["all-MiniLM-L6-v2"]
@@ -0,0 +1,32 @@
+import pandas as pd
+from conftest import import_or_skip
+
+eval_sweep = import_or_skip("eval_sweep")
+
+def test_recall_at_k_is_normalized_by_what_fits_in_k():
+    assert eval_sweep.recall_at_k(["a", "x", "b"], {"a", "b"}, 3) == 1.0
+    # Five relevant logs but only k=2 slots: two hits is a perfect score
+    assert eval_sweep.recall_at_k(["a", "b", "c"], {"a", "b", "c", "d", "e"}, 2) == 1.0
+    # Hits past k do not count
+    assert eval_sweep.recall_at_k(["x", "y", "a"], {"a"}, 2) == 0.0
+
+def test_reciprocal_rank_uses_first_relevant_hit():
+    assert eval_sweep.reciprocal_rank(["x", "a", "b"], {"a", "b"}) == 0.5
+    assert eval_sweep.reciprocal_rank(["x", "y"], {"a"}) == 0.0
+
+def test_pareto_front_keeps_only_undominated_rows():
+    df = pd.DataFrame([
+        {"recall@k": 0.9, "mrr": 0.8, "p95_ms": 50.0, "prompt_tokens": 900.0},   # best quality
+        {"recall@k": 0.7, "mrr": 0.6, "p95_ms": 20.0, "prompt_tokens": 400.0},   # cheapest
+        {"recall@k": 0.7, "mrr": 0.6, "p95_ms": 30.0, "prompt_tokens": 400.0},   # dominated by the row above
+        {"recall@k": 0.9, "mrr": 0.8, "p95_ms": 50.0, "prompt_tokens": 900.0},   # tie with the first row
+    ])
+    assert eval_sweep.pareto_front(df) == [True, True, False, True]
+
+def test_sweep_configs_samples_reproducibly():
+    grid = {"top_k": [3, 5], "source_limit": [10, 20], "threshold": [0.2, 0.4],
+            "weights": ["a", "b"], "speakers": ["flat"]}
+    assert len(eval_sweep.sweep_configs(grid, max_configs=0)) == 16
+    sample = eval_sweep.sweep_configs(grid, max_configs=5, seed=7)
+    assert len(sample) == 5
+    assert sample == eval_sweep.sweep_configs(grid, max_configs=5, seed=7)
@@ -0,0 +1,108 @@
+import duckdb
+import pytest
+from conftest import import_or_skip
+from tail_index import TailIndex
+
+retrieval = import_or_skip("retrieval")
+
+def logs(*ids):
+    return [{"log_id": i} for i in ids]
+
+def test_rrf_sums_reciprocal_ranks():
+    k = retrieval.RRF_K
+    fused = retrieval.reciprocal_rank_fusion([logs("a", "b"), logs("b", "c")])
+    scores = {log["log_id"]: log["rrf_score"] for log in fused}
+    assert scores["b"] == round(1 / (k + 2) + 1 / (k + 1), 6)
+    assert scores["a"] == round(1 / (k + 1), 6)
+    assert scores["c"] == round(1 / (k + 2), 6)
+    assert [log["log_id"] for log in fused] == ["b", "a", "c"]
+
+def test_rrf_keeps_first_occurrence_and_skips_missing_ids():
+    first = {"log_id": "a", "source": "semantic"}
+    fused = retrieval.reciprocal_rank_fusion([[first, {"content": "no id"}], [{"log_id": "a", "source": "lexical"}]])
+    assert len(fused) == 1
+    assert fused[0] is first
+
+def test_rrf_empty():
+    assert retrieval.reciprocal_rank_fusion([[], []]) == []
+
+def test_fused_rank_scores_spread_over_each_query():
+    fusion = retrieval.fused_rank_scores([1 / 61, 1 / 70, 2 / 61, 1 / 70, 1 / 61], groups=[0, 0, 0, 0, 1])
+    assert list(fusion) == [0.75, 0.5, 1.0, 0.5, 1.0]
+
+def test_weights_total_matches_threshold_scale():
+    assert abs(sum(retrieval.CRAG_WEIGHTS.values()) - 1.0) < 1e-9
+
+def test_timeline_candidates_get_fused_rank():
+    timeline = [retrieval.LogRecord(f"t{i}", user="carol") for i in range(3)]
+    combined = retrieval._merge_candidates([], [{"log_id": "t1"}], [], [], timeline)
+    assert [log["log_id"] for log in combined] == ["t1", "t0", "t2"]
+    assert all(log["rrf_score"] for log in combined)
+
+def test_full_lexical_head_skips_fallback_semantic(monkeypatch):
+    hits = [retrieval.LogRecord(f"l{i}", user="carol", content="rollback checklist") for i in range(8)]
+    calls = []
+    monkeypatch.setattr(retrieval, "get_lexical_logs", lambda query, top_k, **kw: hits[:top_k])
+    monkeypatch.setattr(retrieval, "get_relational_logs", lambda **kw: [])
+    monkeypatch.setattr(retrieval, "get_retention_boosts", lambda log_ids: {})
+    monkeypatch.setattr(retrieval, "get_semantic_logs", lambda *a, **kw: calls.append("semantic") or [])
+    monkeypatch.setattr(retrieval.embedding_batcher, "encode", lambda text: calls.append("encode"))
+    monkeypatch.setattr(retrieval, "tail_index", TailIndex())
+    plan = retrieval.plan_query('"rollback checklist" staging cutover')
+    assert plan.fallback == ["semantic"]
+    retrieval.get_combined_logs("rollback checklist", plan=plan, threshold=0.0)
+    assert calls == []
+    # A short lexical head falls back to the vector search
+    retrieval.get_combined_logs("rollback checklist", plan=retrieval.plan_query('"rollback checklist" staging cutover'),
+                                source_limits={"lexical": 20}, threshold=0.0)
+    assert calls == ["encode", "semantic"]
+
+def test_retention_boosts_come_from_the_summarizer_db(monkeypatch, tmp_path):
+    path = str(tmp_path / "retention_boosts.duckdb")
+    conn = duckdb.connect(path)
+    conn.execute("CREATE TABLE memory_retention_boosts (log_id TEXT PRIMARY KEY, boost FLOAT)")
+    conn.execute("INSERT INTO memory_retention_boosts VALUES ('a', 0.05), ('b', 0.1)")
+    conn.close()
+    version = [1.0]
+    monkeypatch.setattr(retrieval, "RETENTION_DB_PATH", path)
+    monkeypatch.setattr(retrieval, "read_data_version", lambda: version[0])
+    monkeypatch.setattr(retrieval, "_retention_boosts", {"version": None, "boosts": {}})
+    assert retrieval.get_retention_boosts(["a", "c"]) == {"a": pytest.approx(0.05)}
+    # Re-read only after a version bump
+    conn = duckdb.connect(path)
+    conn.execute("UPDATE memory_retention_boosts SET boost = 0.2 WHERE log_id = 'a'")
+    conn.close()
+    assert retrieval.get_retention_boosts(["a"]) == {"a": pytest.approx(0.05)}
+    version[0] = 2.0
+    assert retrieval.get_retention_boosts(["a"]) == {"a": pytest.approx(0.2)}
+
+def test_known_values_follow_the_data_version(monkeypatch):
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE timeline_logs (project TEXT, \"user\" TEXT)")
+    conn.execute("INSERT INTO timeline_logs VALUES ('Infra Migration', 'carol')")
+    version = [1.0]
+    monkeypatch.setattr(retrieval, "get_duckdb_cursor", lambda: conn)
+    monkeypatch.setattr(retrieval, "read_data_version", lambda: version[0])
+    monkeypatch.setattr(retrieval, "_known_values", {})
+    assert retrieval.get_known_projects() == ["Infra Migration"]
+    conn.execute("INSERT INTO timeline_logs VALUES ('AI Assistant', 'eve')")
+    assert retrieval.get_known_projects() == ["Infra Migration"]
+    version[0] = 2.0
+    assert retrieval.get_known_projects() == ["AI Assistant", "Infra Migration"]
+
+def test_explicit_since_runs_timeline_head(monkeypatch):
+    calls = []
+    def timeline(since, projects=None, limit=5, users=None):
+        calls.append(since)
+        return []
+    monkeypatch.setattr(retrieval, "get_timeline_logs", timeline)
+    monkeypatch.setattr(retrieval, "get_lexical_logs", lambda query, top_k, **kw: [])
+    monkeypatch.setattr(retrieval, "get_semantic_logs", lambda *a, **kw: [])
+    monkeypatch.setattr(retrieval, "get_relational_logs", lambda **kw: [])
+    monkeypatch.setattr(retrieval.embedding_batcher, "encode", lambda text: None)
+    monkeypatch.setattr(retrieval, "get_known_projects", lambda refresh=False: [])
+    monkeypatch.setattr(retrieval, "get_known_users", lambda refresh=False: [])
+    retrieval.get_combined_logs("rollback checklist for the staging cutover")
+    assert calls == []
+    retrieval.get_combined_logs("rollback checklist for the staging cutover", since="2024-02-01")
+    assert [str(c) for c in calls] == ["2024-02-01 00:00:00"]
@@ -0,0 +1,74 @@
+import sqlite3
+from types import SimpleNamespace
+import pytest
+import llm_cache
+
+class FakeClient:
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **params):
+        self.calls += 1
+        message = SimpleNamespace(content=f"answer {self.calls}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setattr(llm_cache, "_conn", None)
+    monkeypatch.setattr(llm_cache, "_stats", {k: 0 for k in llm_cache._stats})
+    yield llm_cache
+    if llm_cache._conn is not None:
+        llm_cache._conn.close()
+
+def messages(text):
+    return [{"role": "user", "content": text}]
+
+def test_repeated_prompt_is_served_from_cache(cache):
+    client = FakeClient()
+    assert cache.cached_chat_completion(client, "gpt-4", messages("q")) == "answer 1"
+    assert cache.cached_chat_completion(client, "gpt-4", messages("q")) == "answer 1"
+    # Different params are a different prompt
+    assert cache.cached_chat_completion(client, "gpt-4", messages("q"), temperature=0) == "answer 2"
+    assert client.calls == 2
+    stats = cache.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+def test_expired_entry_is_dropped(cache, monkeypatch):
+    key = cache.fingerprint("gpt-4", messages("q"))
+    cache.put(key, "gpt-4", "old")
+    assert cache.get(key, ttl=60) == "old"
+    assert cache.get(key, ttl=-1) is None
+    assert cache.cache_stats()["expired"] == 1
+    assert cache.get(key) is None
+
+def test_purge_expired(cache):
+    cache.put("a", "gpt-4", "x")
+    assert cache.purge_expired(ttl=-1) == 1
+    assert cache.cache_stats()["entries"] == 0
+
+def test_least_recently_used_is_evicted(cache, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_ENTRIES", 2)
+    cache.put("a", "gpt-4", "A")
+    cache.put("b", "gpt-4", "B")
+    assert cache.get("a") == "A"   # b is now the least recently used
+    cache.put("c", "gpt-4", "C")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("A", "C")
+    assert cache.cache_stats()["evicted"] == 1
+
+def test_hit_while_another_process_writes(cache, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_BUSY_TIMEOUT_SECONDS", 0.1)
+    cache.put("a", "gpt-4", "A")
+    other = sqlite3.connect(cache.CACHE_PATH, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("INSERT INTO llm_completions VALUES ('b', 'gpt-4', 'B', 0, 0, 0)")
+    try:
+        # WAL: the open write transaction does not block the read, only the LRU update
+        assert cache.get("a") == "A"
+        cache.put("c", "gpt-4", "C")
+        assert cache.cache_stats()["unavailable"] == 1
+    finally:
+        other.execute("COMMIT")
+        other.close()
@@ -0,0 +1,32 @@
+from datetime import datetime
+import pytest
+from log_record import LogRecord, parse_timestamp
+
+def test_parse_timestamp_iso():
+    assert parse_timestamp("2024-03-01T08:30:00") == datetime(2024, 3, 1, 8, 30)
+
+def test_parse_timestamp_drops_offset():
+    parsed = parse_timestamp("2024-03-01T08:30:00+02:00")
+    assert parsed == datetime(2024, 3, 1, 8, 30)
+    assert parsed.tzinfo is None
+    # Comparable with naive values from the other input types
+    assert parsed < datetime(2024, 3, 2)
+
+@pytest.mark.parametrize("value", [None, "", "not a date", float("nan")])
+def test_parse_timestamp_unparseable(value):
+    assert parse_timestamp(value) is None
+
+def test_parse_timestamp_pandas():
+    pd = pytest.importorskip("pandas")
+    assert parse_timestamp(pd.Timestamp("2024-03-01T08:30:00Z")) == datetime(2024, 3, 1, 8, 30)
+    assert parse_timestamp(pd.NaT) is None
+
+def test_log_record_dict_access():
+    record = LogRecord.from_dict({
+        "log_id": "a", "timestamp": "2024-03-01T08:30:00+00:00", "user": "carol",
+        "project": "AI Assistant", "content": "shipped", "duplicates": [],
+    })
+    assert record["user"] == "carol"
+    assert record.get("missing", 1) == 1
+    assert record["duplicates"] == []
+    assert record.parsed_time == datetime(2024, 3, 1, 8, 30)
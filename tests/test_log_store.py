@@ -0,0 +1,52 @@
+import json
+import os
+import pyarrow.parquet as pq
+from log_store import ensure_log_store, open_log_table, iter_records, count_logs, store_path
+
+LOGS = [
+    {"log_id": "c", "timestamp": "2024-04-01T09:00:00", "user": "bob", "project": "AI Assistant",
+     "type": "milestone", "content": "beta shipped", "session_id": "s2"},
+    {"log_id": "a", "timestamp": "2024-03-02T09:00:00", "user": "carol", "project": "Infra Migration",
+     "type": "decision", "content": "cutover planned", "session_id": "s1", "impact": "high"},
+    {"log_id": "b", "timestamp": "2024-03-05T09:00:00", "user": "eve", "project": "Infra Migration",
+     "type": "feedback", "content": "rollback drill", "session_id": "s1"},
+]
+
+def write_jsonl(path, logs):
+    with open(path, "w") as f:
+        for log in logs:
+            f.write(json.dumps(log) + "\n")
+
+def make_store(tmp_path, logs=LOGS):
+    jsonl = str(tmp_path / "logs.jsonl")
+    write_jsonl(jsonl, logs)
+    return ensure_log_store(jsonl)
+
+def test_store_keeps_file_order_and_extra_fields(tmp_path):
+    path = make_store(tmp_path)
+    assert path == store_path(str(tmp_path / "logs.jsonl"))
+    table = open_log_table(path)
+    assert table.column("log_id").to_pylist() == ["c", "a", "b"]
+    assert table.column("impact").to_pylist() == [None, "high", None]
+    assert count_logs(path) == 3
+
+def test_filters_are_pushed_down(tmp_path):
+    path = make_store(tmp_path)
+    table = open_log_table(path, projects=["Infra Migration"], since="2024-03-03", columns=["log_id"])
+    assert table.column_names == ["log_id"]
+    assert table.column("log_id").to_pylist() == ["b"]
+    assert [r["log_id"] for r in iter_records(path, until="2024-03-05T09:00:00")] == ["a"]
+
+def test_iter_records_matches_jsonl_shape(tmp_path):
+    records = list(iter_records(make_store(tmp_path)))
+    assert records[1]["timestamp"] == "2024-03-02T09:00:00"
+    assert {k: v for k, v in records[1].items() if v is not None} == LOGS[1]
+
+def test_stale_store_is_rebuilt(tmp_path):
+    path = make_store(tmp_path)
+    jsonl = str(tmp_path / "logs.jsonl")
+    write_jsonl(jsonl, LOGS[:1])
+    later = os.path.getmtime(path) + 10
+    os.utime(jsonl, (later, later))
+    assert ensure_log_store(jsonl) == path
+    assert pq.ParquetFile(path).metadata.num_rows == 1
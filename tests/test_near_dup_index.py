@@ -0,0 +1,84 @@
+import json
+import os
+from collections import Counter
+import pytest
+import near_dup_index
+from near_dup_index import NearDuplicateIndex
+
+CONTENT = "Decided to migrate the analytics dashboard to the new query engine next sprint."
+
+def test_check_does_not_register():
+    index = NearDuplicateIndex(path=None)
+    assert index.check({"content": CONTENT}) is None
+    assert len(index) == 0
+
+def test_add_registers_canonical_and_aliases_near_duplicates():
+    index = NearDuplicateIndex(path=None)
+    assert index.add({"log_id": "a", "content": CONTENT}) == ("a", False)
+    near = CONTENT.replace("next sprint", "next sprint!")
+    assert index.check({"content": near}) == "a"
+    assert index.add({"log_id": "b", "content": near}) == ("a", True)
+    # Re-adding is idempotent for both canonicals and aliases
+    assert index.add({"log_id": "a", "content": CONTENT}) == ("a", False)
+    assert index.add({"log_id": "b", "content": near}) == ("a", True)
+    assert len(index) == 1
+
+def test_unrelated_content_is_not_a_duplicate():
+    index = NearDuplicateIndex(path=None)
+    index.add({"log_id": "a", "content": CONTENT})
+    assert index.check({"content": "Onboarding survey results show users skip the tutorial."}) is None
+
+def test_changed_numbers_are_not_a_duplicate():
+    index = NearDuplicateIndex(path=None)
+    index.add({"log_id": "a", "content": "March revenue exceeded $58K; review planned for sprint 9."})
+    assert index.check({"content": "March revenue exceeded $95K; review planned for sprint 6."}) is None
+    assert index.check({"content": "March revenue exceeded $58K; review planned for sprint 9!"}) == "a"
+
+def test_impact_logs_alias_only_exact_copies():
+    # Regression: the data set has many templated logs differing only in figures
+    with open(os.path.join("..", "data", "memory_logs_with_historic_impact.jsonl")) as f:
+        logs = [json.loads(line) for line in f]
+    copies = sum(n - 1 for n in Counter(log["content"] for log in logs).values())
+    index = NearDuplicateIndex(path=None)
+    contents = {log["log_id"]: log["content"] for log in logs}
+    aliased = []
+    for log in logs:
+        canonical, is_duplicate = index.add(log)
+        if is_duplicate:
+            aliased.append(contents[canonical] == log["content"])
+    assert len(aliased) == copies and all(aliased)
+
+def test_embedding_confirmation_can_reject():
+    index = NearDuplicateIndex(path=None, embed_fn=lambda text: [1.0, 0.0] if "!" in text else [0.0, 1.0])
+    index.add({"log_id": "a", "content": CONTENT})
+    assert index.check({"content": CONTENT + "!"}) is None
+
+def test_given_vector_is_used_for_confirmation():
+    calls = []
+    def embed(text):
+        calls.append(text)
+        return [1.0, 0.0]
+    index = NearDuplicateIndex(path=None, embed_fn=embed)
+    index.add({"log_id": "a", "content": CONTENT}, vector=[1.0, 0.0])
+    assert index.check({"content": CONTENT + "!"}, vector=[0.0, 1.0]) is None
+    assert index.check({"content": CONTENT + "!"}, vector=[1.0, 0.0]) == "a"
+    assert calls == []
+
+def test_index_persists(tmp_path):
+    path = str(tmp_path / "index.duckdb")
+    index = NearDuplicateIndex(path=path)
+    index.add({"log_id": "a", "content": CONTENT})
+    index.add({"log_id": "b", "content": CONTENT.upper()})
+    index._conn.close()
+    reopened = NearDuplicateIndex(path=path)
+    assert len(reopened) == 1
+    assert reopened.add({"log_id": "b", "content": CONTENT.upper()}) == ("a", True)
+
+def test_get_near_dup_index_rejects_different_kwargs(monkeypatch):
+    monkeypatch.setattr(near_dup_index, "_index", None)
+    monkeypatch.setattr(near_dup_index, "_index_kwargs", None)
+    index = near_dup_index.get_near_dup_index(path=None)
+    assert near_dup_index.get_near_dup_index() is index
+    assert near_dup_index.get_near_dup_index(path=None) is index
+    with pytest.raises(ValueError):
+        near_dup_index.get_near_dup_index(path=None, jaccard_threshold=0.5)
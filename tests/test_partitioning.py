@@ -0,0 +1,76 @@
+import glob
+import os
+import duckdb
+import pytest
+from conftest import import_or_skip
+from partitioning import PROJECT_KEY_SQL, compact_partition, partition_dir, detect_projects
+
+retrieval = import_or_skip("retrieval")
+
+ROWS = [
+    ("a", "2024-03-02 09:00:00", "carol", "Infra Migration", "decision", "cutover planned", "s1"),
+    ("b", "2024-03-05 09:00:00", "eve", "Infra Migration", "feedback", "rollback drill", "s1"),
+    ("c", "2024-04-01 09:00:00", "bob", "AI Assistant", "milestone", "beta shipped", "s2"),
+]
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "timeline_partitions")
+
+@pytest.fixture
+def conn(root, monkeypatch):
+    conn = duckdb.connect()
+    conn.execute("""
+        CREATE TABLE timeline_logs (log_id TEXT, timestamp TIMESTAMP, user TEXT, project TEXT,
+                                    type TEXT, content TEXT, session_id TEXT)
+    """)
+    conn.executemany("INSERT INTO timeline_logs VALUES (?, ?, ?, ?, ?, ?, ?)", ROWS)
+    conn.execute(f"""
+        COPY (SELECT *, {PROJECT_KEY_SQL} AS project_key, strftime(timestamp, '%Y-%m') AS month FROM timeline_logs)
+        TO '{root}' (FORMAT PARQUET, PARTITION_BY (project_key, month))
+    """)
+    monkeypatch.setattr(retrieval, "PARTITION_ROOT", root)
+    monkeypatch.setattr(retrieval, "get_duckdb_cursor", lambda: conn)
+    return conn
+
+def append_files(conn, root, log_id, copies):
+    # What an append flush writes: one small file per touched partition
+    for i in range(copies):
+        conn.execute(f"""
+            COPY (SELECT * EXCLUDE (project_key, month) FROM (
+                SELECT *, {PROJECT_KEY_SQL} AS project_key, strftime(timestamp, '%Y-%m') AS month
+                FROM timeline_logs WHERE log_id = '{log_id}'))
+            TO '{partition_dir("Infra Migration", "2024-03-05T09:00:00", root)}/append_{log_id}_{i}.parquet'
+            (FORMAT PARQUET)
+        """)
+
+def test_partition_dir_matches_export_layout(conn, root):
+    directory = partition_dir("Infra Migration", "2024-03-05T09:00:00", root)
+    assert os.path.isdir(directory)
+    assert directory.endswith(os.path.join("project_key=infra_migration", "month=2024-03"))
+
+def test_compaction_merges_files_and_drops_repeated_rows(conn, root):
+    directory = partition_dir("Infra Migration", "2024-03-05T09:00:00", root)
+    append_files(conn, root, "b", 3)
+    assert not compact_partition(conn, directory, max_files=4)
+    assert compact_partition(conn, directory, max_files=3)
+    files = glob.glob(os.path.join(directory, "*"))
+    assert len(files) == 1 and os.path.basename(files[0]).startswith("compact_")
+    ids = [r[0] for r in conn.execute(f"SELECT log_id FROM read_parquet('{files[0]}') ORDER BY log_id").fetchall()]
+    assert ids == ["a", "b"]
+
+def test_timeline_reads_pruned_partitions(conn):
+    logs = retrieval.get_timeline_logs("2024-03-01", projects=["Infra Migration"], limit=5)
+    assert [l.log_id for l in logs] == ["b", "a"]
+    assert [l.log_id for l in retrieval.get_timeline_logs("2024-03-03", limit=5)] == ["c", "b"]
+
+def test_timeline_batch_reads_partitions(conn):
+    conn.execute("DELETE FROM timeline_logs")  # proves the rows come from the Parquet copy
+    results = retrieval.get_timeline_logs_batch([
+        ("2024-03-01", ["Infra Migration"], None, 1),
+        ("2024-03-01", None, ["bob"], 5),
+    ])
+    assert [[l.log_id for l in logs] for logs in results] == [["b"], ["c"]]
+
+def test_detect_projects():
+    assert detect_projects("status of the infra-migration?", ["Infra Migration", "AI Assistant"]) == ["Infra Migration"]
@@ -0,0 +1,63 @@
+from datetime import datetime
+from query_planner import plan_query, detect_since, extract_keywords
+
+NOW = datetime(2026, 10, 19)
+PROJECTS = ["Onboarding Redesign", "AI Assistant", "Infra Migration", "Feature Flags", "Analytics Dashboard"]
+USERS = ["alice", "bob", "carol", "dave", "eve"]
+
+def plan(query, since=None):
+    return plan_query(query, PROJECTS, USERS, now=NOW, since=since)
+
+def test_modal_may_is_not_a_month():
+    assert detect_since("What may have caused the outage?", NOW) is None
+    assert plan("What may have caused the outage?").since is None
+
+def test_month_after_preposition():
+    assert detect_since("What happened in May?", NOW) == datetime(2026, 5, 1)
+    # Months later in the year than now refer to last year
+    assert detect_since("Decisions since November", NOW) == datetime(2025, 11, 1)
+
+def test_month_with_year_or_day():
+    assert detect_since("What shipped May 2024?", NOW) == datetime(2024, 5, 1)
+    assert detect_since("Standup notes March 3rd", NOW) == datetime(2026, 3, 1)
+
+def test_relative_expressions():
+    assert detect_since("What happened in the past 3 days?", NOW) == datetime(2026, 10, 16)
+    assert detect_since("Any blockers this week?", NOW) == datetime(2026, 10, 12)
+
+def test_user_and_project_query_keeps_lexical():
+    p = plan("What did Carol say about Analytics Dashboard?")
+    assert p.projects == ["Analytics Dashboard"]
+    assert p.users == ["carol"]
+    assert p.uses("lexical")
+    assert p.uses("timeline")
+    assert p.uses("relational")
+
+def test_no_topic_and_no_project_skips_lexical():
+    p = plan("What did Carol say last week?")
+    assert not p.uses("lexical")
+    assert p.uses("timeline")
+
+def test_pure_time_lookup_skips_semantic_and_graph():
+    p = plan("What happened yesterday?")
+    assert not p.uses("semantic")
+    assert not p.uses("lexical")
+    assert not p.uses("relational")
+    assert set(p.skipped()) == {"semantic", "lexical", "relational"}
+
+def test_keyword_dense_query_widens_lexical():
+    p = plan('"rollback checklist" staging cutover')
+    assert p.limit("lexical") == 8
+    assert not p.uses("timeline")
+    assert p.fallback == ["semantic"]
+    assert plan('why "rollback checklist" staging cutover').fallback == []
+
+def test_extract_keywords():
+    assert extract_keywords("What is the status of the Infra Migration?") == ["what", "status", "infra", "migration"]
+
+def test_explicit_since_forces_timeline():
+    p = plan("rollback checklist for the staging cutover", since="2024-02-01")
+    assert p.limit("timeline") == 10
+    assert p.since == datetime(2024, 2, 1)
+    # It also overrides a time expression in the query
+    assert plan("What happened yesterday?", since="2024-02-01").since == datetime(2024, 2, 1)
@@ -0,0 +1,117 @@
+import os
+import duckdb
+import pytest
+from conftest import import_or_skip
+
+snapshot = import_or_skip("snapshot")
+
+@pytest.fixture
+def stores(monkeypatch, tmp_path):
+    """Timeline and boost DuckDB files, WAL and near-dup index under tmp_path; Qdrant and Neo4j faked."""
+    timeline = str(tmp_path / "timeline_logs.duckdb")
+    boosts = str(tmp_path / "retention_boosts.duckdb")
+    conn = duckdb.connect(timeline)
+    conn.execute("CREATE TABLE timeline_logs (log_id TEXT PRIMARY KEY, project TEXT, timestamp TIMESTAMP)")
+    conn.execute("INSERT INTO timeline_logs VALUES ('a', 'Infra Migration', '2024-03-01 09:00:00'), "
+                 "('b', 'AI Assistant', '2024-03-02 09:00:00')")
+    conn.close()
+    conn = duckdb.connect(boosts)
+    conn.execute("CREATE TABLE memory_retention_boosts (log_id TEXT PRIMARY KEY, boost FLOAT)")
+    conn.execute("INSERT INTO memory_retention_boosts VALUES ('a', 0.05)")
+    conn.close()
+    wal = tmp_path / "wal" / "append.wal"
+    wal.parent.mkdir()
+    wal.write_text('{"log_id": "c"}\n')
+
+    version = [1.0]
+    monkeypatch.setattr(snapshot, "DUCKDB_PATH", timeline)
+    monkeypatch.setattr(snapshot, "RETENTION_DB_PATH", boosts)
+    monkeypatch.setattr(snapshot, "DUCKDB_TABLES", {"timeline_logs": timeline, "memory_retention_boosts": boosts})
+    monkeypatch.setattr(snapshot, "SNAPSHOT_ROOT", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(snapshot, "WAL_PATH", str(wal))
+    monkeypatch.setattr(snapshot, "NEAR_DUP_INDEX_PATH", str(tmp_path / "near_dup_index.duckdb"))
+    monkeypatch.setattr(snapshot, "read_data_version", lambda: version[0])
+    monkeypatch.setattr(snapshot, "bump_data_version", lambda: version.__setitem__(0, version[0] + 1))
+    monkeypatch.setattr(snapshot, "export_qdrant", lambda out_dir: {"points": 0, "collection": "semantic_logs"})
+    monkeypatch.setattr(snapshot, "export_neo4j", lambda out_dir: {"nodes": 0, "relationships": 0, "schema": []})
+    monkeypatch.setattr(snapshot, "restore_qdrant", lambda snapshot_dir, meta: None)
+    monkeypatch.setattr(snapshot, "restore_neo4j", lambda snapshot_dir, meta: None)
+    monkeypatch.setattr(snapshot, "build_fts_index", lambda path: None)
+    monkeypatch.setattr(snapshot, "export_partitioned_timeline", lambda path: None)
+    return {"timeline": timeline, "boosts": boosts, "wal": wal, "version": version}
+
+def test_manifest_checksums_cover_every_file(stores):
+    out_dir = snapshot.create_snapshot("s1")
+    manifest = snapshot.verify_snapshot(out_dir)
+    assert set(manifest["files"]) == {
+        "append.wal", "duckdb_timeline_logs.parquet", "duckdb_memory_retention_boosts.parquet"
+    }
+    assert manifest["duckdb"]["timeline_logs"]["rows"] == 2
+    assert "PRIMARY KEY" in manifest["duckdb"]["memory_retention_boosts"]["ddl"]
+
+    with open(os.path.join(out_dir, "append.wal"), "a") as f:
+        f.write('{"log_id": "tampered"}\n')
+    with pytest.raises(ValueError, match="append.wal"):
+        snapshot.verify_snapshot(out_dir)
+
+def test_snapshot_uses_the_service_connection(stores):
+    # The service holds the write lock on the timeline file; its own connection is reused
+    conn = duckdb.connect(stores["timeline"])
+    out_dir = snapshot.create_snapshot("s1", timeline_conn=conn)
+    conn.execute("SELECT 1").fetchone()  # still open
+    conn.close()
+    assert snapshot.verify_snapshot(out_dir)["duckdb"]["memory_retention_boosts"]["rows"] == 1
+
+def test_missing_table_fails_the_export(stores, tmp_path):
+    conn = duckdb.connect(stores["boosts"])
+    conn.execute("DROP TABLE memory_retention_boosts")
+    conn.close()
+    with pytest.raises(RuntimeError, match="memory_retention_boosts"):
+        snapshot.export_duckdb(str(tmp_path))
+
+def test_snapshot_discarded_when_data_version_moves(stores, monkeypatch):
+    export_neo4j = snapshot.export_neo4j
+    def write_during_export(out_dir):
+        stores["version"][0] += 1
+        return export_neo4j(out_dir)
+    monkeypatch.setattr(snapshot, "export_neo4j", write_during_export)
+    with pytest.raises(RuntimeError, match="written to during the snapshot"):
+        snapshot.create_snapshot("s1")
+    assert not os.path.exists(os.path.join(snapshot.SNAPSHOT_ROOT, "s1"))
+
+def test_restore_round_trip(stores):
+    index = snapshot.NEAR_DUP_INDEX_PATH
+    duckdb.connect(index).close()
+    out_dir = snapshot.create_snapshot("s1")
+    assert "near_dup_index.duckdb" in snapshot.verify_snapshot(out_dir)["files"]
+
+    conn = duckdb.connect(stores["timeline"])
+    conn.execute("DELETE FROM timeline_logs")
+    conn.close()
+    stores["wal"].write_text("")
+    with open(index + ".wal", "w") as f:
+        f.write("stale")
+
+    snapshot.restore_snapshot(out_dir)
+    conn = duckdb.connect(stores["timeline"])
+    assert conn.execute("SELECT log_id FROM timeline_logs ORDER BY log_id").fetchall() == [("a",), ("b",)]
+    conn.close()
+    conn = duckdb.connect(stores["boosts"])
+    # Restored DDL keeps the primary key the summarizer upserts on
+    conn.execute("INSERT INTO memory_retention_boosts VALUES ('a', 0.2) ON CONFLICT (log_id) DO UPDATE SET boost = excluded.boost")
+    assert conn.execute("SELECT boost FROM memory_retention_boosts").fetchall() == [(pytest.approx(0.2),)]
+    conn.close()
+    assert stores["wal"].read_text() == '{"log_id": "c"}\n'
+    assert not os.path.exists(index + ".wal")
+    assert not os.path.exists(stores["wal"].parent / "append.wal.tmp")
+    assert stores["version"][0] == 2.0
+
+def test_unsupported_manifest_version(stores):
+    out_dir = snapshot.create_snapshot("s1")
+    path = os.path.join(out_dir, "manifest.json")
+    with open(path) as f:
+        text = f.read()
+    with open(path, "w") as f:
+        f.write(text.replace(f'"version": {snapshot.MANIFEST_VERSION}', '"version": 1', 1))
+    with pytest.raises(ValueError, match="manifest version"):
+        snapshot.verify_snapshot(out_dir)
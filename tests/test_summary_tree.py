@@ -0,0 +1,149 @@
+import os
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from conftest import import_or_skip
+from summary_tree import node_id, point_id
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # the client is only constructed, never called
+summarizer = import_or_skip("summarizer")
+retrieval = import_or_skip("retrieval")
+
+class FakeQdrant:
+    """In-memory stand-in for the calls the summarizer and the tree search make."""
+
+    def __init__(self, points=()):
+        self.points = {}
+        self.requests = []
+        for payload, vector in points:
+            self.points[point_id(payload["log_id"])] = (payload, np.asarray(vector, dtype=np.float32))
+
+    @staticmethod
+    def _holds(payload, cond):
+        value = payload.get(cond.key)
+        if cond.range is not None:
+            return value is not None and datetime.fromisoformat(value) > cond.range.gt
+        if hasattr(cond.match, "any"):
+            return value in cond.match.any
+        return value == cond.match.value
+
+    def _matches(self, payload, flt):
+        if flt is None:
+            return True
+        return (all(self._holds(payload, c) for c in flt.must or [])
+                and not any(self._holds(payload, c) for c in flt.must_not or []))
+
+    def retrieve(self, collection_name, ids, with_payload=True):
+        return [SimpleNamespace(id=i, payload=self.points[i][0]) for i in ids if i in self.points]
+
+    def count(self, collection_name, count_filter=None, exact=True):
+        return SimpleNamespace(count=sum(self._matches(p, count_filter) for p, _ in self.points.values()))
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, with_payload=True, with_vectors=False):
+        found = [SimpleNamespace(id=i, payload=p) for i, (p, _) in self.points.items() if self._matches(p, scroll_filter)]
+        return found[:limit], None
+
+    def query_batch_points(self, collection_name, requests):
+        self.requests += requests
+        responses = []
+        for request in requests:
+            query = np.asarray(request.query, dtype=np.float32)
+            hits = sorted(
+                (SimpleNamespace(id=i, score=float(v @ query), payload=p)
+                 for i, (p, v) in self.points.items() if self._matches(p, request.filter)),
+                key=lambda h: h.score, reverse=True
+            )
+            responses.append(SimpleNamespace(points=hits[:request.limit]))
+        return responses
+
+def log(log_id, timestamp, **fields):
+    return {"log_id": log_id, "timestamp": timestamp, "project": "Infra Migration",
+            "session_id": "sess_1", "content": f"content of {log_id}", **fields}
+
+# ---- summarizer ----
+
+def test_build_summary_level_groups_by_period(monkeypatch):
+    monkeypatch.setattr(summarizer, "qdrant", FakeQdrant())
+    monkeypatch.setattr(summarizer, "summarize_logs", lambda members, project, period: f"summary of {len(members)}")
+    children = [log(f"l{i}", f"2024-03-0{i}T09:00:00") for i in (3, 1, 2)] + [log("l9", "2024-03-09T09:00:00", session_id="sess_2")]
+    nodes = {n["period"]: n for n in summarizer.build_summary_level("session", children)}
+    assert nodes["sess_1"]["content"] == "summary of 3"
+    assert nodes["sess_1"]["children"] == ["l1", "l2", "l3"]
+    assert nodes["sess_1"]["timestamp"] == "2024-03-01T09:00:00"
+    assert nodes["sess_1"]["covered_until"] == "2024-03-03T09:00:00"
+    # Below MIN_CHILDREN_TO_SUMMARIZE the children's text is reused
+    assert nodes["sess_2"]["content"] == "content of l9"
+    assert nodes["sess_2"]["log_id"] == node_id("session", "Infra Migration", "sess_2")
+
+def test_rerun_merges_existing_children(monkeypatch):
+    old = [log("l1", "2024-03-01T09:00:00"), log("l2", "2024-03-02T09:00:00")]
+    parent = {"log_id": node_id("session", "Infra Migration", "sess_1"), "children": ["l1", "l2"]}
+    fake = FakeQdrant([(p, [0.0]) for p in old + [parent]])
+    monkeypatch.setattr(summarizer, "qdrant", fake)
+    monkeypatch.setattr(summarizer, "summarize_logs", lambda members, project, period: "merged")
+
+    previous = summarizer.existing_children("session", [("Infra Migration", "sess_1"), ("Infra Migration", "sess_9")])
+    assert [c["log_id"] for c in previous[("Infra Migration", "sess_1")]] == ["l1", "l2"]
+    assert ("Infra Migration", "sess_9") not in previous
+
+    new = log("l3", "2024-03-03T09:00:00")
+    [node] = summarizer.build_summary_level("session", [new, old[1]])
+    assert node["children"] == ["l1", "l2", "l3"]
+    assert node["content"] == "merged"
+
+# ---- tree search ----
+
+@pytest.fixture
+def tree(monkeypatch):
+    points = [
+        (log("l1", "2024-01-02T09:00:00", archived=True), [1.0, 0.0, 0.0]),
+        (log("l2", "2024-01-03T09:00:00", archived=True), [0.9, 0.1, 0.0]),
+        (log("l3", "2024-01-04T09:00:00", archived=True), [0.0, 1.0, 0.0]),
+        (log("s1", "2024-01-02T09:00:00", level="session", children=["l1", "l2"],
+                  covered_until="2024-01-03T09:00:00", type="summary"), [1.0, 0.1, 0.0]),
+        (log("s2", "2024-01-04T09:00:00", level="session", children=["l3"],
+                  covered_until="2024-01-04T09:00:00", type="summary"), [0.0, 1.0, 0.1]),
+        (log("d1", "2024-01-02T09:00:00", level="day", children=["s1", "s2"],
+                  covered_until="2024-01-04T09:00:00", type="summary"), [0.5, 0.5, 0.0]),
+        # Not summarized: one newer than the tree, one older that the summarizer missed
+        (log("r1", "2024-02-01T09:00:00"), [0.0, 0.9, 0.1]),
+        (log("o1", "2024-01-01T09:00:00"), [0.0, 1.0, 0.0]),
+    ]
+    fake = FakeQdrant(points)
+    monkeypatch.setattr(retrieval, "qdrant", fake)
+    monkeypatch.setattr(retrieval, "_tree_state", {"version": None, "levels": [], "covered_until": {}})
+    monkeypatch.setattr(retrieval, "read_data_version", lambda: 1.0)
+    monkeypatch.setattr(retrieval, "get_known_projects", lambda refresh=False: ["Infra Migration"])
+    return fake
+
+def test_tree_state_reads_built_levels_once_per_version(tree, monkeypatch):
+    state = retrieval.get_summary_tree_state()
+    assert state["levels"] == ["session", "day"]
+    assert state["covered_until"] == {"Infra Migration": "2024-01-04T09:00:00"}
+    tree.points.clear()
+    assert retrieval.get_summary_tree_state()["levels"] == ["session", "day"]
+    monkeypatch.setattr(retrieval, "read_data_version", lambda: 2.0)
+    assert retrieval.get_summary_tree_state()["levels"] == []
+
+def test_descent_starts_at_coarsest_built_level(tree):
+    [logs] = retrieval.get_hierarchical_logs_batch([[0.0, 1.0, 0.0]], [2], [None])
+    assert [l.log_id for l in logs] == ["s2", "l3"]
+    # day and session levels, then the leaves: no requests for unbuilt month/quarter levels
+    assert [r.filter.must[0].match.value for r in tree.requests[:2]] == ["day", "session"]
+    assert len(tree.requests) == 3
+
+def test_no_tree_means_no_descent(tree):
+    tree.points = {i: v for i, v in tree.points.items() if "level" not in v[0]}
+    assert retrieval.get_hierarchical_logs_batch([[0.0, 1.0, 0.0]], [2], [None]) == [None]
+    assert tree.requests == []
+
+def test_flat_search_only_covers_logs_newer_than_the_tree(tree):
+    [logs] = retrieval.get_semantic_logs_batch([[0.0, 1.0, 0.0]], [3], [["Infra Migration"]])
+    ids = [l.log_id for l in logs]
+    assert "r1" in ids and "o1" not in ids
+
+def test_flat_search_unrestricted_when_a_project_has_no_tree(tree, monkeypatch):
+    monkeypatch.setattr(retrieval, "get_known_projects", lambda refresh=False: ["Infra Migration", "AI Assistant"])
+    [logs] = retrieval.get_semantic_logs_batch([[0.0, 1.0, 0.0]], [3], [None])
+    assert "o1" in [l.log_id for l in logs]